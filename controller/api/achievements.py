@@ -0,0 +1,121 @@
+# api/achievements.py
+
+"""
+Recálculo em massa das conquistas.
+
+update_user_achievements (services) trata um utilizador de cada vez, depois de cada ação.
+Quando uma conquista é criada ou alterada, os utilizadores existentes precisam de ser
+reavaliados: aqui as estatísticas de todos são calculadas com algumas consultas agregadas
+(uma por tipo de critério, com as sequências de meses de api.streaks) e comparadas com os
+limiares em vetores NumPy. O progresso (UserAchievement.progress), os desbloqueios e as
+recompensas são escritos em lotes.
+"""
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from . import ledger
+from .models import Achievement, Bottle, CustomUser, Model3D, RecyclingHistory, UserAchievement
+from .services import ACHIEVEMENT_REWARD
+from .streaks import all_streaks
+
+
+def _per_user(user_ids, rows):
+    """Alinha pares (user_id, valor) com o vetor ordenado 'user_ids'; utilizadores sem linha ficam a 0."""
+    values = np.zeros(len(user_ids), dtype=np.int64)
+    rows = [(user_id, value) for user_id, value in rows if value is not None]
+    if not rows or not len(user_ids):
+        return values
+    owners, amounts = np.array(rows, dtype=np.int64).T
+    positions = np.searchsorted(user_ids, owners).clip(max=len(user_ids) - 1)
+    found = user_ids[positions] == owners
+    values[positions[found]] = amounts[found]
+    return values
+
+
+def collect_stats():
+    """
+    Calcula as estatísticas de conquistas de todos os utilizadores.
+
+    Returns:
+        tuple: (ids dos utilizadores ordenados, {criteria_type: vetor de valores alinhado com os ids}).
+    """
+    users = np.array(CustomUser.objects.order_by('pk').values_list('pk', 'level'), dtype=np.int64).reshape(-1, 2)
+    user_ids = users[:, 0]
+
+    streaks = all_streaks()
+
+    stats = {
+        'BOTTLES_TOTAL': _per_user(user_ids, Bottle.objects.values_list('user_id').annotate(
+            total=Sum('quantity')).order_by()),
+        'USER_LEVEL': users[:, 1],
+        'MONTHLY_BOTTLES': _per_user(user_ids, RecyclingHistory.objects.values_list('user_id').annotate(
+            best=Max('quantity')).order_by()),
+        'CONSECUTIVE_MONTHS': _per_user(user_ids, ((user_id, longest) for user_id, (longest, _) in streaks.items())),
+        'MODELS_UPLOADED': _per_user(user_ids, Model3D.objects.values_list('user_id').annotate(
+            total=Count('id')).order_by()),
+    }
+    return user_ids, stats
+
+
+def _sync_batch(achievement, user_ids, progress):
+    """
+    Grava o progresso de um lote de utilizadores numa conquista e desbloqueia-a para os que
+    atingiram a meta e ainda não a tinham. Devolve quantos a desbloquearam.
+    """
+    with transaction.atomic():
+        UserAchievement.objects.bulk_create(
+            [UserAchievement(user_id=user_id, achievement=achievement, progress=value)
+             for user_id, value in zip(user_ids, progress)],
+            update_conflicts=True, unique_fields=['user', 'achievement'], update_fields=['progress'],
+        )
+        pending = UserAchievement.objects.select_for_update().filter(
+            achievement=achievement, user_id__in=user_ids, unlocked_at__isnull=True,
+            progress__gte=achievement.criteria_value)
+        new_ids = list(pending.values_list('user_id', flat=True))
+        if not new_ids:
+            return 0
+
+        # Só recebem a recompensa as linhas que este UPDATE desbloqueou: um UserAchievement.unlock()
+        # simultâneo (ou uma base sem bloqueio de linhas, como o SQLite) pode ter chegado primeiro.
+        now = timezone.now()
+        UserAchievement.objects.filter(
+            achievement=achievement, user_id__in=new_ids, unlocked_at__isnull=True
+        ).update(unlocked_at=now)
+        new_ids = list(UserAchievement.objects.filter(
+            achievement=achievement, user_id__in=new_ids, unlocked_at=now).values_list('user_id', flat=True))
+        if not new_ids:
+            return 0
+        # Uma única saída da conta de emissão para todo o lote.
+        postings = [(ledger.MINT, 'reputation', -ACHIEVEMENT_REWARD * len(new_ids))]
+        postings += [(user_id, 'reputation', ACHIEVEMENT_REWARD) for user_id in new_ids]
+        ledger.post('achievement', postings, reference=f'achievement:{achievement.pk}')
+    return len(new_ids)
+
+
+def recompute_achievements(achievements=None, batch_size=1000):
+    """
+    Atualiza o progresso de todos os utilizadores nas conquistas indicadas (por omissão, todas),
+    desbloqueia-as para os que já cumprem os critérios e atribui as recompensas.
+
+    Returns:
+        dict: {id da conquista: número de utilizadores que a desbloquearam agora}.
+    """
+    achievements = list(achievements if achievements is not None else Achievement.objects.all())
+    user_ids, stats = collect_stats()
+    unlocked = {}
+    for achievement in achievements:
+        progress = stats.get(achievement.criteria_type)
+        if progress is None:
+            unlocked[achievement.pk] = 0
+            continue
+        # Quem está a 0 e não tem linha aparece no dashboard com progresso 0 na mesma.
+        active = progress > 0
+        owners, values = user_ids[active].tolist(), progress[active].tolist()
+        unlocked[achievement.pk] = sum(
+            _sync_batch(achievement, owners[start:start + batch_size], values[start:start + batch_size])
+            for start in range(0, len(owners), batch_size)
+        )
+    return unlocked
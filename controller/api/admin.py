@@ -1,7 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Achievement, UserAchievement
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import CustomUser, Achievement, UserAchievement, LedgerJournal, LedgerEntry, GamificationEvent, Job
 from .forms import CustomUserCreationForm, CustomUserChangeForm
+from . import achievements, ledger, leveling
+from .services import lock_users
 
 
 @admin.register(CustomUser)
@@ -35,16 +39,59 @@ class CustomUserAdmin(UserAdmin):
             'reputation_coins',
             'level',
             'experience',
+            'total_experience',
             'profile_image',
             'is_curator'
         )}),
     )
 
+    # O nível e a experiência dentro do nível são derivados da experiência total.
+    readonly_fields = ('level', 'experience')
+
     # Organiza os campos no formulário de criação de um novo utilizador.
     add_fieldsets = UserAdmin.add_fieldsets + (
         (None, {'fields': ('is_curator',)}),
     )
 
+    def save_model(self, request, obj, form, change):
+        """
+        Guarda o utilizador sem tocar nos saldos e regista as alterações de moedas feitas no
+        formulário (a diferença face ao valor mostrado) como um ajuste no livro-razão. A linha
+        fica bloqueada durante a gravação e os saldos nunca são escritos diretamente, pelo que um
+        crédito feito entretanto não se perde. O nível é sempre derivado da experiência total.
+        """
+        obj.level, obj.experience = leveling.level_for(obj.total_experience)
+        shown = {field: (form.initial.get(field) or 0) if change else 0 for field in ledger.COIN_FIELDS.values()}
+        changes = {coin_type: getattr(obj, field) - shown[field] for coin_type, field in ledger.COIN_FIELDS.items()}
+        with transaction.atomic():
+            if change:
+                lock_users(obj.pk)
+                editable = {field.name for field in obj._meta.concrete_fields} - set(ledger.COIN_FIELDS.values())
+                update_fields = [name for name in form.changed_data if name in editable]
+                obj.save(update_fields=update_fields + ['level', 'experience'])
+            else:
+                for field in ledger.COIN_FIELDS.values():
+                    setattr(obj, field, 0)
+                super().save_model(request, obj, form, change)
+
+            postings = []
+            for coin_type, delta in changes.items():
+                postings += ledger.transfer(coin_type, delta, ledger.ADJUSTMENT, obj)
+            ledger.post('adjustment', postings, reference=f'admin:{request.user.pk}')
+        obj.refresh_from_db(fields=list(ledger.COIN_FIELDS.values()))
+
+    def delete_model(self, request, obj):
+        """Encerra a conta no livro-razão antes de apagar o utilizador."""
+        with transaction.atomic():
+            ledger.close_account(obj)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for user in queryset:
+                ledger.close_account(user)
+            super().delete_queryset(request, queryset)
+
     def unlocked_achievements_count(self, obj):
         """
         Calcula e retorna a contagem de conquistas desbloqueadas para um utilizador.
@@ -66,6 +113,12 @@ class AchievementAdmin(admin.ModelAdmin):
                     'criteria_type', 'criteria_value')
     list_filter = ('criteria_type',)
     search_fields = ('id', 'title', 'description')
+    actions = ['recompute']
+
+    @admin.action(description='Desbloquear para os utilizadores que já cumprem os critérios')
+    def recompute(self, request, queryset):
+        unlocked = achievements.recompute_achievements(queryset)
+        self.message_user(request, f"{sum(unlocked.values())} conquistas desbloqueadas.")
 
 
 @admin.register(UserAchievement)
@@ -77,3 +130,80 @@ class UserAchievementAdmin(admin.ModelAdmin):
     list_display = ('user', 'achievement', 'unlocked_at')
     list_filter = ('achievement', 'unlocked_at')
     search_fields = ('user__username', 'achievement__title')
+
+
+class LedgerEntryInline(admin.TabularInline):
+    """Mostra as entradas de um lançamento, apenas para leitura."""
+    model = LedgerEntry
+    fields = ('user', 'system_account', 'coin_type', 'amount')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LedgerJournal)
+class LedgerJournalAdmin(admin.ModelAdmin):
+    """
+    Consulta dos lançamentos do livro-razão. Os lançamentos nunca são editados nem
+    apagados; as correções são feitas com ajustes nos saldos dos utilizadores.
+    """
+    list_display = ('id', 'reason', 'reference', 'created_at')
+    list_filter = ('reason',)
+    search_fields = ('reference',)
+    inlines = [LedgerEntryInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(GamificationEvent)
+class GamificationEventAdmin(admin.ModelAdmin):
+    """
+    Acompanhamento da fila de eventos de gamificação. Os eventos falhados podem ser
+    devolvidos à fila depois de corrigida a causa.
+    """
+    list_display = ('id', 'kind', 'user', 'status', 'attempts', 'created_at', 'processed_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('user__username', 'idempotency_key')
+    readonly_fields = ('user', 'kind', 'payload', 'idempotency_key', 'created_at', 'processed_at', 'last_error')
+    actions = ['requeue']
+
+    @admin.action(description='Voltar a pôr na fila os eventos falhados')
+    def requeue(self, request, queryset):
+        updated = queryset.filter(status='failed').update(status='pending', attempts=0, last_error='')
+        self.message_user(request, f"{updated} eventos devolvidos à fila.")
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Acompanhamento das tarefas em segundo plano. As tarefas falhadas podem ser devolvidas
+    à fila depois de corrigida a causa.
+    """
+    list_display = ('id', 'kind', 'status', 'attempts', 'run_after', 'locked_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('key',)
+    readonly_fields = ('kind', 'payload', 'key', 'rerun', 'attempts', 'locked_by', 'locked_at', 'result',
+                       'last_error', 'created_at', 'finished_at')
+    actions = ['requeue']
+
+    @admin.action(description='Voltar a pôr na fila as tarefas falhadas')
+    def requeue(self, request, queryset):
+        updated = 0
+        for job in queryset.filter(status='failed'):
+            try:
+                with transaction.atomic():
+                    updated += Job.objects.filter(pk=job.pk, status='failed').update(
+                        status='pending', attempts=0, last_error='', run_after=timezone.now(), finished_at=None)
+            except IntegrityError:
+                pass  # Já há outra tarefa ativa com a mesma chave.
+        self.message_user(request, f"{updated} tarefas devolvidas à fila.")
@@ -0,0 +1,272 @@
+# api/benchmark.py
+
+"""
+Benchmark dos endpoints mais usados da API.
+
+Cada cenário faz pedidos reais através do cliente de testes do DRF (toda a pilha de
+middleware, autenticação, views e serializers, sem rede) sobre um conjunto de dados gerado
+por api.seeding. Por cenário são medidos o débito (pedidos por segundo), a latência
+(p50/p99) e o número de consultas SQL por pedido. Os resultados podem ser gravados como
+referência em JSON e comparados com execuções posteriores.
+"""
+
+import json
+import time
+from itertools import count
+
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from . import recommendations, seeding
+from .models import CoinOffer, CustomUser, Model3D
+
+# --- Cenários ---
+
+
+class Context:
+    """Estado partilhado pelos cenários: dados semeados e um cliente por utilizador."""
+
+    def __init__(self, dataset):
+        self.users = list(CustomUser.objects.filter(pk__in=dataset['users']).order_by('pk'))
+        self.free_models = list(Model3D.objects.filter(
+            pk__in=dataset['models'], is_free=True, is_visible=True).values_list('pk', flat=True))
+        self.offers = list(CoinOffer.objects.filter(
+            pk__in=dataset['offers'], status='active', specific_user__isnull=True
+        ).values_list('pk', 'seller_id'))
+        self._clients = {}
+        self._turn = count()
+
+    def client(self, user=None):
+        """Cliente autenticado como 'user' (ou anónimo)."""
+        key = user.pk if user else None
+        if key not in self._clients:
+            client = APIClient()
+            if user:
+                client.force_authenticate(user)
+            self._clients[key] = client
+        return self._clients[key]
+
+    def next_user(self):
+        """Roda pelos utilizadores, para que os pedidos não incidam sempre nas mesmas linhas."""
+        return self.users[next(self._turn) % len(self.users)]
+
+
+def catalog_list(ctx):
+    return ctx.client().get(reverse('model3d-list'))
+
+
+def catalog_page(ctx):
+    return ctx.client(ctx.next_user()).get(reverse('model3d-list'), {'page_size': 20})
+
+
+def catalog_search(ctx):
+    return ctx.client(ctx.next_user()).get(reverse('model3d-list'), {'search': 'suporte'})
+
+
+def catalog_trending(ctx):
+    return ctx.client(ctx.next_user()).get(reverse('model3d-list'), {'ordering': 'trending'})
+
+
+def recommended(ctx):
+    return ctx.client(ctx.next_user()).get(reverse('model3d-recommended'))
+
+
+def model_comments(ctx):
+    model_id = ctx.free_models[next(ctx._turn) % len(ctx.free_models)]
+    return ctx.client().get(reverse('comment-list'), {'model': model_id})
+
+
+def dashboard(ctx):
+    return ctx.client(ctx.next_user()).get(reverse('user-dashboard'))
+
+
+def recycle(ctx):
+    return ctx.client(ctx.next_user()).post(
+        reverse('recycle_bottles'), {'quantity': 3, 'volume': '500ml', 'type': 'Água'})
+
+
+def download(ctx):
+    model_id = ctx.free_models[next(ctx._turn) % len(ctx.free_models)]
+    response = ctx.client(ctx.next_user()).get(reverse('model3d-download', args=[model_id]))
+    if response.streaming:
+        # O cliente de testes fecha a resposta quando o conteúdo acaba de ser lido.
+        b''.join(response.streaming_content)
+    return response
+
+
+def upload(ctx):
+    """Publica um modelo com três ficheiros e uma imagem."""
+    files = [SimpleUploadedFile(f'peca_{part}.stl', seeding.STL_CONTENT) for part in range(3)]
+    image = SimpleUploadedFile('preview.png', seeding.PNG_CONTENT, content_type='image/png')
+    return ctx.client(ctx.next_user()).post(reverse('model-upload'), {
+        'name': 'Modelo de benchmark', 'description': 'Enviado pelo benchmark', 'file': files, 'image': image,
+    }, format='multipart')
+
+
+def purchase(ctx):
+    """Compra a próxima oferta ativa; cada oferta só pode ser comprada uma vez."""
+    if not ctx.offers:
+        return None
+    offer_id, seller_id = ctx.offers.pop()
+    buyer = ctx.next_user()
+    if buyer.pk == seller_id:
+        buyer = ctx.next_user()
+    return ctx.client(buyer).post(reverse('purchase-coin-offer', args=[offer_id]))
+
+
+def transaction_history(ctx):
+    return ctx.client(ctx.next_user()).get(reverse('transaction-history'))
+
+
+SCENARIOS = {
+    'catalog_list': catalog_list,
+    'catalog_page': catalog_page,
+    'catalog_search': catalog_search,
+    'catalog_trending': catalog_trending,
+    'model_comments': model_comments,
+    'recommended': recommended,
+    'dashboard': dashboard,
+    'recycle': recycle,
+    'download': download,
+    'upload': upload,
+    'purchase': purchase,
+    'transaction_history': transaction_history,
+}
+
+
+# --- Execução ---
+
+def run_scenario(ctx, scenario, iterations=100, warmup=5):
+    """
+    Corre um cenário e devolve as métricas.
+
+    Returns:
+        dict: requests, errors, throughput (pedidos/s), p50_ms, p99_ms, queries_avg, queries_max.
+    """
+    for _ in range(warmup):
+        scenario(ctx)
+
+    latencies, queries, errors = [], [], 0
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = scenario(ctx)
+            elapsed = time.perf_counter() - start
+        if response is None:
+            break
+        if response.status_code >= 400:
+            errors += 1
+        latencies.append(elapsed * 1000)
+        queries.append(len(captured))
+
+    if not latencies:
+        return {'requests': 0, 'errors': 0, 'throughput': 0.0, 'p50_ms': 0.0, 'p99_ms': 0.0,
+                'queries_avg': 0.0, 'queries_max': 0}
+    latencies = np.array(latencies)
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / (latencies.sum() / 1000), 1),
+        'p50_ms': round(float(p50), 2),
+        'p99_ms': round(float(p99), 2),
+        'queries_avg': round(float(np.mean(queries)), 1),
+        'queries_max': int(max(queries)),
+    }
+
+
+def run_benchmark(dataset, scenarios=None, iterations=100, warmup=5):
+    """Corre os cenários indicados (por omissão, todos) e devolve {cenário: métricas}."""
+    ctx = Context(dataset)
+    return {name: run_scenario(ctx, SCENARIOS[name], iterations, warmup) for name in (scenarios or SCENARIOS)}
+
+
+# --- Crescimento do catálogo ---
+
+def catalog_scaling(sizes, iterations=50, warmup=5, seed=0):
+    """
+    Mede a primeira página do catálogo autenticado (cenário 'catalog_page') à medida que o
+    catálogo cresce: semeia modelos até cada um dos tamanhos indicados e corre o cenário.
+    Com a consulta a percorrer o índice (-date, -id), a latência deve manter-se estável.
+
+    Returns:
+        list: Um dict por tamanho, com 'models' e as métricas de run_scenario.
+    """
+    dataset = seeding.seed_dataset(users=20, bottles_per_user=0, models=0, offers=0, transactions=0,
+                                   seed=seed, derived=False)
+    ctx = Context(dataset)
+    rows, total = [], 0
+    for step, size in enumerate(sorted(sizes)):
+        if size > total:
+            seeding.seed_dataset(users=1, bottles_per_user=0, models=size - total, offers=0, transactions=0,
+                                 likes_per_model=1, comments_per_model=0, seed=seed + step + 1, derived=False)
+            total = size
+        rows.append({'models': size, **run_scenario(ctx, catalog_page, iterations, warmup)})
+    return rows
+
+
+# --- Construção das recomendações ---
+
+def recommendation_build_times(like_counts, models=10000, users=50000, k=20, seed=0):
+    """
+    Mede o tempo de recommendations.compute_neighbours sobre interações sintéticas, para ver
+    como cresce com o número de likes. A popularidade dos modelos segue uma lei de potência
+    (poucos modelos concentram a maior parte dos likes), como num catálogo real.
+
+    Returns:
+        list: Um dict por contagem, com likes, models, users, pairs e seconds.
+    """
+    rng = np.random.default_rng(seed)
+    popularity = 1 / np.arange(1, models + 1)
+    popularity /= popularity.sum()
+    rows = []
+    for likes in like_counts:
+        model_ids = rng.choice(models, size=likes, p=popularity)
+        user_ids = rng.integers(0, users, size=likes)
+        start = time.perf_counter()
+        pairs = recommendations.compute_neighbours(model_ids, user_ids, k=k)
+        rows.append({'likes': likes, 'models': len(np.unique(model_ids)), 'users': len(np.unique(user_ids)),
+                     'pairs': len(pairs), 'seconds': round(time.perf_counter() - start, 3)})
+    return rows
+
+
+# --- Referências ---
+
+def save_baseline(path, results, meta=None):
+    """Grava os resultados (e os parâmetros da execução) num ficheiro JSON."""
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump({'meta': meta or {}, 'results': results}, output, indent=2, ensure_ascii=False)
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compara os resultados com uma referência.
+
+    Uma latência (p50/p99) pior do que a referência em mais de 'tolerance' (fração) ou qualquer
+    aumento do número máximo de consultas conta como regressão.
+
+    Returns:
+        list: Regressões, como dicts {scenario, metric, baseline, current}.
+    """
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get('results', {}).get(name)
+        if not reference or not current['requests']:
+            continue
+        for metric in ('p50_ms', 'p99_ms'):
+            if current[metric] > reference[metric] * (1 + tolerance):
+                regressions.append({'scenario': name, 'metric': metric,
+                                    'baseline': reference[metric], 'current': current[metric]})
+        if current['queries_max'] > reference['queries_max']:
+            regressions.append({'scenario': name, 'metric': 'queries_max',
+                                'baseline': reference['queries_max'], 'current': current['queries_max']})
+    return regressions
@@ -0,0 +1,144 @@
+# api/catalog_cache.py
+
+"""
+Cache das respostas do catálogo (lista e detalhe de modelos 3D) para visitantes anónimos.
+
+Todos os visitantes anónimos recebem o mesmo resultado, por isso a resposta já renderizada é
+guardada na cache do Django com uma chave que depende da ação, do caminho, dos parâmetros e do
+formato pedido. Cada entrada é marcada com etiquetas (surrogate keys):
+
+- 'model:<id>' para cada modelo incluído na resposta (ou 'model:*' quando a resposta inclui
+  mais de CATALOG_CACHE_MAX_TAGS modelos);
+- 'list' em todas as listagens, que mudam quando um modelo entra ou sai do catálogo;
+- 'ordering:<campo>' nas listagens ordenadas por um contador (likes, downloads) ou pela
+  tendência, que mudam de ordem sempre que o valor de qualquer modelo muda.
+
+Cada etiqueta tem um token na cache. A entrada guarda os tokens que as suas etiquetas tinham
+quando foi criada e só é servida enquanto continuarem iguais: invalidate() troca os tokens das
+etiquetas afetadas (depois do commit) e invalida assim apenas as entradas que as usam.
+
+As respostas levam ETag (hash do conteúdo) e Cache-Control público com revalidação, pelo que
+browsers e CDNs podem revalidar com If-None-Match e receber um 304 sem corpo.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+LIST_TAG = 'list'
+ALL_MODELS_TAG = 'model:*'
+GENERATION_KEY = 'catalog:generation'
+
+# Ordenações por valores que mudam com frequência: uma alteração em qualquer modelo pode mudar a
+# ordem das páginas.
+COUNTER_ORDERINGS = ('likes', 'downloads', 'trending')
+
+
+def model_tag(pk):
+    return f'model:{pk}'
+
+
+def ordering_tag(field):
+    return f'ordering:{field}'
+
+
+def _tag_key(tag):
+    return f'catalog:tag:{tag}'
+
+
+def _entry_key(request, action):
+    params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+    raw = f'{action}|{request.path}|{params}|{request.accepted_media_type}'
+    return 'catalog:entry:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+# --- Etiquetas ---
+
+def _versions(tags):
+    """Devolve {etiqueta: token}, criando os tokens das etiquetas que ainda não existem."""
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        found.update(cache.get_many(missing))
+    return {keys[key]: token for key, token in found.items()}
+
+
+def _bump(tags):
+    cache.set_many({_tag_key(tag): uuid.uuid4().hex for tag in tags}, None)
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate(*tags, models=()):
+    """
+    Invalida as entradas marcadas com 'tags' ou com algum dos modelos indicados. Só é aplicado
+    depois do commit, para que um pedido concorrente não volte a guardar os dados antigos.
+    """
+    tags = set(tags) | {model_tag(pk) for pk in models}
+    if models:
+        tags.add(ALL_MODELS_TAG)
+    transaction.on_commit(lambda: _bump(tags))
+
+
+def _response_tags(request, action, data):
+    if action == 'retrieve':
+        return {model_tag(data['id'])}
+    items = data.get('results', []) if isinstance(data, dict) else data
+    if len(items) > settings.CATALOG_CACHE_MAX_TAGS:
+        tags = {ALL_MODELS_TAG}
+    else:
+        tags = {model_tag(item['id']) for item in items}
+    tags.add(LIST_TAG)
+    for field in request.query_params.get('ordering', '').split(','):
+        field = field.strip().lstrip('-')
+        if field in COUNTER_ORDERINGS:
+            tags.add(ordering_tag(field))
+    return tags
+
+
+# --- Respostas ---
+
+def _respond(request, entry):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Surrogate-Key'] = ' '.join(sorted(entry['versions']))
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True,
+                        s_maxage=settings.CATALOG_CACHE_CDN_MAX_AGE)
+    patch_vary_headers(response, ('Accept', 'Authorization', 'Cookie'))
+    return get_conditional_response(request, etag=entry['etag'], response=response)
+
+
+def cached_response(request, action, render):
+    """
+    Devolve a resposta em cache para um pedido anónimo ou, se não existir ou estiver
+    invalidada, chama render() (que devolve uma Response do DRF já renderizada) e guarda-a.
+    Só as respostas 200 são guardadas.
+    """
+    key = _entry_key(request, action)
+    entry = cache.get(key)
+    if entry is not None and _versions(entry['versions']) == entry['versions']:
+        return _respond(request, entry)
+
+    generation = cache.get(GENERATION_KEY)
+    response = render()
+    if response.status_code != 200:
+        return response
+    content = response.content
+    entry = {
+        'content': content,
+        'content_type': response['Content-Type'],
+        'etag': f'"{hashlib.sha1(content).hexdigest()}"',
+        'versions': _versions(_response_tags(request, action, response.data)),
+    }
+    # Se houve uma invalidação enquanto a resposta era gerada, os dados podem já estar
+    # desatualizados: a resposta é servida, mas não fica em cache.
+    if cache.get(GENERATION_KEY) == generation:
+        cache.set(key, entry, settings.CATALOG_CACHE_TTL)
+    return _respond(request, entry)
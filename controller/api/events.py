@@ -0,0 +1,141 @@
+# api/events.py
+
+"""
+Fila de eventos de gamificação.
+
+Os pedidos só registam o facto ocorrido (ex: "garrafas recicladas") com emit(). A experiência,
+o histórico mensal, os quadros de classificação e as conquistas são tratados depois, por um
+worker (comando 'process_gamification_events') ou, com GAMIFICATION_EVENTS_EAGER, logo a seguir
+no próprio pedido.
+
+Garantias:
+- Idempotência: cada evento tem uma chave única e o processamento marca-o como 'done' na mesma
+  transação em que aplica os efeitos, pelo que um evento nunca é aplicado duas vezes.
+- Ordem por utilizador: os eventos de um utilizador são processados por ordem de id. Cada worker
+  de um pool trata apenas os utilizadores da sua partição (user_id % workers) e, se um evento
+  falhar, os seguintes do mesmo utilizador ficam à espera da próxima passagem.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import GamificationEvent, RecyclingHistory
+from .services import add_experience, lock_users, update_user_achievements
+from . import leaderboards
+
+logger = logging.getLogger(__name__)
+
+
+# --- Handlers ---
+
+def _on_bottles_recycled(event, user):
+    """Experiência, histórico mensal, quadros de classificação e conquistas de uma reciclagem."""
+    quantity = event.payload['quantity']
+    leveled_up = add_experience(user, xp_amount=event.payload['xp'])
+
+    month = timezone.localdate(event.created_at).replace(day=1)
+    history, _ = RecyclingHistory.objects.get_or_create(user=user, month=month)
+    RecyclingHistory.objects.filter(pk=history.pk).update(quantity=F('quantity') + quantity)
+    leaderboards.record(user, 'bottles', quantity, when=event.created_at)
+
+    return {'level': user.level, 'leveled_up': leveled_up,
+            'new_achievements': update_user_achievements(user)}
+
+
+def _on_model_uploaded(event, user):
+    """Experiência e conquistas pela publicação de um modelo."""
+    leveled_up = add_experience(user, xp_amount=event.payload['xp'])
+    return {'level': user.level, 'leveled_up': leveled_up,
+            'new_achievements': update_user_achievements(user)}
+
+
+def _on_model_deleted(event, user):
+    """Recalcula o progresso das conquistas depois de um modelo ser apagado (sem retirar XP)."""
+    return {'level': user.level, 'leveled_up': False,
+            'new_achievements': update_user_achievements(user)}
+
+
+HANDLERS = {
+    'bottles_recycled': _on_bottles_recycled,
+    'model_uploaded': _on_model_uploaded,
+    'model_deleted': _on_model_deleted,
+}
+
+
+# --- Emissão e processamento ---
+
+def emit(user, kind, payload, key):
+    """
+    Regista um evento. Se já existir um evento com a mesma chave, não faz nada.
+
+    Returns:
+        dict | None: Resultado do handler quando o processamento é imediato
+        (GAMIFICATION_EVENTS_EAGER); None quando o evento fica na fila.
+    """
+    try:
+        with transaction.atomic():
+            event = GamificationEvent.objects.create(user=user, kind=kind, payload=payload, idempotency_key=key)
+    except IntegrityError:
+        return None
+    if not settings.GAMIFICATION_EVENTS_EAGER:
+        return None
+    return process_user(user.pk).get(event.pk)
+
+
+def _process(event):
+    """
+    Aplica um evento. Devolve ('done', resultado), ('skipped', None) se outro processo já o
+    tratou, ou ('retry', None) se falhou e deve bloquear os eventos seguintes do utilizador.
+    """
+    try:
+        with transaction.atomic():
+            claimed = GamificationEvent.objects.filter(pk=event.pk, status='pending').update(
+                status='done', processed_at=timezone.now(), attempts=F('attempts') + 1)
+            if not claimed:
+                return 'skipped', None
+            user = lock_users(event.user_id)[event.user_id]
+            return 'done', HANDLERS[event.kind](event, user)
+    except Exception as exc:
+        logger.exception("Falha ao processar o evento de gamificação %s.", event.pk)
+        attempts = event.attempts + 1
+        failed = attempts >= settings.GAMIFICATION_EVENT_MAX_ATTEMPTS
+        GamificationEvent.objects.filter(pk=event.pk, status='pending').update(
+            attempts=attempts, last_error=str(exc), status='failed' if failed else 'pending')
+        return ('skipped' if failed else 'retry'), None
+
+
+def _run(events):
+    """Processa os eventos pela ordem dada, parando cada utilizador no primeiro que falhar."""
+    blocked = set()
+    results = {}
+    for event in events:
+        if event.user_id in blocked:
+            continue
+        outcome, result = _process(event)
+        if outcome == 'done':
+            results[event.pk] = result
+        elif outcome == 'retry':
+            blocked.add(event.user_id)
+    return results
+
+
+def process_user(user_id):
+    """Processa todos os eventos pendentes de um utilizador. Devolve {event_id: resultado}."""
+    return _run(GamificationEvent.objects.filter(status='pending', user_id=user_id).order_by('id'))
+
+
+def process_pending(worker=0, workers=1, batch_size=100):
+    """
+    Processa um lote de eventos pendentes da partição 'worker' (de 'workers').
+
+    Returns:
+        int: Número de eventos aplicados.
+    """
+    events = GamificationEvent.objects.filter(status='pending')
+    if workers > 1:
+        events = events.annotate(partition=F('user_id') % workers).filter(partition=worker)
+    return len(_run(list(events.order_by('id')[:batch_size])))
@@ -0,0 +1,118 @@
+# api/expiry.py
+
+"""
+Expiração de ofertas de moedas e solicitações de troca que ficaram paradas.
+
+As moedas de uma oferta ativa ou de uma troca pendente ficam na conta de reserva. Depois do
+tempo de vida configurado (COIN_OFFER_TTL / EXCHANGE_REQUEST_TTL), as linhas são marcadas como
+'expired' em lotes, as moedas voltam ao dono num único lançamento por lote e cada devolução
+fica registada como uma CoinTransaction do tipo 'refund'.
+
+Cada lote segue a mesma ordem de bloqueio das views (linhas do marketplace e depois os
+utilizadores, por id) e só toca em linhas que ainda estão no estado inicial, pelo que pode
+correr em paralelo com as compras, cancelamentos e respostas a trocas.
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import ledger
+from .models import CoinOffer, CoinTransaction, ExchangeRequest
+from .services import lock_users
+
+
+def _lock_batch(queryset, batch_size):
+    """Bloqueia o próximo lote, saltando as linhas que outra transação já tem bloqueadas."""
+    if connection.features.has_select_for_update_skip_locked:
+        queryset = queryset.select_for_update(skip_locked=True)
+    else:
+        queryset = queryset.select_for_update()
+    return list(queryset.order_by('created_at', 'pk')[:batch_size])
+
+
+def expire_offers(now=None, batch_size=500):
+    """
+    Expira as ofertas ativas mais antigas do que COIN_OFFER_TTL e devolve as moedas aos vendedores.
+
+    Returns:
+        int: Número de ofertas expiradas.
+    """
+    if settings.COIN_OFFER_TTL is None:
+        return 0
+    now = now or timezone.now()
+    cutoff = now - settings.COIN_OFFER_TTL
+    expired = 0
+
+    while True:
+        with transaction.atomic():
+            offers = _lock_batch(CoinOffer.objects.filter(status='active', created_at__lt=cutoff), batch_size)
+            if not offers:
+                break
+            lock_users(*(offer.seller_id for offer in offers))
+
+            CoinOffer.objects.filter(pk__in=[offer.pk for offer in offers], status='active').update(
+                status='expired', updated_at=now)
+            postings = []
+            for offer in offers:
+                postings += ledger.transfer(offer.coin_type, offer.amount, ledger.ESCROW, offer.seller_id)
+            ledger.post('offer_expired', postings, reference=f'offers:{offers[0].pk}-{offers[-1].pk}')
+            CoinTransaction.objects.bulk_create([
+                CoinTransaction(
+                    sender=None, receiver_id=offer.seller_id, offer=offer,
+                    coin_type=offer.coin_type, amount=offer.amount,
+                    transaction_type='refund', notes="Devolução de oferta expirada",
+                )
+                for offer in offers
+            ])
+
+        expired += len(offers)
+        if len(offers) < batch_size:
+            break
+    return expired
+
+
+def expire_exchange_requests(now=None, batch_size=500):
+    """
+    Expira as solicitações de troca pendentes mais antigas do que EXCHANGE_REQUEST_TTL e
+    devolve as moedas oferecidas aos solicitantes.
+
+    Returns:
+        int: Número de solicitações expiradas.
+    """
+    if settings.EXCHANGE_REQUEST_TTL is None:
+        return 0
+    now = now or timezone.now()
+    cutoff = now - settings.EXCHANGE_REQUEST_TTL
+    expired = 0
+
+    while True:
+        with transaction.atomic():
+            requests = _lock_batch(
+                ExchangeRequest.objects.filter(status='pending', created_at__lt=cutoff), batch_size)
+            if not requests:
+                break
+            lock_users(*(request.requester_id for request in requests))
+
+            ExchangeRequest.objects.filter(pk__in=[request.pk for request in requests], status='pending').update(
+                status='expired', updated_at=now)
+            postings = []
+            refunds = []
+            for request in requests:
+                for coin_type, amount in (('recycling', request.offer_recycling_coins),
+                                          ('reputation', request.offer_reputation_coins)):
+                    if amount <= 0:
+                        continue
+                    postings += ledger.transfer(coin_type, amount, ledger.ESCROW, request.requester_id)
+                    refunds.append(CoinTransaction(
+                        sender=None, receiver_id=request.requester_id,
+                        coin_type=coin_type, amount=amount, transaction_type='refund',
+                        notes=f"Devolução de troca expirada (ID: {request.pk})",
+                    ))
+            ledger.post('exchange_expired', postings, reference=f'exchanges:{requests[0].pk}-{requests[-1].pk}')
+            CoinTransaction.objects.bulk_create(refunds)
+
+        expired += len(requests)
+        if len(requests) < batch_size:
+            break
+    return expired
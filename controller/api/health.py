@@ -0,0 +1,88 @@
+# api/health.py
+
+"""
+Verificação do estado da base de dados para o endpoint 'health/'.
+
+Mede a latência de uma consulta trivial e recolhe as estatísticas do perfil em uso
+(ver controller/database.py): no SQLite, os PRAGMAs efetivos, o tamanho do ficheiro WAL e os
+indicadores de contenção (resultado de um checkpoint passivo e erros "database is locked"
+contados pela instrumentação); no PostgreSQL, as estatísticas do pool de ligações e os
+bloqueios ativos ou em espera.
+"""
+
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+SQLITE_PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size')
+
+
+def _sqlite_stats(cursor):
+    stats = {}
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {pragma}')
+        stats[pragma] = cursor.fetchone()[0]
+    # Um WAL que não para de crescer indica que há leitores longos a impedir os checkpoints.
+    wal_path = f"{connection.settings_dict['NAME']}-wal"
+    if stats['journal_mode'] == 'wal' and os.path.exists(wal_path):
+        stats['wal_bytes'] = os.path.getsize(wal_path)
+    # Checkpoint passivo: não espera por ninguém. 'busy' = 1 se um leitor ou escritor o impediu
+    # de terminar; 'log' - 'checkpointed' são as páginas do WAL que ficaram por copiar.
+    # Dentro de uma transação o SQLite recusa o checkpoint, por isso fica a None.
+    stats['wal_checkpoint'] = None
+    if not connection.in_atomic_block:
+        cursor.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        busy, log, checkpointed = cursor.fetchone()
+        stats['wal_checkpoint'] = {'busy': busy, 'log': log, 'checkpointed': checkpointed}
+    # Só contados com a instrumentação ativa (API_INSTRUMENTATION); None quando está desligada.
+    stats['lock_errors'] = instrumentation.lock_errors() if settings.API_INSTRUMENTATION else None
+    return stats
+
+
+def _postgres_stats(cursor):
+    stats = {}
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        stats['pool'] = pool.get_stats()
+    cursor.execute(
+        "SELECT mode, granted, count(*) FROM pg_locks "
+        "WHERE database = (SELECT oid FROM pg_database WHERE datname = current_database()) "
+        "GROUP BY mode, granted")
+    stats['locks'] = [{'mode': mode, 'granted': granted, 'count': count} for mode, granted, count in cursor.fetchall()]
+    cursor.execute(
+        "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() AND wait_event_type = 'Lock'")
+    stats['waiting_on_locks'] = cursor.fetchone()[0]
+    cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+    stats['connections'] = cursor.fetchone()[0]
+    return stats
+
+
+def database_health(details=False):
+    """
+    Devolve {'ok', 'vendor', 'latency_ms'} e, com details=True, as estatísticas do perfil
+    ('conn_max_age' e os dados específicos do SQLite ou do PostgreSQL).
+    """
+    result = {'ok': True, 'vendor': connection.vendor}
+    try:
+        with connection.cursor() as cursor:
+            start = time.perf_counter()
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            result['latency_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            if details:
+                result['conn_max_age'] = connection.settings_dict['CONN_MAX_AGE']
+                if connection.vendor == 'sqlite':
+                    result.update(_sqlite_stats(cursor))
+                elif connection.vendor == 'postgresql':
+                    result.update(_postgres_stats(cursor))
+    except DatabaseError as exc:
+        logger.error("Verificação da base de dados falhou: %s", exc)
+        result.update(ok=False, error=str(exc))
+    return result
@@ -0,0 +1,101 @@
+# api/index_audit.py
+
+"""
+Auditoria de índices: corre EXPLAIN sobre os querysets das views principais e assinala as
+leituras completas de tabelas (SCAN no SQLite, Seq Scan no PostgreSQL) e as ordenações feitas
+fora de um índice.
+
+Os querysets são obtidos das próprias views (get_queryset com um pedido do utilizador
+indicado), pelo que uma alteração numa view que deixe de usar um índice é detetada aqui.
+"""
+
+import re
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import Q, Sum
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import views
+from .models import Bottle, CoinTransaction, Model3D
+
+# Tabelas pequenas e limitadas, em que uma leitura completa não é um problema.
+SMALL_TABLES = {'api_achievement'}
+
+FULL_SCAN_PATTERNS = (
+    re.compile(r'\bSCAN (?:TABLE )?(\w+)(?! USING (?:COVERING )?INDEX)(?!\w)'),  # SQLite
+    re.compile(r'Seq Scan on (\w+)'),  # PostgreSQL
+)
+SORT_PATTERNS = (
+    re.compile(r'USE TEMP B-TREE FOR (?:ORDER BY|RIGHT PART OF ORDER BY)'),
+    re.compile(r'^\s*(?:->\s*)?Sort\b', re.MULTILINE),
+)
+
+
+def _view_queryset(view_class, user, action='list', params=None, **kwargs):
+    """Devolve o queryset de uma view, tal como seria usado num pedido GET de 'user'."""
+    request = APIRequestFactory().get('/', params)
+    force_authenticate(request, user=user)
+    view = view_class(action_map={'get': action}) if hasattr(view_class, 'get_extra_actions') else view_class()
+    view.setup(request, **kwargs)
+    view.request = view.initialize_request(request, **kwargs)
+    view.format_kwarg = None
+    queryset = view.get_queryset()
+    ordering = getattr(getattr(view, 'pagination_class', None), 'ordering', None)
+    if ordering:
+        queryset = queryset.order_by(*([ordering] if isinstance(ordering, str) else ordering))
+    return queryset
+
+
+def _model_of(user):
+    return Model3D.objects.filter(user=user).values_list('pk', flat=True).first() or 0
+
+
+# Nome -> função que recebe o utilizador e devolve o queryset a analisar (já limitado a uma página).
+QUERIES = {
+    'catalog_anonymous': lambda user: Model3D.objects.filter(is_visible=True).order_by('-date', '-id')[:20],
+    'catalog_authenticated': lambda user: _view_queryset(views.Model3DViewSet, user)[:20],
+    'catalog_trending': lambda user: Model3D.objects.filter(is_visible=True).order_by('-trending_score', '-id')[:20],
+    'moderation_queue': lambda user: Model3D.objects.filter(review_state='pending').order_by('date', 'id')[:50],
+    'my_models': lambda user: _view_queryset(views.Model3DViewSet, user, 'my_models').filter(user=user)[:20],
+    'liked_models': lambda user: Model3D.objects.filter(modellike__user=user).order_by('-modellike__created_at')[:20],
+    'saved_models': lambda user: Model3D.objects.filter(
+        modelfavorite__user=user).order_by('-modelfavorite__created_at')[:20],
+    'model_comments': lambda user: _view_queryset(
+        views.CommentViewSet, user, params={'model': _model_of(user)})[:20],
+    'dashboard_bottles': lambda user: Bottle.objects.filter(user=user, date__year=datetime.now().year).values(
+        'date__month', 'type', 'volume').annotate(total=Sum('quantity')).order_by('date__month'),
+    'coin_offers': lambda user: _view_queryset(views.CoinOfferListCreateView, user)[:20],
+    'my_offers': lambda user: _view_queryset(views.MyOffersListView, user)[:20],
+    'transaction_history': lambda user: _view_queryset(views.TransactionHistoryView, user)[:20],
+    'sent_transactions': lambda user: CoinTransaction.objects.filter(sender=user).order_by('-transaction_date')[:20],
+    'exchange_requests': lambda user: _view_queryset(views.ExchangeRequestListCreateView, user)[:20],
+    'pending_exchange_requests': lambda user: views.ExchangeRequest.objects.filter(
+        Q(requester=user) | Q(receiver=user), status='pending').order_by('-created_at')[:20],
+}
+
+
+def analyse(plan):
+    """Devolve (tabelas lidas por inteiro, número de ordenações fora de índice) de um plano."""
+    full_scans = sorted({
+        table for pattern in FULL_SCAN_PATTERNS for table in pattern.findall(plan)
+        if table not in SMALL_TABLES
+    })
+    sorts = sum(len(pattern.findall(plan)) for pattern in SORT_PATTERNS)
+    return full_scans, sorts
+
+
+def audit(user, names=None):
+    """
+    Corre EXPLAIN sobre as consultas indicadas (por omissão, todas).
+
+    Returns:
+        list: Um dict por consulta com name, plan, full_scans e sorts.
+    """
+    results = []
+    for name in names or QUERIES:
+        plan = QUERIES[name](user).explain()
+        full_scans, sorts = analyse(plan)
+        results.append({'name': name, 'vendor': connection.vendor, 'plan': plan,
+                        'full_scans': full_scans, 'sorts': sorts})
+    return results
@@ -0,0 +1,174 @@
+# api/instrumentation.py
+
+"""
+Instrumentação opcional dos pedidos à API (settings.API_INSTRUMENTATION).
+
+Para cada view e ação (ex: "Model3DViewSet.list") regista o número de consultas SQL, o tempo
+passado na base de dados, o tempo de serialização (serializers e renderer do DRF), o tempo
+total e o tamanho da resposta, e conta as consultas que falham com "database is locked".
+Guarda as últimas API_INSTRUMENTATION_WINDOW amostras de cada endpoint em memória, calcula
+os percentis a pedido (endpoint 'instrumentation/', só para administradores) e grava um
+relatório em API_INSTRUMENTATION_DUMP quando o processo termina.
+"""
+
+import atexit
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import OperationalError, connection
+from rest_framework import renderers, serializers
+
+METRICS = ('queries', 'db_ms', 'serialization_ms', 'total_ms', 'response_bytes')
+
+_samples = defaultdict(lambda: deque(maxlen=settings.API_INSTRUMENTATION_WINDOW))
+_lock_errors = 0
+_lock = threading.Lock()
+_current = ContextVar('instrumentation_sample', default=None)
+_installed = False
+
+
+# --- Medição ---
+
+def _timed_serialization(function):
+    """Soma ao pedido atual o tempo gasto em 'function', sem contar duas vezes as chamadas aninhadas."""
+    def wrapper(*args, **kwargs):
+        sample = _current.get()
+        if sample is None or sample['_depth']:
+            return function(*args, **kwargs)
+        sample['_depth'] += 1
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            sample['serialization_ms'] += (time.perf_counter() - start) * 1000
+            sample['_depth'] -= 1
+    return wrapper
+
+
+def install():
+    """Instala a medição do tempo de serialização nos serializers e no renderer JSON do DRF."""
+    global _installed
+    if _installed:
+        return
+    data = serializers.BaseSerializer.data
+    serializers.BaseSerializer.data = property(_timed_serialization(data.fget))
+    renderers.JSONRenderer.render = _timed_serialization(renderers.JSONRenderer.render)
+    if settings.API_INSTRUMENTATION_DUMP:
+        atexit.register(dump, settings.API_INSTRUMENTATION_DUMP)
+    _installed = True
+
+
+def _endpoint_name(view_func, method):
+    """Nome do endpoint: classe da view e ação do ViewSet (ou o método HTTP)."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None) or {}
+    return f"{view_class.__name__}.{actions.get(method.lower(), method.lower())}"
+
+
+class InstrumentationMiddleware:
+    """Mede cada pedido a uma view e guarda a amostra no endpoint correspondente."""
+
+    def __init__(self, get_response):
+        if not settings.API_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample = {'queries': 0, 'db_ms': 0.0, 'serialization_ms': 0.0, '_depth': 0, '_endpoint': None}
+        token = _current.set(sample)
+
+        def count_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            except OperationalError as exc:
+                # "database is locked": o SQLite esgotou o busy_timeout à espera do bloqueio de escrita.
+                if 'is locked' in str(exc):
+                    record_lock_error()
+                raise
+            finally:
+                sample['queries'] += 1
+                sample['db_ms'] += (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_query):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        sample['total_ms'] = (time.perf_counter() - start) * 1000
+
+        if sample['_endpoint']:
+            if response.streaming:
+                sample['response_bytes'] = int(response.get('Content-Length') or 0)
+            else:
+                sample['response_bytes'] = len(response.content)
+            record(sample['_endpoint'], sample)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        sample = _current.get()
+        if sample is not None:
+            sample['_endpoint'] = _endpoint_name(view_func, request.method)
+
+
+# --- Agregação ---
+
+def record(endpoint, sample):
+    """Acrescenta uma amostra à janela do endpoint."""
+    row = tuple(sample[metric] for metric in METRICS)
+    with _lock:
+        _samples[endpoint].append(row)
+
+
+def record_lock_error():
+    """Conta um erro "database is locked" (ver lock_errors)."""
+    global _lock_errors
+    with _lock:
+        _lock_errors += 1
+
+
+def lock_errors():
+    """Número de consultas que falharam com "database is locked" desde o arranque (ou o último reset)."""
+    return _lock_errors
+
+
+def report():
+    """Devolve, por endpoint, o número de amostras e os percentis 50/95/99 de cada métrica."""
+    with _lock:
+        snapshot = {endpoint: np.array(rows, dtype=float) for endpoint, rows in _samples.items() if rows}
+    result = {}
+    for endpoint, rows in sorted(snapshot.items()):
+        percentiles = np.percentile(rows, [50, 95, 99], axis=0)
+        result[endpoint] = {
+            'count': len(rows),
+            **{metric: {'p50': round(percentiles[0][i], 2), 'p95': round(percentiles[1][i], 2),
+                        'p99': round(percentiles[2][i], 2)}
+               for i, metric in enumerate(METRICS)},
+        }
+    return result
+
+
+def reset():
+    """Descarta todas as amostras e a contagem de erros de bloqueio."""
+    global _lock_errors
+    with _lock:
+        _samples.clear()
+        _lock_errors = 0
+
+
+def dump(path):
+    """Grava o relatório atual num ficheiro JSON (chamado ao terminar o processo)."""
+    data = report()
+    if data:
+        with open(path, 'w', encoding='utf-8') as output:
+            json.dump(data, output, indent=2, ensure_ascii=False)
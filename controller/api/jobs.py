@@ -0,0 +1,223 @@
+# api/jobs.py
+
+"""
+Tarefas em segundo plano guardadas na base de dados.
+
+Os pedidos só registam o trabalho pesado com enqueue(); o comando 'run_jobs' executa-o depois,
+com um pool de threads ou de processos. Com JOBS_EAGER, as tarefas correm logo a seguir ao
+commit, no próprio pedido (útil em desenvolvimento quando não há worker a correr).
+
+Garantias:
+- Uma tarefa criada dentro de uma transação só existe se a transação fizer commit.
+- Só há uma tarefa pendente ou em execução por chave (restrição única 'job_active_key_uniq').
+- Cada tarefa é reclamada com um UPDATE condicional ('pending' -> 'running'), pelo que nunca
+  corre em dois workers ao mesmo tempo. Cada worker de um pool trata apenas as tarefas da sua
+  partição (id % workers).
+- Uma tarefa que falha volta à fila depois de JOBS['BACKOFF_SECONDS'] · 2^(tentativas - 1)
+  segundos (até JOBS['BACKOFF_MAX_SECONDS']) e fica 'failed' ao fim de JOBS['MAX_ATTEMPTS'].
+- As tarefas 'running' há mais de JOBS['LOCK_TIMEOUT_SECONDS'] (worker que morreu) voltam à fila.
+"""
+
+import datetime
+import io
+import logging
+import os
+import socket
+import threading
+import zipfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image
+
+from .models import Job, Model3D, ModelFile, ModelImage
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Regista a função que executa as tarefas do tipo 'kind'. Recebe o payload e devolve o resultado."""
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+# --- Handlers ---
+
+@handler('thumbnails')
+def _thumbnails(payload):
+    """Gera as miniaturas em falta das imagens de um modelo."""
+    size = settings.JOBS['THUMBNAIL_SIZE']
+    created = 0
+    for image in ModelImage.objects.filter(model3d_id=payload['model'], thumbnail=''):
+        with image.image.open('rb') as source, Image.open(source) as picture:
+            picture.thumbnail(size)
+            output = io.BytesIO()
+            picture.convert('RGB').save(output, format='JPEG', quality=85)
+        name = f"{os.path.splitext(os.path.basename(image.image.name))[0]}.jpg"
+        image.thumbnail.save(name, ContentFile(output.getvalue()), save=False)
+        ModelImage.objects.filter(pk=image.pk).update(thumbnail=image.thumbnail.name)
+        created += 1
+    return {'thumbnails': created}
+
+
+@handler('bundle_model')
+def _bundle_model(payload):
+    """
+    Gera o ZIP de download de um modelo com vários ficheiros. Se os ficheiros mudarem entretanto,
+    o ZIP é descartado (a alteração já pediu uma nova execução).
+    """
+    model = Model3D.objects.filter(pk=payload['model']).first()
+    if model is None:
+        return {'bundle': None}
+    files = list(ModelFile.objects.filter(model=model).order_by('id'))
+    if len(files) < 2:
+        return {'bundle': None}
+
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for model_file in files:
+            with model_file.file.open('rb') as content:
+                zf.writestr(os.path.basename(model_file.file.name), content.read())
+    name = default_storage.save(f"models3d/bundles/{model.pk}.zip", ContentFile(output.getvalue()))
+
+    with transaction.atomic():
+        current = list(ModelFile.objects.filter(model=model).order_by('id').values_list('pk', flat=True))
+        if current != [model_file.pk for model_file in files]:
+            default_storage.delete(name)
+            return {'bundle': None}
+        previous = Model3D.objects.filter(pk=model.pk).values_list('bundle', flat=True).first()
+        Model3D.objects.filter(pk=model.pk).update(bundle=name)
+    delete_files_later([previous])
+    return {'bundle': name}
+
+
+@handler('delete_files')
+def _delete_files(payload):
+    """Apaga do storage ficheiros que deixaram de estar associados a uma linha."""
+    for name in payload['names']:
+        default_storage.delete(name)
+    return {'deleted': len(payload['names'])}
+
+
+# --- Atalhos para as views ---
+
+def refresh_bundle(model_id):
+    """Descarta o ZIP de um modelo cujos ficheiros mudaram e pede um novo."""
+    previous = Model3D.objects.filter(pk=model_id).values_list('bundle', flat=True).first()
+    if previous:
+        Model3D.objects.filter(pk=model_id).update(bundle='')
+        delete_files_later([previous])
+    enqueue('bundle_model', {'model': model_id}, key=f'bundle:{model_id}')
+
+
+def delete_files_later(names):
+    """Agenda a remoção do storage de ficheiros cujas linhas foram apagadas."""
+    names = [name for name in names if name]
+    if names:
+        enqueue('delete_files', {'names': names})
+
+
+# --- Fila ---
+
+ACTIVE = ('pending', 'running')
+
+
+def enqueue(kind, payload=None, key='', delay=None):
+    """
+    Põe uma tarefa na fila. Com 'key', se já houver uma tarefa pendente com a mesma chave,
+    devolve-a; se estiver em execução, marca-a para voltar a correr quando terminar. A
+    restrição única 'job_active_key_uniq' garante isto mesmo com pedidos em simultâneo.
+
+    Returns:
+        Job: A tarefa criada ou a que já existia com a mesma chave.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Tipo de tarefa desconhecido: {kind!r}.")
+    run_after = timezone.now() + (delay or datetime.timedelta())
+    while True:
+        try:
+            with transaction.atomic():
+                job = Job.objects.create(kind=kind, payload=payload or {}, key=key, run_after=run_after)
+        except IntegrityError:
+            if not key:
+                raise
+            existing = Job.objects.filter(key=key, status__in=ACTIVE).first()
+            if existing is None:
+                continue  # Terminou entretanto: já se pode criar outra.
+            if existing.status == 'pending' or Job.objects.filter(
+                    pk=existing.pk, status='running').update(rerun=True):
+                return existing
+            continue
+        if settings.JOBS_EAGER:
+            transaction.on_commit(lambda: run(job))
+        return job
+
+
+def _backoff(attempts):
+    config = settings.JOBS
+    return datetime.timedelta(seconds=min(config['BACKOFF_SECONDS'] * 2 ** (attempts - 1),
+                                          config['BACKOFF_MAX_SECONDS']))
+
+
+def _worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def run(job):
+    """
+    Reclama e executa uma tarefa pendente.
+
+    Returns:
+        str: 'done', 'retry', 'failed' ou 'skipped' (outro worker já a reclamou).
+    """
+    claimed = Job.objects.filter(pk=job.pk, status='pending').update(
+        status='running', locked_by=_worker_name(), locked_at=timezone.now(), attempts=F('attempts') + 1)
+    if not claimed:
+        return 'skipped'
+    job.refresh_from_db(fields=['attempts'])
+    try:
+        result = HANDLERS[job.kind](job.payload)
+    except Exception as exc:
+        logger.exception("Falha na tarefa %s (%s).", job.pk, job.kind)
+        failed = job.attempts >= settings.JOBS['MAX_ATTEMPTS']
+        Job.objects.filter(pk=job.pk).update(
+            status='failed' if failed else 'pending', last_error=str(exc), locked_by='', locked_at=None,
+            run_after=timezone.now() + _backoff(job.attempts), finished_at=timezone.now() if failed else None)
+        return 'failed' if failed else 'retry'
+    finished = Job.objects.filter(pk=job.pk, rerun=False).update(
+        status='done', result=result, last_error='', finished_at=timezone.now(), locked_by='', locked_at=None)
+    if not finished:
+        # Foi pedida outra execução enquanto corria (ver enqueue).
+        Job.objects.filter(pk=job.pk).update(
+            status='pending', rerun=False, attempts=0, result=result, last_error='', run_after=timezone.now(),
+            locked_by='', locked_at=None)
+    return 'done'
+
+
+def requeue_stale():
+    """Devolve à fila as tarefas 'running' cujo worker deixou de dar sinal. Devolve quantas."""
+    limit = timezone.now() - datetime.timedelta(seconds=settings.JOBS['LOCK_TIMEOUT_SECONDS'])
+    return Job.objects.filter(status='running', locked_at__lt=limit).update(
+        status='pending', locked_by='', locked_at=None)
+
+
+def process_pending(worker=0, workers=1, batch_size=20):
+    """
+    Executa um lote de tarefas prontas da partição 'worker' (de 'workers').
+
+    Returns:
+        int: Número de tarefas executadas (com sucesso ou não).
+    """
+    jobs = Job.objects.filter(status='pending', run_after__lte=timezone.now())
+    if workers > 1:
+        jobs = jobs.annotate(partition=F('id') % workers).filter(partition=worker)
+    outcomes = [run(job) for job in jobs.order_by('id')[:batch_size]]
+    return sum(outcome != 'skipped' for outcome in outcomes)
@@ -0,0 +1,123 @@
+# api/leaderboards.py
+
+"""
+Quadros de classificação pré-calculados (semanal, mensal e geral).
+
+Cada evento (garrafas recicladas, experiência ganha) incrementa a pontuação do utilizador
+nos quadros do período corrente com um único UPDATE. As leituras percorrem o índice
+(metric, period, period_start, -score, user): o top-N é um intervalo desse índice e a
+posição de um utilizador é uma contagem no mesmo índice, sem ordenar a tabela de utilizadores.
+"""
+
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Bottle, CustomUser, LeaderboardEntry
+
+# Início fixo usado pelos quadros gerais, que têm um único período.
+ALL_TIME_START = datetime.date(2000, 1, 1)
+
+# Períodos mantidos para cada métrica.
+BOARDS = {
+    'bottles': ('weekly', 'monthly', 'all_time'),
+    'experience': ('all_time',),
+}
+
+
+def period_start(period, day):
+    """Devolve o primeiro dia do período que contém 'day' (semanas começam à segunda-feira)."""
+    if period == 'weekly':
+        return day - datetime.timedelta(days=day.weekday())
+    if period == 'monthly':
+        return day.replace(day=1)
+    return ALL_TIME_START
+
+
+def record(user, metric, amount, when=None):
+    """
+    Soma 'amount' à pontuação do utilizador em todos os quadros correntes da métrica.
+    No caso comum (linhas já existentes) é um único UPDATE.
+    """
+    if not amount:
+        return
+    user_id = getattr(user, 'pk', user)
+    day = timezone.localdate(when) if when else timezone.localdate()
+    keys = [(period, period_start(period, day)) for period in BOARDS[metric]]
+
+    condition = Q()
+    for period, start in keys:
+        condition |= Q(period=period, period_start=start)
+    entries = LeaderboardEntry.objects.filter(condition, metric=metric, user_id=user_id)
+    if entries.update(score=F('score') + amount, updated_at=timezone.now()) == len(keys):
+        return
+
+    existing = set(entries.values_list('period', flat=True))
+    for period, start in keys:
+        if period in existing:
+            continue
+        try:
+            with transaction.atomic():
+                LeaderboardEntry.objects.create(
+                    metric=metric, period=period, period_start=start, user_id=user_id, score=amount)
+        except IntegrityError:
+            # Outro pedido criou a linha entretanto; soma-se a ela.
+            LeaderboardEntry.objects.filter(
+                metric=metric, period=period, period_start=start, user_id=user_id
+            ).update(score=F('score') + amount)
+
+
+def board(metric, period, day=None):
+    """Devolve as linhas de um quadro, já na ordem da classificação."""
+    start = period_start(period, day or timezone.localdate())
+    return LeaderboardEntry.objects.filter(
+        metric=metric, period=period, period_start=start
+    ).order_by('-score', 'user_id')
+
+
+def rank_of(user, metric, period, day=None):
+    """
+    Devolve {'rank', 'score'} do utilizador num quadro, ou None se ele não pontuou no período.
+    A posição são duas contagens no índice do quadro (pontuações maiores e empates com id menor).
+    """
+    entries = board(metric, period, day)
+    user_id = getattr(user, 'pk', user)
+    score = entries.filter(user_id=user_id).values_list('score', flat=True).first()
+    if score is None:
+        return None
+    ahead = entries.filter(score__gt=score).count() + entries.filter(score=score, user_id__lt=user_id).count()
+    return {'rank': ahead + 1, 'score': score}
+
+
+def rebuild(batch_size=5000):
+    """
+    Recalcula todos os quadros a partir dos dados de origem (garrafas e experiência dos
+    utilizadores). Útil para a carga inicial ou depois de correções manuais.
+    """
+    rows = []
+    for period, trunc in (('weekly', TruncWeek), ('monthly', TruncMonth), ('all_time', None)):
+        bottles = Bottle.objects.all()
+        if trunc:
+            bottles = bottles.annotate(start=trunc('date'))
+            totals = bottles.values_list('user_id', 'start').annotate(total=Sum('quantity')).order_by()
+        else:
+            totals = bottles.values_list('user_id').annotate(total=Sum('quantity')).order_by()
+            totals = ((user_id, ALL_TIME_START, total) for user_id, total in totals)
+        for user_id, start, total in totals:
+            if isinstance(start, datetime.datetime):
+                start = timezone.localtime(start).date()
+            rows.append(LeaderboardEntry(metric='bottles', period=period, period_start=start,
+                                         user_id=user_id, score=total))
+
+    users = CustomUser.objects.filter(total_experience__gt=0).values_list('pk', 'total_experience')
+    for user_id, score in users.iterator(chunk_size=batch_size):
+        rows.append(LeaderboardEntry(metric='experience', period='all_time', period_start=ALL_TIME_START,
+                                     user_id=user_id, score=score))
+
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
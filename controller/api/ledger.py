@@ -0,0 +1,334 @@
+# api/ledger.py
+
+"""
+Livro-razão de partidas dobradas da economia interna.
+
+Todas as alterações de saldo passam por post(): cada operação gera um LedgerJournal com
+entradas cuja soma, por tipo de moeda, é zero. As contas são os utilizadores ou uma das
+contas de sistema (emissão, reserva, consumo e ajuste). Os campos 'recycling_coins' e
+'reputation_coins' de CustomUser continuam a ser o saldo de consulta rápida e são
+atualizados na mesma transação, diretamente na base de dados.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Sum, When
+from django.utils import timezone
+
+from .models import BalanceSnapshot, CustomUser, LedgerEntry, LedgerJournal
+
+# Contas de sistema
+MINT = 'mint'              # Origem das moedas emitidas (reciclagem, conquistas)
+ESCROW = 'escrow'          # Moedas reservadas em ofertas e trocas pendentes
+BURN = 'burn'              # Moedas gastas (downloads de modelos pagos)
+ADJUSTMENT = 'adjustment'  # Correções feitas no painel de administração
+
+# Utilizadores por UPDATE quando as variações de saldo são aplicadas com CASE.
+BALANCE_UPDATE_CHUNK = 500
+
+COIN_FIELDS = {
+    'recycling': 'recycling_coins',
+    'reputation': 'reputation_coins',
+}
+
+
+class InsufficientBalance(Exception):
+    """Um lançamento deixaria o saldo de um utilizador negativo."""
+
+
+def transfer(coin_type, amount, source, destination):
+    """
+    Devolve as duas pernas (débito na origem, crédito no destino) de uma transferência.
+    As contas podem ser um utilizador, o id de um utilizador ou o nome de uma conta de sistema.
+    """
+    if not amount:
+        return []
+    return [(source, coin_type, -amount), (destination, coin_type, amount)]
+
+
+def _account(account):
+    """Normaliza uma conta para o par (user_id, system_account)."""
+    if isinstance(account, str):
+        return None, account
+    return getattr(account, 'pk', account), ''
+
+
+def post(reason, postings, reference=''):
+    """
+    Regista um lançamento e aplica as variações de saldo aos utilizadores envolvidos.
+
+    Args:
+        reason: Um dos motivos de LedgerJournal.REASON_CHOICES.
+        postings: Lista de (conta, coin_type, amount), normalmente construída com transfer().
+        reference: Identificador do objeto de origem (ex: "offer:12").
+
+    Returns:
+        O LedgerJournal criado, ou None se não houver movimentos.
+
+    Raises:
+        InsufficientBalance: se algum débito deixar um utilizador com saldo negativo.
+            A transação é revertida, pelo que nada fica registado.
+    """
+    postings = [posting for posting in postings if posting[2]]
+    if not postings:
+        return None
+
+    totals = defaultdict(int)
+    for _, coin_type, amount in postings:
+        totals[coin_type] += amount
+    if any(totals.values()):
+        raise ValueError(f"Lançamento desequilibrado ({reason}): {dict(totals)}")
+
+    now = timezone.now()
+    deltas = defaultdict(lambda: defaultdict(int))
+    entries = []
+    with transaction.atomic():
+        journal = LedgerJournal.objects.create(reason=reason, reference=reference)
+        for account, coin_type, amount in postings:
+            user_id, system_account = _account(account)
+            entries.append(LedgerEntry(
+                journal=journal, user_id=user_id, system_account=system_account,
+                coin_type=coin_type, amount=amount, created_at=now,
+            ))
+            if user_id is not None:
+                deltas[user_id][COIN_FIELDS[coin_type]] += amount
+        LedgerEntry.objects.bulk_create(entries)
+        _apply_balances(deltas)
+    return journal
+
+
+def _apply_balances(deltas):
+    """
+    Aplica as variações de saldo de vários utilizadores com um UPDATE por bloco de utilizadores.
+    Os débitos são condicionados ao saldo atual, pelo que nunca ficam negativos.
+    Quando muitos utilizadores recebem a mesma variação (ex: recompensas em massa), é feito
+    um UPDATE por variação distinta, com um IN, em vez de um CASE com uma linha por utilizador.
+    """
+    deltas = {user_id: changes for user_id, changes in deltas.items() if any(changes.values())}
+    if not deltas:
+        return
+
+    groups = defaultdict(list)
+    for user_id, changes in deltas.items():
+        groups[tuple(sorted((field, delta) for field, delta in changes.items() if delta))].append(user_id)
+    if len(groups) < len(deltas):
+        updated = 0
+        for changes, user_ids in groups.items():
+            guards = {f'{field}__gte': -delta for field, delta in changes if delta < 0}
+            updated += CustomUser.objects.filter(pk__in=user_ids, **guards).update(
+                **{field: F(field) + delta for field, delta in changes})
+        if updated != len(deltas):
+            raise InsufficientBalance("Saldo insuficiente para concluir a operação.")
+        return
+
+    # Os débitos distintos são aplicados em blocos de BALANCE_UPDATE_CHUNK utilizadores, todos na
+    # transação de post(): a condição de cada débito entra numa cadeia de OR e, com muitos
+    # utilizadores, a expressão ultrapassaria a profundidade máxima do SQLite (1000).
+    items = list(deltas.items())
+    for start in range(0, len(items), BALANCE_UPDATE_CHUNK):
+        chunk = dict(items[start:start + BALANCE_UPDATE_CHUNK])
+        if _apply_chunk(chunk) != len(chunk):
+            raise InsufficientBalance("Saldo insuficiente para concluir a operação.")
+
+
+def _apply_chunk(deltas):
+    """Aplica as variações de um bloco de utilizadores num UPDATE com CASE. Devolve as linhas alteradas."""
+    # Os utilizadores que só recebem entram num único IN; só os débitos precisam de condição própria.
+    credited = {user_id for user_id, changes in deltas.items() if min(changes.values()) >= 0}
+    condition = Q(pk__in=credited)
+    for user_id, changes in deltas.items():
+        if user_id in credited:
+            continue
+        user_condition = Q(pk=user_id)
+        for field, delta in changes.items():
+            if delta < 0:
+                user_condition &= Q(**{f'{field}__gte': -delta})
+        condition |= user_condition
+
+    updates = {}
+    for field in COIN_FIELDS.values():
+        whens = [When(pk=user_id, then=F(field) + changes[field])
+                 for user_id, changes in deltas.items() if changes.get(field)]
+        if whens:
+            updates[field] = Case(*whens, default=F(field), output_field=IntegerField())
+    return CustomUser.objects.filter(condition).update(**updates)
+
+
+def close_account(user):
+    """
+    Prepara a remoção de um utilizador sem desequilibrar o livro-razão: devolve as moedas
+    reservadas nas suas ofertas ativas e trocas pendentes (que ficam canceladas), retira o
+    saldo restante para a conta de consumo e guarda o id e o nome do utilizador nas suas
+    entradas, que deixam de apontar para ele quando for apagado.
+
+    Returns:
+        O LedgerJournal de encerramento, ou None se não houver movimentos.
+    """
+    from .models import CoinOffer, ExchangeRequest
+
+    with transaction.atomic():
+        user = CustomUser.objects.select_for_update().get(pk=user.pk)
+        offers = list(CoinOffer.objects.select_for_update().filter(seller=user, status='active'))
+        requests = list(ExchangeRequest.objects.select_for_update().filter(
+            Q(requester=user) | Q(receiver=user), status='pending'))
+
+        balances = {coin_type: getattr(user, field) for coin_type, field in COIN_FIELDS.items()}
+        refunds = [(offer.seller_id, offer.coin_type, offer.amount) for offer in offers]
+        for request in requests:
+            refunds += [(request.requester_id, 'recycling', request.offer_recycling_coins),
+                        (request.requester_id, 'reputation', request.offer_reputation_coins)]
+        postings = []
+        for user_id, coin_type, amount in refunds:
+            postings += transfer(coin_type, amount, ESCROW, user_id)
+            if user_id == user.pk:
+                balances[coin_type] += amount
+        for coin_type, balance in balances.items():
+            postings += transfer(coin_type, balance, user, BURN)
+
+        CoinOffer.objects.filter(pk__in=[offer.pk for offer in offers]).update(status='cancelled')
+        ExchangeRequest.objects.filter(pk__in=[request.pk for request in requests]).update(status='cancelled')
+        journal = post('account_closed', postings, reference=f'user:{user.pk}')
+        LedgerEntry.objects.filter(user=user).update(former_user_id=user.pk, former_username=user.username)
+    return journal
+
+
+# --- Snapshots e consultas de saldo ---
+
+def latest_watermark():
+    """Devolve o 'last_entry_id' do snapshot mais recente (0 se ainda não houver nenhum)."""
+    return BalanceSnapshot.objects.aggregate(watermark=Max('last_entry_id'))['watermark'] or 0
+
+
+def snapshot_balances(settle_seconds=60, batch_size=5000):
+    """
+    Regista o saldo de todos os utilizadores com movimentos até à última entrada do livro-razão.
+
+    Parte do snapshot anterior e soma apenas as entradas posteriores a ele, com uma única
+    agregação, em vez de reprocessar todo o histórico. As entradas dos últimos
+    'settle_seconds' ficam de fora, para não saltar ids de transações ainda por confirmar.
+
+    Returns:
+        tuple: (watermark, número de snapshots criados).
+    """
+    previous = latest_watermark()
+    cutoff = timezone.now() - timedelta(seconds=settle_seconds)
+    watermark = LedgerEntry.objects.filter(created_at__lte=cutoff).aggregate(last=Max('id'))['last'] or 0
+    if watermark <= previous:
+        return previous, 0
+
+    balances = balances_at_watermark(previous)
+    for user_id, coin_type, total in _user_deltas(previous, watermark):
+        balances.setdefault(user_id, {'recycling': 0, 'reputation': 0})[coin_type] += total
+
+    taken_at = timezone.now()
+    snapshots = [
+        BalanceSnapshot(
+            user_id=user_id, last_entry_id=watermark, taken_at=taken_at,
+            recycling_coins=balance['recycling'], reputation_coins=balance['reputation'],
+        )
+        for user_id, balance in balances.items()
+    ]
+    BalanceSnapshot.objects.bulk_create(snapshots, batch_size=batch_size)
+    return watermark, len(snapshots)
+
+
+def balances_at_watermark(watermark):
+    """Devolve {user_id: {coin_type: saldo}} a partir dos snapshots de uma execução."""
+    if not watermark:
+        return {}
+    rows = BalanceSnapshot.objects.filter(last_entry_id=watermark).values_list(
+        'user_id', 'recycling_coins', 'reputation_coins')
+    return {user_id: {'recycling': recycling, 'reputation': reputation}
+            for user_id, recycling, reputation in rows.iterator(chunk_size=10000)}
+
+
+def _user_deltas(after_entry_id, up_to_entry_id=None):
+    """Soma, por utilizador e moeda, as entradas com id no intervalo (after, up_to]."""
+    entries = LedgerEntry.objects.filter(id__gt=after_entry_id, user__isnull=False)
+    if up_to_entry_id is not None:
+        entries = entries.filter(id__lte=up_to_entry_id)
+    return entries.values_list('user_id', 'coin_type').annotate(total=Sum('amount')).order_by()
+
+
+def balance_at(user, when):
+    """
+    Devolve o saldo {coin_type: saldo} de um utilizador numa data: o último snapshot
+    anterior a essa data mais as entradas do utilizador desde então.
+    """
+    user_id = getattr(user, 'pk', user)
+    snapshot = BalanceSnapshot.objects.filter(taken_at__lte=when).order_by('-taken_at').values(
+        'last_entry_id').first()
+    watermark = snapshot['last_entry_id'] if snapshot else 0
+
+    balance = {'recycling': 0, 'reputation': 0}
+    if watermark:
+        row = BalanceSnapshot.objects.filter(user_id=user_id, last_entry_id=watermark).first()
+        if row:
+            balance = {'recycling': row.recycling_coins, 'reputation': row.reputation_coins}
+
+    deltas = LedgerEntry.objects.filter(
+        user_id=user_id, id__gt=watermark, created_at__lte=when
+    ).values_list('coin_type').annotate(total=Sum('amount')).order_by()
+    for coin_type, total in deltas:
+        balance[coin_type] += total
+    return balance
+
+
+def check_invariants(full=False, sample_size=10):
+    """
+    Verifica os invariantes do livro-razão com um punhado de agregações:
+
+    1. Cada lançamento soma zero por tipo de moeda (apenas desde o último snapshot,
+       ou em todo o histórico com full=True).
+    2. O saldo guardado em cada utilizador é igual ao snapshot mais as entradas posteriores.
+    3. A conta de reserva guarda exatamente as moedas das ofertas ativas e trocas pendentes.
+
+    Returns:
+        dict: {nome do invariante: lista (amostra) de violações}. Vazio se tudo estiver certo.
+    """
+    from .models import CoinOffer, ExchangeRequest
+
+    problems = {}
+    watermark = latest_watermark()
+
+    entries = LedgerEntry.objects.all() if full else LedgerEntry.objects.filter(id__gt=watermark)
+    unbalanced = entries.values('journal_id', 'coin_type').annotate(
+        total=Sum('amount')).exclude(total=0).order_by()
+    unbalanced = list(unbalanced[:sample_size])
+    if unbalanced:
+        problems['unbalanced_journals'] = unbalanced
+
+    expected = balances_at_watermark(watermark)
+    for user_id, coin_type, total in _user_deltas(watermark):
+        expected.setdefault(user_id, {'recycling': 0, 'reputation': 0})[coin_type] += total
+    mismatches = []
+    users = CustomUser.objects.values_list('pk', 'recycling_coins', 'reputation_coins')
+    for user_id, recycling, reputation in users.iterator(chunk_size=10000):
+        balance = expected.get(user_id, {'recycling': 0, 'reputation': 0})
+        if (balance['recycling'], balance['reputation']) != (recycling, reputation):
+            mismatches.append({'user_id': user_id, 'stored': (recycling, reputation),
+                               'ledger': (balance['recycling'], balance['reputation'])})
+            if len(mismatches) >= sample_size:
+                break
+    if mismatches:
+        problems['balance_mismatches'] = mismatches
+
+    escrow = dict(LedgerEntry.objects.filter(system_account=ESCROW).values_list(
+        'coin_type').annotate(total=Sum('amount')).order_by())
+    outstanding = defaultdict(int)
+    offers = CoinOffer.objects.filter(status='active').values_list(
+        'coin_type').annotate(total=Sum('amount')).order_by()
+    for coin_type, total in offers:
+        outstanding[coin_type] += total
+    pending = ExchangeRequest.objects.filter(status='pending').aggregate(
+        recycling=Sum('offer_recycling_coins'), reputation=Sum('offer_reputation_coins'))
+    for coin_type in COIN_FIELDS:
+        outstanding[coin_type] += pending[coin_type] or 0
+        if escrow.get(coin_type, 0) != outstanding[coin_type]:
+            problems.setdefault('escrow_mismatch', []).append({
+                'coin_type': coin_type, 'ledger': escrow.get(coin_type, 0),
+                'outstanding': outstanding[coin_type]})
+
+    return problems
@@ -0,0 +1,89 @@
+# api/leveling.py
+
+"""
+Curva de níveis da gamificação.
+
+A experiência necessária para passar do nível N ao N+1 é round(BASE * N ** EXPONENT), com os
+valores de settings.LEVELING (por omissão, BASE=100 e EXPONENT=1: 100 XP no nível 1, 200 no 2...).
+O utilizador guarda a experiência total acumulada; o nível e a experiência dentro do nível
+são derivados dela com uma pesquisa binária numa tabela de limiares acumulados, pelo que um
+ganho grande de XP custa O(log n) e não uma iteração por nível.
+"""
+
+import threading
+from bisect import bisect_right
+
+from django.conf import settings
+
+# _thresholds[i] é a experiência total necessária para chegar ao nível i+1 (nível 1 = 0 XP).
+_thresholds = [0]
+_curve = None
+_lock = threading.Lock()
+
+
+def experience_for_level(level):
+    """Experiência necessária para passar do nível 'level' ao seguinte."""
+    return max(round(settings.LEVELING['BASE'] * level ** settings.LEVELING['EXPONENT']), 1)
+
+
+def _table(total=0, level=1):
+    """Devolve a tabela de limiares, estendendo-a até cobrir 'total' XP e o nível 'level'."""
+    global _thresholds, _curve
+    curve = (settings.LEVELING['BASE'], settings.LEVELING['EXPONENT'])
+    table = _thresholds
+    if curve == _curve and table[-1] > total and len(table) > level:
+        return table
+    with _lock:
+        table = _thresholds if curve == _curve else [0]
+        table = list(table)
+        while table[-1] <= total or len(table) <= level:
+            # Duplica o tamanho da tabela, para que o custo das extensões seja amortizado.
+            for n in range(len(table), 2 * len(table) + 64):
+                table.append(table[-1] + experience_for_level(n))
+        _thresholds, _curve = table, curve
+    return table
+
+
+def threshold(level):
+    """Experiência total necessária para chegar ao nível 'level'."""
+    return _table(level=level)[level - 1]
+
+
+def level_for(total_experience):
+    """
+    Converte a experiência total num par (nível, experiência dentro do nível).
+
+    Args:
+        total_experience: Experiência acumulada do utilizador.
+
+    Returns:
+        tuple: (nível, experiência já ganha no nível atual).
+    """
+    total_experience = max(total_experience, 0)
+    table = _table(total=total_experience)
+    level = bisect_right(table, total_experience)
+    return level, total_experience - table[level - 1]
+
+
+def recompute_levels(queryset, batch_size=1000):
+    """
+    Recalcula o nível e a experiência dentro do nível a partir da experiência total, por
+    exemplo depois de alterar a curva. Só escreve os utilizadores que mudaram.
+
+    Returns:
+        int: Número de utilizadores atualizados.
+    """
+    changed = []
+    updated = 0
+    rows = queryset.order_by('pk').only('pk', 'total_experience', 'level', 'experience')
+    for user in rows.iterator(chunk_size=batch_size):
+        level, experience = level_for(user.total_experience)
+        if (level, experience) != (user.level, user.experience):
+            user.level, user.experience = level, experience
+            changed.append(user)
+        if len(changed) >= batch_size:
+            updated += queryset.model.objects.bulk_update(changed, ['level', 'experience'])
+            changed = []
+    if changed:
+        updated += queryset.model.objects.bulk_update(changed, ['level', 'experience'])
+    return updated
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api import index_audit
+
+
+class Command(BaseCommand):
+    """
+    Corre EXPLAIN sobre os querysets das views principais e falha se algum ler uma tabela
+    inteira. As ordenações fora de índice são apenas assinaladas. Útil na integração contínua,
+    sobre uma base com dados (ex: depois de 'seed_data'), para apanhar índices em falta.
+    """
+    help = "Audita os planos de execução das consultas principais à procura de leituras completas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Id do utilizador dos pedidos (padrão: o primeiro).")
+        parser.add_argument('--query', action='append', choices=sorted(index_audit.QUERIES),
+                            help="Consulta a auditar (pode repetir-se; por omissão, todas).")
+        parser.add_argument('--verbose-plans', action='store_true', help="Mostra o plano completo de cada consulta.")
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        user = users.filter(pk=options['user']).first() if options['user'] else users.first()
+        if user is None:
+            raise CommandError("É preciso pelo menos um utilizador (ou um --user existente).")
+
+        results = index_audit.audit(user, options['query'])
+        for result in results:
+            if result['full_scans']:
+                self.stdout.write(self.style.ERROR(
+                    f"{result['name']}: leitura completa de {', '.join(result['full_scans'])}"))
+            elif result['sorts']:
+                self.stdout.write(self.style.WARNING(f"{result['name']}: ordenação fora de índice"))
+            else:
+                self.stdout.write(f"{result['name']}: ok")
+            if options['verbose_plans'] or result['full_scans']:
+                for line in result['plan'].splitlines():
+                    self.stdout.write(f"    {line}")
+
+        failed = [result['name'] for result in results if result['full_scans']]
+        if failed:
+            raise CommandError(f"Consultas com leituras completas: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS(f"{len(results)} consultas sem leituras completas."))
@@ -0,0 +1,107 @@
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from api import benchmark, seeding
+
+
+class Command(BaseCommand):
+    """
+    Corre o benchmark dos endpoints principais numa base de dados de teste descartável,
+    semeada com dados sintéticos, e opcionalmente grava ou compara com uma referência.
+    A base de dados configurada nunca é alterada.
+
+    Com --recommendation-likes, mede apenas o tempo de construção das recomendações para cada
+    número de likes indicado (em memória, sem base de dados). Com --catalog-sizes, mede apenas a
+    primeira página do catálogo autenticado para cada número de modelos indicado.
+    """
+    help = "Mede débito, latência (p50/p99) e consultas SQL dos endpoints principais."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--bottles-per-user', type=int, default=20)
+        parser.add_argument('--models', type=int, default=200)
+        parser.add_argument('--offers', type=int, default=500)
+        parser.add_argument('--transactions', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0, help="Semente dos dados gerados (padrão: 0).")
+        parser.add_argument('--iterations', type=int, default=100, help="Pedidos medidos por cenário.")
+        parser.add_argument('--warmup', type=int, default=5, help="Pedidos de aquecimento por cenário.")
+        parser.add_argument('--scenario', action='append', choices=sorted(benchmark.SCENARIOS),
+                            help="Cenário a correr (pode repetir-se; por omissão, todos).")
+        parser.add_argument('--eager-events', action='store_true',
+                            help="Processa os eventos de gamificação no próprio pedido.")
+        parser.add_argument('--save', metavar='PATH', help="Grava os resultados como referência.")
+        parser.add_argument('--compare', metavar='PATH', help="Compara com uma referência gravada.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Aumento de latência tolerado na comparação (padrão: 0.2 = 20%%).")
+        parser.add_argument('--catalog-sizes', type=int, nargs='+', metavar='N',
+                            help="Mede só a página do catálogo com N modelos semeados (ex: 1000 10000 50000).")
+        parser.add_argument('--recommendation-likes', type=int, nargs='+', metavar='N',
+                            help="Mede só a construção das recomendações com N likes sintéticos (ex: 10000 100000).")
+
+    def handle(self, *args, **options):
+        if options['recommendation_likes']:
+            self.stdout.write(f"{'likes':>10}{'modelos':>9}{'utilizadores':>14}{'pares':>9}{'segundos':>10}")
+            for row in benchmark.recommendation_build_times(options['recommendation_likes'], seed=options['seed']):
+                self.stdout.write(f"{row['likes']:>10}{row['models']:>9}{row['users']:>14}"
+                                  f"{row['pairs']:>9}{row['seconds']:>10}")
+            return
+
+        baseline = benchmark.load_baseline(options['compare']) if options['compare'] else None
+        scale = {key: options[key] for key in ('users', 'bottles_per_user', 'models', 'offers', 'transactions')}
+        if scale['users'] < 2:
+            raise CommandError("São precisos pelo menos 2 utilizadores.")
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(
+                    MEDIA_ROOT=media_root, GAMIFICATION_EVENTS_EAGER=options['eager_events']):
+                if options['catalog_sizes']:
+                    self._print_scaling(benchmark.catalog_scaling(
+                        options['catalog_sizes'], options['iterations'], options['warmup'], options['seed']))
+                    return
+                self.stdout.write("A semear os dados...")
+                dataset = seeding.seed_dataset(seed=options['seed'], **scale)
+                self.stdout.write(", ".join(f"{name}: {total}" for name, total in dataset['counts'].items()))
+                results = benchmark.run_benchmark(
+                    dataset, options['scenario'], options['iterations'], options['warmup'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self._print(results, baseline)
+
+        if options['save']:
+            meta = {**scale, 'seed': options['seed'], 'iterations': options['iterations'],
+                    'eager_events': options['eager_events']}
+            benchmark.save_baseline(options['save'], results, meta)
+            self.stdout.write(f"Referência gravada em {options['save']}.")
+
+        if baseline is not None:
+            regressions = benchmark.compare(results, baseline, options['tolerance'])
+            for item in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f"Regressão em {item['scenario']}.{item['metric']}: {item['baseline']} -> {item['current']}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressões face à referência.")
+            self.stdout.write(self.style.SUCCESS("Sem regressões face à referência."))
+
+    def _print(self, results, baseline):
+        reference = (baseline or {}).get('results', {})
+        header = f"{'cenário':<22}{'pedidos':>8}{'erros':>7}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'queries':>9}"
+        self.stdout.write(header)
+        for name, row in results.items():
+            line = (f"{name:<22}{row['requests']:>8}{row['errors']:>7}{row['throughput']:>9}"
+                    f"{row['p50_ms']:>9}{row['p99_ms']:>9}{row['queries_avg']:>9}")
+            if name in reference:
+                line += f"   (ref. p50 {reference[name]['p50_ms']}, queries {reference[name]['queries_avg']})"
+            self.stdout.write(line)
+
+    def _print_scaling(self, rows):
+        self.stdout.write(f"{'modelos':>10}{'p50 ms':>9}{'p99 ms':>9}{'queries':>9}")
+        for row in rows:
+            self.stdout.write(f"{row['models']:>10}{row['p50_ms']:>9}{row['p99_ms']:>9}{row['queries_avg']:>9}")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import recommendations
+
+
+class Command(BaseCommand):
+    """
+    Recalcula os vizinhos mais próximos de cada modelo 3D a partir da co-ocorrência de likes e
+    favoritos (ver api/recommendations.py). Deve correr periodicamente, por exemplo num cron
+    noturno; o feed 'models3d/recommended/' lê apenas o resultado gravado.
+    """
+    help = "Recalcula as semelhanças entre modelos usadas no feed de recomendações."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbours', type=int, default=None,
+                            help="Vizinhos guardados por modelo (padrão: RECOMMENDATIONS['NEIGHBOURS']).")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Linhas da matriz calculadas e gravadas de cada vez (padrão: 1000).")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        pairs = recommendations.build(k=options['neighbours'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{pairs} pares de modelos semelhantes gravados em {time.perf_counter() - start:.1f}s."))
@@ -0,0 +1,34 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ledger
+
+
+class Command(BaseCommand):
+    """
+    Verifica os invariantes da economia interna: lançamentos equilibrados, saldos dos
+    utilizadores iguais ao livro-razão e reserva igual às ofertas e trocas em aberto.
+    Termina com erro se encontrar alguma violação.
+    """
+    help = "Verifica os invariantes do livro-razão de moedas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Verifica o equilíbrio de todos os lançamentos, e não só os posteriores ao último snapshot.")
+        parser.add_argument('--sample-size', type=int, default=10,
+                            help="Número máximo de violações mostradas por invariante.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        problems = ledger.check_invariants(full=options['full'], sample_size=options['sample_size'])
+        elapsed = time.monotonic() - started
+
+        if problems:
+            for name, samples in problems.items():
+                self.stderr.write(self.style.ERROR(f"{name}:"))
+                for sample in samples:
+                    self.stderr.write(f"  {json.dumps(sample, default=str)}")
+            raise CommandError(f"Livro-razão inconsistente ({elapsed:.2f}s).")
+        self.stdout.write(self.style.SUCCESS(f"Livro-razão consistente ({elapsed:.2f}s)."))
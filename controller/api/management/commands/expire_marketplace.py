@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import expiry
+
+
+class Command(BaseCommand):
+    """
+    Expira as ofertas ativas e as solicitações de troca pendentes que ultrapassaram o tempo
+    de vida configurado (COIN_OFFER_TTL / EXCHANGE_REQUEST_TTL), devolvendo as moedas reservadas.
+    Pode ser chamado por um cron ou ficar a correr com --loop.
+    """
+    help = "Expira ofertas e solicitações de troca antigas e devolve as moedas reservadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Número de linhas expiradas por transação (padrão: 500).")
+        parser.add_argument('--loop', action='store_true',
+                            help="Continua a correr, repetindo a varredura a cada --interval segundos.")
+        parser.add_argument('--interval', type=int, default=300,
+                            help="Intervalo entre varreduras no modo --loop (padrão: 300).")
+
+    def handle(self, *args, **options):
+        while True:
+            offers = expiry.expire_offers(batch_size=options['batch_size'])
+            requests = expiry.expire_exchange_requests(batch_size=options['batch_size'])
+            if offers or requests or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{offers} ofertas e {requests} solicitações de troca expiradas."))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
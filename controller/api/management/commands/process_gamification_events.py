@@ -0,0 +1,47 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api import events
+
+
+def _work(worker, workers, batch_size):
+    """Processa um lote de uma partição e fecha a ligação à base de dados da thread."""
+    try:
+        return events.process_pending(worker=worker, workers=workers, batch_size=batch_size)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    """
+    Processa a fila de eventos de gamificação com um pool de workers. Cada worker trata
+    os utilizadores da sua partição (user_id % workers), o que mantém a ordem dos eventos
+    de cada utilizador.
+    """
+    help = "Processa os eventos de gamificação pendentes (experiência, conquistas, classificações)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Número de workers em paralelo (padrão: 4).")
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="Eventos lidos por worker em cada passagem (padrão: 100).")
+        parser.add_argument('--loop', action='store_true',
+                            help="Continua a correr, à espera de novos eventos.")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Pausa quando a fila está vazia no modo --loop (padrão: 1s).")
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                processed = sum(pool.map(
+                    _work, range(workers), [workers] * workers, [options['batch_size']] * workers))
+                if processed or not options['loop']:
+                    self.stdout.write(self.style.SUCCESS(f"{processed} eventos processados."))
+                if not options['loop']:
+                    return
+                if not processed:
+                    time.sleep(options['interval'])
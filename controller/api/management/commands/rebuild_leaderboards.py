@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api import leaderboards
+
+
+class Command(BaseCommand):
+    """
+    Recalcula os quadros de classificação a partir das garrafas e da experiência dos utilizadores.
+    Os quadros são mantidos incrementalmente; este comando serve para a carga inicial e correções.
+    """
+    help = "Recalcula todos os quadros de classificação a partir dos dados de origem."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        created = leaderboards.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{created} linhas de classificação registadas."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import achievements
+from api.models import Achievement
+
+
+class Command(BaseCommand):
+    """
+    Reavalia as conquistas para todos os utilizadores, desbloqueando as que já foram
+    alcançadas e atribuindo as recompensas. Útil depois de criar ou alterar conquistas.
+    """
+    help = "Desbloqueia em massa as conquistas que os utilizadores já alcançaram."
+
+    def add_arguments(self, parser):
+        parser.add_argument('achievement_ids', nargs='*',
+                            help="Ids das conquistas a reavaliar (por omissão, todas).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        queryset = Achievement.objects.all()
+        if options['achievement_ids']:
+            queryset = queryset.filter(pk__in=options['achievement_ids'])
+            missing = set(options['achievement_ids']) - set(queryset.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"Conquistas inexistentes: {', '.join(sorted(missing))}")
+
+        unlocked = achievements.recompute_achievements(queryset, batch_size=options['batch_size'])
+        for achievement_id, count in unlocked.items():
+            self.stdout.write(f"{achievement_id}: {count} desbloqueios")
+        self.stdout.write(self.style.SUCCESS(f"{sum(unlocked.values())} conquistas desbloqueadas."))
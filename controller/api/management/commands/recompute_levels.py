@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api import leveling
+
+
+class Command(BaseCommand):
+    """
+    Recalcula o nível e a experiência dentro do nível de todos os utilizadores a partir da
+    experiência total. Deve ser corrido depois de alterar settings.LEVELING.
+    """
+    help = "Recalcula os níveis dos utilizadores com a curva de níveis atual."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = leveling.recompute_levels(get_user_model().objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{updated} utilizadores atualizados."))
@@ -0,0 +1,62 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from api import jobs
+
+
+def _work(worker, workers, batch_size):
+    """Executa um lote de uma partição e fecha a ligação à base de dados do worker."""
+    try:
+        return jobs.process_pending(worker=worker, workers=workers, batch_size=batch_size)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    """
+    Executa as tarefas em segundo plano (miniaturas, ZIPs de download, limpeza de ficheiros)
+    com um pool de threads ou de processos. Cada worker trata as tarefas da sua partição
+    (id % workers). As tarefas abandonadas por um worker que morreu voltam à fila a cada passagem.
+    """
+    help = "Executa as tarefas em segundo plano pendentes (ver api/jobs.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Número de workers em paralelo (padrão: 4).")
+        parser.add_argument('--pool', choices=('thread', 'process'), default='thread',
+                            help="Tipo de pool: 'thread' (padrão) ou 'process', para tarefas presas ao CPU.")
+        parser.add_argument('--batch-size', type=int, default=20,
+                            help="Tarefas lidas por worker em cada passagem (padrão: 20).")
+        parser.add_argument('--loop', action='store_true',
+                            help="Continua a correr, à espera de novas tarefas.")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Pausa quando a fila está vazia no modo --loop (padrão: 1s).")
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        if options['pool'] == 'process':
+            # Os processos filhos não podem herdar as ligações abertas do processo pai.
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers)
+
+        with pool:
+            while True:
+                requeued = jobs.requeue_stale()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f"{requeued} tarefas abandonadas devolvidas à fila."))
+                if options['pool'] == 'process':
+                    connections.close_all()
+                processed = sum(pool.map(
+                    _work, range(workers), [workers] * workers, [options['batch_size']] * workers))
+                if processed or not options['loop']:
+                    self.stdout.write(self.style.SUCCESS(f"{processed} tarefas executadas."))
+                if not options['loop']:
+                    return
+                if not processed:
+                    time.sleep(options['interval'])
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import seeding
+
+
+class Command(BaseCommand):
+    """
+    Gera dados sintéticos em volume (utilizadores, garrafas, histórico, modelos, likes,
+    comentários, ofertas e transações) com inserções em lote. Com a mesma semente os dados
+    gerados são sempre os mesmos. Destina-se a ambientes de teste e benchmarks.
+    """
+    help = "Semeia a base de dados com dados sintéticos, de forma rápida e determinística."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--bottles-per-user', type=int, default=10)
+        parser.add_argument('--years', type=float, default=3,
+                            help="Período coberto pelas datas geradas, em anos (padrão: 3).")
+        parser.add_argument('--models', type=int, default=500)
+        parser.add_argument('--likes-per-model', type=int, default=5)
+        parser.add_argument('--comments-per-model', type=int, default=2)
+        parser.add_argument('--offers', type=int, default=200)
+        parser.add_argument('--transactions', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0, help="Semente dos dados gerados (padrão: 0).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--processes', type=int, default=1,
+                            help="Processos em paralelo para os blocos de utilizadores e modelos (padrão: 1).")
+        parser.add_argument('--skip-derived', action='store_true',
+                            help="Não recalcula conquistas nem quadros de classificação no fim.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['processes'] < 1:
+            raise CommandError("--batch-size e --processes têm de ser positivos.")
+
+        start = time.perf_counter()
+        dataset = seeding.seed_dataset(
+            users=options['users'], bottles_per_user=options['bottles_per_user'], models=options['models'],
+            offers=options['offers'], transactions=options['transactions'], years=options['years'],
+            likes_per_model=options['likes_per_model'], comments_per_model=options['comments_per_model'],
+            seed=options['seed'], batch_size=options['batch_size'], processes=options['processes'],
+            derived=not options['skip_derived'],
+        )
+        for name, total in dataset['counts'].items():
+            self.stdout.write(f"{name}: {total}")
+        self.stdout.write(self.style.SUCCESS(f"Dados gerados em {time.perf_counter() - start:.1f}s."))
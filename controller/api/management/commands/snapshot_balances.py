@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api import ledger
+
+
+class Command(BaseCommand):
+    """
+    Regista um snapshot do saldo de cada utilizador a partir do livro-razão.
+    Pensado para correr periodicamente (ex: cron diário).
+    """
+    help = "Regista snapshots de saldo de todos os utilizadores a partir do livro-razão."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settle-seconds', type=int, default=60,
+                            help="Ignora as entradas mais recentes do que isto (padrão: 60).")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        watermark, created = ledger.snapshot_balances(
+            settle_seconds=options['settle_seconds'], batch_size=options['batch_size'])
+        if not created:
+            self.stdout.write("Sem novas entradas desde o último snapshot.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{created} snapshots registados até à entrada {watermark}."))
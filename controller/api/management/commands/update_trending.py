@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import trending
+
+
+class Command(BaseCommand):
+    """
+    Recalcula a pontuação de tendência dos modelos 3D a partir dos likes, comentários e
+    downloads recentes (ver api/trending.py). Pode ser chamado por um cron ou ficar a correr
+    com --loop.
+    """
+    help = "Recalcula a pontuação de tendência usada em '?ordering=trending'."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Número de modelos atualizados por consulta (padrão: 1000).")
+        parser.add_argument('--loop', action='store_true',
+                            help="Continua a correr, repetindo o cálculo a cada --interval segundos.")
+        parser.add_argument('--interval', type=int, default=600,
+                            help="Intervalo entre cálculos no modo --loop (padrão: 600).")
+
+    def handle(self, *args, **options):
+        while True:
+            updated = trending.update_scores(batch_size=options['batch_size'])
+            if updated or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f"{updated} pontuações de tendência atualizadas."))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
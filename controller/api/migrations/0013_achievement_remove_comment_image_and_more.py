@@ -0,0 +1,165 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:36
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_remove_exchangeoffer_accepted_by_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Achievement',
+            fields=[
+                ('id', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=100, verbose_name='Título')),
+                ('description', models.TextField(verbose_name='Descrição')),
+                ('icon_name', models.CharField(default='FaTrophy', max_length=50, verbose_name='Nome do Ícone')),
+                ('criteria_type', models.CharField(choices=[('BOTTLES_TOTAL', 'Total de Garrafas Recicladas'), ('USER_LEVEL', 'Nível do Utilizador'), ('MONTHLY_BOTTLES', 'Garrafas num Mês'), ('CONSECUTIVE_MONTHS', 'Meses Consecutivos a Reciclar'), ('MODELS_UPLOADED', 'Total de Modelos Publicados')], default='BOTTLES_TOTAL', help_text='O tipo de estatística do utilizador a ser verificada.', max_length=20)),
+                ('criteria_value', models.IntegerField(default=0, help_text='O valor que o utilizador precisa de alcançar para esta conquista.')),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='comment',
+            name='image',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='achievements',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='recycling_history',
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='is_curator',
+            field=models.BooleanField(default=False, help_text='Designa que este utilizador tem permissões de curadoria.'),
+        ),
+        migrations.AddField(
+            model_name='model3d',
+            name='is_visible',
+            field=models.BooleanField(default=True, help_text='Controla se o modelo é visível para o público.'),
+        ),
+        migrations.AlterField(
+            model_name='bottle',
+            name='type',
+            field=models.CharField(max_length=100, verbose_name='Tipo (Marca)'),
+        ),
+        migrations.AlterField(
+            model_name='bottle',
+            name='volume',
+            field=models.CharField(default='0', help_text='Ex: "500ml", "1L", "2L"', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='experience',
+            field=models.IntegerField(default=0, verbose_name='Experiência'),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='level',
+            field=models.IntegerField(default=1, verbose_name='Nível'),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_image',
+            field=models.ImageField(blank=True, null=True, upload_to='profile_images/', verbose_name='Foto de Perfil'),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='recycling_coins',
+            field=models.IntegerField(default=0, verbose_name='Moedas de Reciclagem'),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='reputation_coins',
+            field=models.IntegerField(default=0, verbose_name='Moedas de Reputação'),
+        ),
+        migrations.AlterField(
+            model_name='model3d',
+            name='price',
+            field=models.IntegerField(default=0, help_text='Preço em moedas de reciclagem.'),
+        ),
+        migrations.AlterField(
+            model_name='recyclinghistory',
+            name='month',
+            field=models.CharField(help_text='Formato: "AAAA-MM"', max_length=7),
+        ),
+        migrations.CreateModel(
+            name='CoinOffer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('coin_type', models.CharField(choices=[('recycling', 'Reciclagem'), ('reputation', 'Reputação')], max_length=20)),
+                ('amount', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('price_per_coin', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('offer_type', models.CharField(choices=[('sale', 'Venda'), ('gift', 'Doação')], default='sale', max_length=10)),
+                ('status', models.CharField(choices=[('active', 'Ativa'), ('completed', 'Concluída'), ('cancelled', 'Cancelada')], default='active', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coin_offers', to=settings.AUTH_USER_MODEL)),
+                ('specific_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='directed_offers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CoinTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('coin_type', models.CharField(choices=[('recycling', 'Moedas de Reciclagem'), ('reputation', 'Moedas de Reputação')], max_length=20, verbose_name='Tipo de Moeda')),
+                ('amount', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='Quantidade')),
+                ('transaction_type', models.CharField(choices=[('purchase', 'Compra'), ('gift', 'Doação'), ('system', 'Sistema')], max_length=10, verbose_name='Tipo de Transação')),
+                ('price_paid', models.IntegerField(default=0, verbose_name='Preço Pago')),
+                ('transaction_date', models.DateTimeField(auto_now_add=True, verbose_name='Data da Transação')),
+                ('notes', models.TextField(blank=True, null=True, verbose_name='Observações')),
+                ('offer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='api.coinoffer', verbose_name='Oferta')),
+                ('receiver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='received_transactions', to=settings.AUTH_USER_MODEL, verbose_name='Destinatário')),
+                ('sender', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sent_transactions', to=settings.AUTH_USER_MODEL, verbose_name='Remetente')),
+            ],
+            options={
+                'verbose_name': 'Transação de Moedas',
+                'verbose_name_plural': 'Transações de Moedas',
+                'ordering': ['-transaction_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExchangeRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('offer_recycling_coins', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Moedas de Reciclagem Oferecidas')),
+                ('offer_reputation_coins', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Moedas de Reputação Oferecidas')),
+                ('request_recycling_coins', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Moedas de Reciclagem Solicitadas')),
+                ('request_reputation_coins', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Moedas de Reputação Solicitadas')),
+                ('message', models.TextField(blank=True, null=True, verbose_name='Mensagem')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('accepted', 'Aceita'), ('rejected', 'Rejeitada'), ('cancelled', 'Cancelada')], default='pending', max_length=10, verbose_name='Status')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('receiver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coin_exchange_offers', to=settings.AUTH_USER_MODEL, verbose_name='Receptor')),
+                ('requester', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coin_exchange_requests', to=settings.AUTH_USER_MODEL, verbose_name='Solicitante')),
+            ],
+            options={
+                'verbose_name': 'Solicitação de Troca',
+                'verbose_name_plural': 'Solicitações de Troca',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserAchievement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unlocked_at', models.DateTimeField(blank=True, null=True, verbose_name='Desbloqueada em')),
+                ('achievement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.achievement')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_achievements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'achievement')},
+            },
+        ),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def open_balances(apps, schema_editor):
+    """
+    Regista os saldos já existentes como saldo de abertura do livro-razão: cada utilizador
+    e a reserva (ofertas ativas e trocas pendentes) recebem as suas moedas da conta de emissão.
+    """
+    CustomUser = apps.get_model('api', 'CustomUser')
+    CoinOffer = apps.get_model('api', 'CoinOffer')
+    ExchangeRequest = apps.get_model('api', 'ExchangeRequest')
+    LedgerJournal = apps.get_model('api', 'LedgerJournal')
+    LedgerEntry = apps.get_model('api', 'LedgerEntry')
+
+    escrow = {'recycling': 0, 'reputation': 0}
+    for coin_type, amount in CoinOffer.objects.filter(status='active').values_list('coin_type', 'amount'):
+        escrow[coin_type] += amount
+    for recycling, reputation in ExchangeRequest.objects.filter(status='pending').values_list(
+            'offer_recycling_coins', 'offer_reputation_coins'):
+        escrow['recycling'] += recycling
+        escrow['reputation'] += reputation
+
+    users = CustomUser.objects.exclude(recycling_coins=0, reputation_coins=0).values_list(
+        'pk', 'recycling_coins', 'reputation_coins')
+    if not users.exists() and not any(escrow.values()):
+        return
+
+    journal = LedgerJournal.objects.create(reason='opening')
+    now = timezone.now()
+    minted = {'recycling': 0, 'reputation': 0}
+    entries = []
+    for user_id, recycling, reputation in users.iterator(chunk_size=2000):
+        for coin_type, amount in (('recycling', recycling), ('reputation', reputation)):
+            if amount:
+                entries.append(LedgerEntry(journal=journal, user_id=user_id, coin_type=coin_type,
+                                           amount=amount, created_at=now))
+                minted[coin_type] += amount
+        if len(entries) >= 2000:
+            LedgerEntry.objects.bulk_create(entries)
+            entries = []
+    for coin_type, amount in escrow.items():
+        if amount:
+            entries.append(LedgerEntry(journal=journal, system_account='escrow', coin_type=coin_type,
+                                       amount=amount, created_at=now))
+            minted[coin_type] += amount
+    for coin_type, amount in minted.items():
+        if amount:
+            entries.append(LedgerEntry(journal=journal, system_account='mint', coin_type=coin_type,
+                                       amount=-amount, created_at=now))
+    LedgerEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_achievement_remove_comment_image_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerJournal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('opening', 'Saldo de abertura'), ('recycle', 'Reciclagem'), ('achievement', 'Conquista'), ('download', 'Download de modelo'), ('offer_created', 'Oferta criada'), ('offer_cancelled', 'Oferta cancelada'), ('offer_purchased', 'Oferta comprada'), ('exchange_created', 'Troca solicitada'), ('exchange_accepted', 'Troca aceita'), ('exchange_returned', 'Troca devolvida'), ('adjustment', 'Ajuste administrativo')], max_length=20, verbose_name='Motivo')),
+                ('reference', models.CharField(blank=True, help_text='Objeto de origem, ex: "offer:12".', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+            ],
+            options={
+                'verbose_name': 'Lançamento',
+                'verbose_name_plural': 'Lançamentos',
+            },
+        ),
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_entry_id', models.BigIntegerField()),
+                ('taken_at', models.DateTimeField(db_index=True)),
+                ('recycling_coins', models.IntegerField(default=0)),
+                ('reputation_coins', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Saldo',
+                'verbose_name_plural': 'Snapshots de Saldo',
+                'indexes': [models.Index(fields=['last_entry_id'], name='snapshot_watermark_idx')],
+                'unique_together': {('user', 'last_entry_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('system_account', models.CharField(blank=True, choices=[('mint', 'Emissão'), ('escrow', 'Reserva'), ('burn', 'Consumo'), ('adjustment', 'Ajuste')], max_length=10)),
+                ('coin_type', models.CharField(choices=[('recycling', 'Moedas de Reciclagem'), ('reputation', 'Moedas de Reputação')], max_length=20)),
+                ('amount', models.IntegerField(help_text='Positivo para créditos, negativo para débitos.')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+                ('journal', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='entries', to='api.ledgerjournal')),
+            ],
+            options={
+                'verbose_name': 'Entrada do Livro-Razão',
+                'verbose_name_plural': 'Entradas do Livro-Razão',
+                'indexes': [models.Index(fields=['user', 'created_at'], name='ledger_user_date_idx'), models.Index(fields=['system_account', 'coin_type', 'amount'], name='ledger_system_idx')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
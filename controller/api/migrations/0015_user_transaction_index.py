@@ -0,0 +1,50 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_index(apps, schema_editor):
+    """Preenche o índice por utilizador com as transações já existentes, em lotes."""
+    CoinTransaction = apps.get_model('api', 'CoinTransaction')
+    UserTransactionIndex = apps.get_model('api', 'UserTransactionIndex')
+
+    rows = []
+    transactions = CoinTransaction.objects.values_list(
+        'pk', 'sender_id', 'receiver_id', 'coin_type', 'transaction_date')
+    for pk, sender_id, receiver_id, coin_type, transaction_date in transactions.iterator(chunk_size=2000):
+        for user_id, role in ((sender_id, 'sent'), (receiver_id, 'received')):
+            if user_id:
+                rows.append(UserTransactionIndex(
+                    user_id=user_id, transaction_id=pk, role=role,
+                    coin_type=coin_type, transaction_date=transaction_date))
+        if len(rows) >= 2000:
+            UserTransactionIndex.objects.bulk_create(rows)
+            rows = []
+    UserTransactionIndex.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTransactionIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('sent', 'Enviada'), ('received', 'Recebida')], max_length=10)),
+                ('coin_type', models.CharField(choices=[('recycling', 'Moedas de Reciclagem'), ('reputation', 'Moedas de Reputação')], max_length=20)),
+                ('transaction_date', models.DateTimeField()),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_index', to='api.cointransaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_index', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-transaction_date', '-id'], name='txindex_user_date_idx'), models.Index(fields=['user', 'coin_type', '-transaction_date', '-id'], name='txindex_user_coin_date_idx')],
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
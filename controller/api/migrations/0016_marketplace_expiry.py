@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_user_transaction_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='coinoffer',
+            name='status',
+            field=models.CharField(choices=[('active', 'Ativa'), ('completed', 'Concluída'), ('cancelled', 'Cancelada'), ('expired', 'Expirada')], default='active', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='cointransaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('purchase', 'Compra'), ('gift', 'Doação'), ('system', 'Sistema'), ('refund', 'Reembolso')], max_length=10, verbose_name='Tipo de Transação'),
+        ),
+        migrations.AlterField(
+            model_name='exchangerequest',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendente'), ('accepted', 'Aceita'), ('rejected', 'Rejeitada'), ('cancelled', 'Cancelada'), ('expired', 'Expirada')], default='pending', max_length=10, verbose_name='Status'),
+        ),
+        migrations.AlterField(
+            model_name='ledgerjournal',
+            name='reason',
+            field=models.CharField(choices=[('opening', 'Saldo de abertura'), ('recycle', 'Reciclagem'), ('achievement', 'Conquista'), ('download', 'Download de modelo'), ('offer_created', 'Oferta criada'), ('offer_cancelled', 'Oferta cancelada'), ('offer_purchased', 'Oferta comprada'), ('exchange_created', 'Troca solicitada'), ('exchange_accepted', 'Troca aceita'), ('exchange_returned', 'Troca devolvida'), ('offer_expired', 'Oferta expirada'), ('exchange_expired', 'Troca expirada'), ('adjustment', 'Ajuste administrativo')], max_length=20, verbose_name='Motivo'),
+        ),
+        migrations.AddIndex(
+            model_name='coinoffer',
+            index=models.Index(fields=['status', 'created_at'], name='offer_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exchangerequest',
+            index=models.Index(fields=['status', 'created_at'], name='exchange_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_marketplace_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('bottles', 'Garrafas recicladas'), ('experience', 'Experiência total')], max_length=20)),
+                ('period', models.CharField(choices=[('weekly', 'Semanal'), ('monthly', 'Mensal'), ('all_time', 'Geral')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('score', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['metric', 'period', 'period_start', '-score', 'user'], name='leaderboard_rank_idx')],
+                'unique_together': {('metric', 'period', 'period_start', 'user')},
+            },
+        ),
+    ]
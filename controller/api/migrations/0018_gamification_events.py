@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_leaderboards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GamificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('bottles_recycled', 'Garrafas recicladas'), ('model_uploaded', 'Modelo publicado')], max_length=30)),
+                ('payload', models.JSONField(default=dict)),
+                ('idempotency_key', models.CharField(max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('done', 'Processado'), ('failed', 'Falhou')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gamification_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'user', 'id'], name='gamevent_status_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-19 17:51
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_total_experience(apps, schema_editor):
+    """Deriva a experiência total do nível e da experiência atuais, pela curva linear anterior (100 XP * nível)."""
+    CustomUser = apps.get_model('api', 'CustomUser')
+    CustomUser.objects.update(total_experience=F('experience') + 50 * (F('level') - 1) * F('level'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_gamification_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='total_experience',
+            field=models.BigIntegerField(default=0, verbose_name='Experiência Total'),
+        ),
+        migrations.RunPython(fill_total_experience, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:34
+
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+BATCH_SIZE = 2000
+
+
+def months_to_dates(apps, schema_editor):
+    """Converte as strings "AAAA-MM" no primeiro dia do mês, em lotes."""
+    RecyclingHistory = apps.get_model('api', 'RecyclingHistory')
+    rows = RecyclingHistory.objects.order_by('pk').only('pk', 'month')
+    batch = []
+    for history in rows.iterator(chunk_size=BATCH_SIZE):
+        history.month_start = datetime.date(int(history.month[:4]), int(history.month[5:7]), 1)
+        batch.append(history)
+        if len(batch) >= BATCH_SIZE:
+            RecyclingHistory.objects.bulk_update(batch, ['month_start'])
+            batch = []
+    RecyclingHistory.objects.bulk_update(batch, ['month_start'])
+
+
+def dates_to_months(apps, schema_editor):
+    """Operação inversa: volta a preencher as strings "AAAA-MM"."""
+    RecyclingHistory = apps.get_model('api', 'RecyclingHistory')
+    rows = RecyclingHistory.objects.order_by('pk').only('pk', 'month_start')
+    batch = []
+    for history in rows.iterator(chunk_size=BATCH_SIZE):
+        history.month = history.month_start.strftime("%Y-%m")
+        batch.append(history)
+        if len(batch) >= BATCH_SIZE:
+            RecyclingHistory.objects.bulk_update(batch, ['month'])
+            batch = []
+    RecyclingHistory.objects.bulk_update(batch, ['month'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_user_total_experience'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recyclinghistory',
+            name='month_start',
+            field=models.DateField(null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='recyclinghistory',
+            unique_together=set(),
+        ),
+        # Anulável durante a conversão, para que a migração também possa ser revertida.
+        migrations.AlterField(
+            model_name='recyclinghistory',
+            name='month',
+            field=models.CharField(max_length=7, null=True, help_text='Formato: "AAAA-MM"'),
+        ),
+        migrations.RunPython(months_to_dates, dates_to_months),
+        migrations.RemoveField(
+            model_name='recyclinghistory',
+            name='month',
+        ),
+        migrations.RenameField(
+            model_name='recyclinghistory',
+            old_name='month_start',
+            new_name='month',
+        ),
+        migrations.AlterField(
+            model_name='recyclinghistory',
+            name='month',
+            field=models.DateField(help_text='Primeiro dia do mês.'),
+        ),
+        migrations.AddConstraint(
+            model_name='recyclinghistory',
+            constraint=models.UniqueConstraint(fields=('user', 'month'), name='history_user_month_uniq'),
+        ),
+    ]
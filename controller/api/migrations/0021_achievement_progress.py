@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_recycling_history_month_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userachievement',
+            name='progress',
+            field=models.IntegerField(default=0, verbose_name='Progresso'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_achievement_progress'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bottle',
+            index=models.Index(fields=['user', 'date'], name='bottle_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coinoffer',
+            index=models.Index(fields=['status', 'coin_type', '-created_at'], name='offer_status_coin_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coinoffer',
+            index=models.Index(fields=['seller', '-created_at'], name='offer_seller_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cointransaction',
+            index=models.Index(fields=['sender', '-transaction_date'], name='tx_sender_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cointransaction',
+            index=models.Index(fields=['receiver', '-transaction_date'], name='tx_receiver_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['model', '-date'], name='comment_model_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exchangerequest',
+            index=models.Index(fields=['requester', 'status', '-created_at'], name='exchange_requester_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exchangerequest',
+            index=models.Index(fields=['receiver', 'status', '-created_at'], name='exchange_receiver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='model3d',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['-date'], name='model_visible_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='model3d',
+            index=models.Index(fields=['user', '-date'], name='model_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='modelfavorite',
+            index=models.Index(fields=['user', '-created_at'], name='favorite_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='modellike',
+            index=models.Index(fields=['user', '-created_at'], name='like_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:35
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    """Preenche a contagem de comentários dos modelos existentes numa única atualização."""
+    Model3D = apps.get_model('api', 'Model3D')
+    Comment = apps.get_model('api', 'Comment')
+    counts = Comment.objects.filter(model=OuterRef('pk')).values('model').annotate(total=Count('id')).values('total')
+    Model3D.objects.update(comments_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_model_date_idx',
+        ),
+        migrations.AddField(
+            model_name='model3d',
+            name='comments_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['model', '-date', '-id'], name='comment_model_date_idx'),
+        ),
+    ]
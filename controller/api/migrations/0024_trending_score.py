@@ -0,0 +1,53 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_model_comments_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelDownload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='model3d',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['date'], name='comment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='model3d',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['-trending_score', '-id'], name='model_visible_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='modellike',
+            index=models.Index(fields=['created_at'], name='like_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='modeldownload',
+            name='model',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.model3d'),
+        ),
+        migrations.AddField(
+            model_name='modeldownload',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='modeldownload',
+            index=models.Index(fields=['created_at'], name='download_created_idx'),
+        ),
+    ]
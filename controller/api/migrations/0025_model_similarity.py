@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='api.model3d')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.model3d')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', '-score'], name='similarity_model_score_idx')],
+                'unique_together': {('model', 'similar')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_as_reviewed(apps, schema_editor):
+    """Os modelos já publicados não entram na fila: ficam aprovados ou ocultos conforme a visibilidade."""
+    Model3D = apps.get_model('api', 'Model3D')
+    Model3D.objects.filter(is_visible=True).update(review_state='approved')
+    Model3D.objects.filter(is_visible=False).update(review_state='hidden')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_model_similarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='model3d',
+            name='review_state',
+            field=models.CharField(choices=[('pending', 'Por rever'), ('approved', 'Aprovado'), ('hidden', 'Oculto')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='model3d',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='model3d',
+            name='reviewed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviewed_models', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(mark_existing_as_reviewed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='model3d',
+            index=models.Index(fields=['review_state', 'date', 'id'], name='model_review_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_review_state'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='model3d',
+            name='model_visible_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='model3d',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['-date', '-id'], name='model_visible_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='model3d',
+            index=models.Index(fields=['-date', '-id'], name='model_date_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_catalog_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='model3d',
+            name='bundle',
+            field=models.FileField(blank=True, upload_to='models3d/bundles/'),
+        ),
+        migrations.AddField(
+            model_name='modelimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, upload_to='models3d/thumbnails/'),
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50)),
+                ('payload', models.JSONField(default=dict)),
+                ('key', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Em execução'), ('done', 'Concluída'), ('failed', 'Falhou')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'run_after', 'id'], name='job_status_run_after_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.1 on 2026-10-19 19:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='former_user_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='former_username',
+            field=models.CharField(blank=True, max_length=150),
+        ),
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='ledgerjournal',
+            name='reason',
+            field=models.CharField(choices=[('opening', 'Saldo de abertura'), ('recycle', 'Reciclagem'), ('achievement', 'Conquista'), ('download', 'Download de modelo'), ('offer_created', 'Oferta criada'), ('offer_cancelled', 'Oferta cancelada'), ('offer_purchased', 'Oferta comprada'), ('exchange_created', 'Troca solicitada'), ('exchange_accepted', 'Troca aceita'), ('exchange_returned', 'Troca devolvida'), ('offer_expired', 'Oferta expirada'), ('exchange_expired', 'Troca expirada'), ('adjustment', 'Ajuste administrativo'), ('account_closed', 'Conta encerrada')], max_length=20, verbose_name='Motivo'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-19 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_ledger_entry_former_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='rerun',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running']), models.Q(('key', ''), _negated=True)), fields=('key',), name='job_active_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_job_active_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gamificationevent',
+            name='kind',
+            field=models.CharField(choices=[('bottles_recycled', 'Garrafas recicladas'), ('model_uploaded', 'Modelo publicado'), ('model_deleted', 'Modelo apagado')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_model_deleted_event'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ledgerjournal',
+            name='reason',
+            field=models.CharField(choices=[('opening', 'Saldo de abertura'), ('recycle', 'Reciclagem'), ('achievement', 'Conquista'), ('download', 'Download de modelo'), ('offer_created', 'Oferta criada'), ('offer_cancelled', 'Oferta cancelada'), ('offer_purchased', 'Oferta comprada'), ('gift', 'Doação'), ('exchange_created', 'Troca solicitada'), ('exchange_accepted', 'Troca aceita'), ('exchange_returned', 'Troca devolvida'), ('offer_expired', 'Oferta expirada'), ('exchange_expired', 'Troca expirada'), ('adjustment', 'Ajuste administrativo'), ('account_closed', 'Conta encerrada')], max_length=20, verbose_name='Motivo'),
+        ),
+    ]
@@ -1,5 +1,5 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 import datetime
 from django.utils.translation import gettext_lazy as _
@@ -21,6 +21,8 @@ class CustomUser(AbstractUser):
         default=0, verbose_name=_('Moedas de Reputação'))
     level = models.IntegerField(default=1, verbose_name=_('Nível'))
     experience = models.IntegerField(default=0, verbose_name=_('Experiência'))
+    # Experiência acumulada desde o nível 1; o nível e a experiência acima são derivados dela.
+    total_experience = models.BigIntegerField(default=0, verbose_name=_('Experiência Total'))
     profile_image = models.ImageField(
         upload_to="profile_images/", null=True, blank=True, verbose_name=_('Foto de Perfil')
     )
@@ -77,6 +79,9 @@ class UserAchievement(models.Model):
     user = models.ForeignKey(
         'CustomUser', on_delete=models.CASCADE, related_name="user_achievements")
     achievement = models.ForeignKey(Achievement, on_delete=models.CASCADE)
+    # Valor atual da estatística do critério, mantido pelos fluxos de escrita
+    # (update_user_achievements e o recálculo em massa) para o dashboard o ler diretamente.
+    progress = models.IntegerField(default=0, verbose_name=_('Progresso'))
     unlocked_at = models.DateTimeField(
         null=True, blank=True, verbose_name=_('Desbloqueada em'))
 
@@ -84,12 +89,19 @@ class UserAchievement(models.Model):
         unique_together = ('user', 'achievement')
 
     def unlock(self):
-        """Marca a conquista como desbloqueada se ainda não o estiver."""
-        if not self.unlocked_at:
-            self.unlocked_at = timezone.now()
-            self.save()
-            return True  # Retorna True se foi desbloqueada agora
-        return False  # Já estava desbloqueada
+        """
+        Marca a conquista como desbloqueada se ainda não o estiver.
+        A escrita é condicional, para que o desbloqueio (e a recompensa) só aconteça uma vez
+        mesmo quando o recálculo em massa corre ao mesmo tempo.
+        """
+        if self.unlocked_at:
+            return False  # Já estava desbloqueada
+        now = timezone.now()
+        if not UserAchievement.objects.filter(pk=self.pk, unlocked_at__isnull=True).update(unlocked_at=now):
+            self.refresh_from_db(fields=['unlocked_at'])
+            return False
+        self.unlocked_at = now
+        return True  # Retorna True se foi desbloqueada agora
 
 
 # --- Modelos de Reciclagem ---
@@ -104,6 +116,12 @@ class Bottle(models.Model):
         max_length=10, default='0', help_text=_('Ex: "500ml", "1L", "2L"'))
     date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Gráfico do dashboard (garrafas do utilizador num ano) e reconstrução das classificações.
+            models.Index(fields=['user', 'date'], name='bottle_user_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.type} - {self.quantity} garrafas de {self.volume}"
 
@@ -115,18 +133,154 @@ class RecyclingHistory(models.Model):
     """
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
-    month = models.CharField(max_length=7, help_text=_('Formato: "AAAA-MM"'))
+    month = models.DateField(help_text=_('Primeiro dia do mês.'))
     quantity = models.IntegerField(default=0)
 
     class Meta:
-        unique_together = ("user", "month")
+        constraints = [
+            # Também serve de índice (user, month) para as consultas por intervalo de meses.
+            models.UniqueConstraint(fields=['user', 'month'], name='history_user_month_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.month:%Y-%m}: {self.quantity} garrafas"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Pontuação pré-calculada de um utilizador num quadro de classificação.
+    Um quadro é identificado por (metric, period, period_start), ex: garrafas na semana de 2025-06-02.
+    As pontuações são incrementadas a cada evento, pelo que as leituras nunca ordenam a tabela toda.
+    """
+    METRIC_CHOICES = (
+        ('bottles', _('Garrafas recicladas')),
+        ('experience', _('Experiência total')),
+    )
+    PERIOD_CHOICES = (
+        ('weekly', _('Semanal')),
+        ('monthly', _('Mensal')),
+        ('all_time', _('Geral')),
+    )
+
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    score = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('metric', 'period', 'period_start', 'user')
+        indexes = [
+            models.Index(fields=['metric', 'period', 'period_start', '-score', 'user'],
+                         name='leaderboard_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric}/{self.period} {self.period_start} - {self.user_id}: {self.score}"
+
+
+class GamificationEvent(models.Model):
+    """
+    Evento de gamificação emitido por um pedido (ex: garrafas recicladas) e processado fora dele.
+    A chave de idempotência impede que o mesmo facto seja registado duas vezes e os eventos
+    de cada utilizador são processados pela ordem de criação.
+    """
+    KIND_CHOICES = (
+        ('bottles_recycled', _('Garrafas recicladas')),
+        ('model_uploaded', _('Modelo publicado')),
+        ('model_deleted', _('Modelo apagado')),
+    )
+    STATUS_CHOICES = (
+        ('pending', _('Pendente')),
+        ('done', _('Processado')),
+        ('failed', _('Falhou')),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='gamification_events')
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict)
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'user', 'id'], name='gamevent_status_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} ({self.user_id}) - {self.status}"
+
+
+class Job(models.Model):
+    """
+    Tarefa em segundo plano (ex: miniaturas, ZIP de download, limpeza de ficheiros), executada
+    pelo comando 'run_jobs'. As tarefas que falham voltam à fila com um intervalo crescente
+    até JOBS['MAX_ATTEMPTS'] tentativas.
+    """
+    STATUS_CHOICES = (
+        ('pending', _('Pendente')),
+        ('running', _('Em execução')),
+        ('done', _('Concluída')),
+        ('failed', _('Falhou')),
+    )
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    # Chave opcional: só pode haver uma tarefa pendente ou em execução com a mesma chave. Se a
+    # tarefa já estiver a correr, 'rerun' pede que volte à fila quando terminar.
+    key = models.CharField(max_length=100, blank=True, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    rerun = models.BooleanField(default=False)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'id'], name='job_status_run_after_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'], condition=models.Q(status__in=['pending', 'running']) & ~models.Q(key=''),
+                name='job_active_key_uniq'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.month}: {self.quantity} garrafas"
+        return f"{self.kind} #{self.pk} - {self.status}"
 
 
 # --- Modelos de Conteúdo (Modelos 3D) ---
 
+class Model3DQuerySet(models.QuerySet):
+    def for_catalog(self, user=None):
+        """
+        Carrega tudo o que o Model3DSerializer mostra: o autor no mesmo SELECT, as imagens e os
+        ficheiros numa consulta cada e, para um utilizador autenticado, os estados de like e de
+        favorito como subconsultas EXISTS. Assim uma página custa sempre o mesmo número de consultas.
+        """
+        queryset = self.select_related('user').prefetch_related('images', 'files')
+        if user is not None and user.is_authenticated:
+            queryset = queryset.annotate(
+                liked=models.Exists(ModelLike.objects.filter(user=user, model=models.OuterRef('pk'))),
+                saved=models.Exists(ModelFavorite.objects.filter(user=user, model=models.OuterRef('pk'))),
+            )
+        return queryset
+
+
 class Model3D(models.Model):
     """Representa um modelo 3D publicado por um utilizador."""
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
@@ -141,6 +295,39 @@ class Model3D(models.Model):
     is_free = models.BooleanField(default=True)
     is_visible = models.BooleanField(default=True, help_text=_(
         "Controla se o modelo é visível para o público."))
+    # Contagem desnormalizada, mantida pelo CommentViewSet, para o catálogo não contar comentários.
+    comments_count = models.IntegerField(default=0)
+    # Likes, comentários e downloads recentes com decaimento no tempo (ver api/trending.py).
+    trending_score = models.FloatField(default=0)
+
+    # Moderação: os modelos novos ficam 'pending' até um curador os aprovar ou ocultar.
+    REVIEW_STATES = (('pending', _('Por rever')),
+                     ('approved', _('Aprovado')),
+                     ('hidden', _('Oculto')))
+    review_state = models.CharField(max_length=10, choices=REVIEW_STATES, default='pending')
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+    reviewed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+                                    null=True, blank=True, related_name='reviewed_models')
+    # ZIP com todos os ficheiros, gerado em segundo plano (tarefa 'bundle_model', ver api/jobs.py).
+    # Fica vazio sempre que os ficheiros mudam, até o novo ZIP estar pronto.
+    bundle = models.FileField(upload_to="models3d/bundles/", blank=True)
+
+    objects = Model3DQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Catálogo público (visíveis, mais recentes primeiro) e "os meus modelos". O Django
+            # escreve filter(is_visible=True) como 'WHERE is_visible', que o SQLite não consegue
+            # usar num índice composto; um índice parcial com a mesma condição já é usado.
+            models.Index(fields=['-date', '-id'], condition=models.Q(is_visible=True), name='model_visible_date_idx'),
+            # Catálogo dos utilizadores autenticados (visíveis ou próprios) e dos curadores.
+            models.Index(fields=['-date', '-id'], name='model_date_idx'),
+            models.Index(fields=['-trending_score', '-id'], condition=models.Q(is_visible=True),
+                         name='model_visible_trending_idx'),
+            models.Index(fields=['user', '-date'], name='model_user_date_idx'),
+            # Fila de moderação: modelos de um estado, os mais antigos primeiro.
+            models.Index(fields=['review_state', 'date', 'id'], name='model_review_queue_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -162,6 +349,8 @@ class ModelImage(models.Model):
     model3d = models.ForeignKey(
         Model3D, on_delete=models.CASCADE, related_name="images")
     image = models.ImageField(upload_to="models3d/images/")
+    # Miniatura para as listagens, gerada em segundo plano (tarefa 'thumbnails', ver api/jobs.py).
+    thumbnail = models.ImageField(upload_to="models3d/thumbnails/", blank=True)
 
     def __str__(self):
         return f"Imagem para {self.model3d.name}"
@@ -176,6 +365,12 @@ class ModelLike(models.Model):
 
     class Meta:
         unique_together = ('user', 'model')
+        indexes = [
+            # Lista "modelos que curti", ordenada pela data do like.
+            models.Index(fields=['user', '-created_at'], name='like_user_created_idx'),
+            # Likes recentes, para a pontuação de tendência.
+            models.Index(fields=['created_at'], name='like_created_idx'),
+        ]
 
 
 class ModelFavorite(models.Model):
@@ -187,6 +382,9 @@ class ModelFavorite(models.Model):
 
     class Meta:
         unique_together = ('user', 'model')
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='favorite_user_created_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -198,10 +396,46 @@ class Comment(models.Model):
     text = models.TextField()
     date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Feed de comentários de um modelo, paginado por cursor em (-date, -id).
+            models.Index(fields=['model', '-date', '-id'], name='comment_model_date_idx'),
+            models.Index(fields=['date'], name='comment_date_idx'),
+        ]
+
     def __str__(self):
         return f"Comentário de {self.user.username} - {self.text[:30]}"
 
 
+class ModelSimilarity(models.Model):
+    """
+    Um dos vizinhos mais próximos de um Model3D, pela co-ocorrência de likes e favoritos.
+    Recalculado pelo comando 'build_recommendations' (ver api/recommendations.py).
+    """
+    model = models.ForeignKey(Model3D, on_delete=models.CASCADE, related_name='similarities')
+    similar = models.ForeignKey(Model3D, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('model', 'similar')
+        indexes = [
+            models.Index(fields=['model', '-score'], name='similarity_model_score_idx'),
+        ]
+
+
+class ModelDownload(models.Model):
+    """Regista cada download de um Model3D (usado na pontuação de tendência)."""
+    model = models.ForeignKey(Model3D, on_delete=models.CASCADE)
+    # Nulo nos downloads de visitantes anónimos (só possíveis em modelos gratuitos).
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='download_created_idx'),
+        ]
+
+
 # --- Modelos do Marketplace ---
 
 class CoinOffer(models.Model):
@@ -213,7 +447,7 @@ class CoinOffer(models.Model):
                   ('reputation', _('Reputação')))
     OFFER_TYPES = (('sale', _('Venda')), ('gift', _('Doação')))
     STATUS_CHOICES = (('active', _('Ativa')), ('completed', _(
-        'Concluída')), ('cancelled', _('Cancelada')))
+        'Concluída')), ('cancelled', _('Cancelada')), ('expired', _('Expirada')))
 
     seller = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='coin_offers')
@@ -232,6 +466,12 @@ class CoinOffer(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='offer_status_created_idx'),
+            # Mercado: ofertas ativas de um tipo de moeda, mais recentes primeiro.
+            models.Index(fields=['status', 'coin_type', '-created_at'], name='offer_status_coin_created_idx'),
+            models.Index(fields=['seller', '-created_at'], name='offer_seller_created_idx'),
+        ]
 
     def __str__(self):
         return f"Oferta de {self.amount} {self.get_coin_type_display()} por {self.seller.username}"
@@ -243,6 +483,16 @@ class CoinOffer(models.Model):
         return math.floor(self.amount * self.price_per_coin)
 
 
+class CoinTransactionQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Cria as transações e as respetivas linhas em UserTransactionIndex."""
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            UserTransactionIndex.objects.bulk_create(
+                [row for obj in objs for row in obj.index_rows()])
+        return objs
+
+
 class CoinTransaction(models.Model):
     """
     Registra todas as transações de moedas entre usuários,
@@ -252,6 +502,7 @@ class CoinTransaction(models.Model):
         ('purchase', _('Compra')),
         ('gift', _('Doação')),
         ('system', _('Sistema')),
+        ('refund', _('Reembolso')),
     )
 
     COIN_TYPES = (
@@ -312,13 +563,61 @@ class CoinTransaction(models.Model):
         verbose_name = _('Transação de Moedas')
         verbose_name_plural = _('Transações de Moedas')
         ordering = ['-transaction_date']
+        indexes = [
+            models.Index(fields=['sender', '-transaction_date'], name='tx_sender_date_idx'),
+            models.Index(fields=['receiver', '-transaction_date'], name='tx_receiver_date_idx'),
+        ]
+
+    objects = CoinTransactionQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if adding:
+                UserTransactionIndex.objects.bulk_create(self.index_rows())
+
+    def index_rows(self):
+        """Linhas do índice por utilizador: uma para o remetente (se houver) e outra para o destinatário."""
+        participants = [(self.sender_id, 'sent'), (self.receiver_id, 'received')]
+        return [
+            UserTransactionIndex(
+                user_id=user_id, transaction=self, role=role,
+                coin_type=self.coin_type, transaction_date=self.transaction_date,
+            )
+            for user_id, role in participants if user_id
+        ]
 
     def __str__(self):
-        if self.transaction_type == 'system':
+        if self.sender_id is None:
             return f"Sistema → {self.receiver.username}: {self.amount} {self.get_coin_type_display()}"
         return f"{self.sender.username} → {self.receiver.username}: {self.amount} {self.get_coin_type_display()}"
 
 
+class UserTransactionIndex(models.Model):
+    """
+    Índice por utilizador das transações de moedas, com uma linha por participante.
+    Permite ler o histórico de um utilizador como um intervalo de um único índice,
+    em vez de um OR entre 'sender' e 'receiver'.
+    """
+    ROLE_CHOICES = (('sent', _('Enviada')), ('received', _('Recebida')))
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='transaction_index')
+    transaction = models.ForeignKey(
+        CoinTransaction, on_delete=models.CASCADE, related_name='user_index')
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    coin_type = models.CharField(max_length=20, choices=CoinTransaction.COIN_TYPES)
+    transaction_date = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-transaction_date', '-id'], name='txindex_user_date_idx'),
+            models.Index(fields=['user', 'coin_type', '-transaction_date', '-id'],
+                         name='txindex_user_coin_date_idx'),
+        ]
+
+
 class ExchangeRequest(models.Model):
     """
     Solicitações diretas de troca de moedas entre usuários
@@ -329,6 +628,7 @@ class ExchangeRequest(models.Model):
         ('accepted', _('Aceita')),
         ('rejected', _('Rejeitada')),
         ('cancelled', _('Cancelada')),
+        ('expired', _('Expirada')),
     )
 
     requester = models.ForeignKey(
@@ -392,6 +692,12 @@ class ExchangeRequest(models.Model):
         verbose_name = _('Solicitação de Troca')
         verbose_name_plural = _('Solicitações de Troca')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='exchange_status_created_idx'),
+            # Pedidos enviados ou recebidos por um utilizador, por estado e data.
+            models.Index(fields=['requester', 'status', '-created_at'], name='exchange_requester_idx'),
+            models.Index(fields=['receiver', 'status', '-created_at'], name='exchange_receiver_idx'),
+        ]
 
     def __str__(self):
         return f"Solicitação de {self.requester.username} para {self.receiver.username}"
@@ -401,3 +707,108 @@ class ExchangeRequest(models.Model):
         offers_something = self.offer_recycling_coins > 0 or self.offer_reputation_coins > 0
         requests_something = self.request_recycling_coins > 0 or self.request_reputation_coins > 0
         return offers_something and requests_something
+
+
+# --- Modelos do Livro-Razão ---
+
+class LedgerJournal(models.Model):
+    """
+    Cabeçalho de um lançamento no livro-razão de partidas dobradas.
+    Agrupa as entradas de uma mesma operação; a soma das entradas, por tipo de moeda, é sempre zero.
+    """
+    REASON_CHOICES = (
+        ('opening', _('Saldo de abertura')),
+        ('recycle', _('Reciclagem')),
+        ('achievement', _('Conquista')),
+        ('download', _('Download de modelo')),
+        ('offer_created', _('Oferta criada')),
+        ('offer_cancelled', _('Oferta cancelada')),
+        ('offer_purchased', _('Oferta comprada')),
+        ('gift', _('Doação')),
+        ('exchange_created', _('Troca solicitada')),
+        ('exchange_accepted', _('Troca aceita')),
+        ('exchange_returned', _('Troca devolvida')),
+        ('offer_expired', _('Oferta expirada')),
+        ('exchange_expired', _('Troca expirada')),
+        ('adjustment', _('Ajuste administrativo')),
+        ('account_closed', _('Conta encerrada')),
+    )
+
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, verbose_name=_('Motivo'))
+    reference = models.CharField(
+        max_length=50, blank=True, help_text=_('Objeto de origem, ex: "offer:12".'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Criado em'))
+
+    class Meta:
+        verbose_name = _('Lançamento')
+        verbose_name_plural = _('Lançamentos')
+
+    def __str__(self):
+        return f"{self.get_reason_display()} #{self.pk}"
+
+
+class LedgerEntry(models.Model):
+    """
+    Uma perna de um lançamento: o movimento (positivo ou negativo) de uma conta numa moeda.
+    A conta é um utilizador ou, quando 'user' é nulo, uma das contas de sistema. Quando um
+    utilizador é apagado (ver ledger.close_account), as suas entradas ficam com 'user' nulo e
+    guardam o id e o nome que ele tinha.
+    """
+    SYSTEM_ACCOUNTS = (
+        ('mint', _('Emissão')),
+        ('escrow', _('Reserva')),
+        ('burn', _('Consumo')),
+        ('adjustment', _('Ajuste')),
+    )
+    COIN_TYPES = CoinTransaction.COIN_TYPES
+
+    journal = models.ForeignKey(LedgerJournal, on_delete=models.PROTECT, related_name='entries')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL,
+        related_name='ledger_entries')
+    former_user_id = models.IntegerField(null=True, blank=True)
+    former_username = models.CharField(max_length=150, blank=True)
+    system_account = models.CharField(max_length=10, choices=SYSTEM_ACCOUNTS, blank=True)
+    coin_type = models.CharField(max_length=20, choices=COIN_TYPES)
+    amount = models.IntegerField(help_text=_('Positivo para créditos, negativo para débitos.'))
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = _('Entrada do Livro-Razão')
+        verbose_name_plural = _('Entradas do Livro-Razão')
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='ledger_user_date_idx'),
+            models.Index(fields=['system_account', 'coin_type', 'amount'], name='ledger_system_idx'),
+        ]
+
+    def __str__(self):
+        if self.user_id:
+            account = self.user.username
+        else:
+            account = self.former_username or self.get_system_account_display()
+        return f"{account}: {self.amount:+d} {self.get_coin_type_display()}"
+
+
+class BalanceSnapshot(models.Model):
+    """
+    Saldo de um utilizador até uma entrada do livro-razão (inclusive).
+    Todas as linhas de uma mesma execução partilham o 'last_entry_id', pelo que o saldo numa data
+    é o snapshot anterior a essa data mais as entradas posteriores a ele.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='balance_snapshots')
+    last_entry_id = models.BigIntegerField()
+    taken_at = models.DateTimeField(db_index=True)
+    recycling_coins = models.IntegerField(default=0)
+    reputation_coins = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = _('Snapshot de Saldo')
+        verbose_name_plural = _('Snapshots de Saldo')
+        unique_together = ('user', 'last_entry_id')
+        indexes = [
+            models.Index(fields=['last_entry_id'], name='snapshot_watermark_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} @ {self.last_entry_id}"
@@ -0,0 +1,40 @@
+# api/moderation.py
+
+"""
+Moderação de modelos 3D pelos curadores.
+
+Os modelos novos ficam com review_state='pending' e aparecem na fila de moderação
+(índice (review_state, date, id)). Aprovar ou ocultar é sempre um único UPDATE, seja de um modelo
+(set_visibility) ou de centenas (ação em lote), seguido da invalidação das entradas da cache
+do catálogo que contêm esses modelos.
+"""
+
+from django.utils import timezone
+
+from . import catalog_cache
+from .models import Model3D
+
+# Decisão -> (review_state, is_visible).
+DECISIONS = {
+    'approve': ('approved', True),
+    'hide': ('hidden', False),
+}
+
+# Máximo de modelos por pedido em lote.
+MAX_BATCH = 1000
+
+
+def apply(model_ids, decision, curator):
+    """
+    Aplica a decisão ('approve' ou 'hide') aos modelos indicados.
+
+    Returns:
+        int: Número de modelos atualizados.
+    """
+    review_state, is_visible = DECISIONS[decision]
+    updated = Model3D.objects.filter(pk__in=model_ids).update(
+        review_state=review_state, is_visible=is_visible,
+        reviewed_at=timezone.now(), reviewed_by=curator)
+    if updated:
+        catalog_cache.invalidate(catalog_cache.LIST_TAG, models=model_ids)
+    return updated
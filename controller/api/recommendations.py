@@ -0,0 +1,116 @@
+# api/recommendations.py
+
+"""
+Recomendações de modelos 3D a partir da co-ocorrência de likes e favoritos.
+
+O cálculo é feito offline (comando 'build_recommendations'): as interações formam uma matriz
+esparsa modelo × utilizador (1 por like, 1 por favorito) e a semelhança entre dois modelos é o
+cosseno entre as suas linhas, ou seja, quantos utilizadores têm em comum, normalizado pela
+popularidade de cada um. A matriz de semelhança é calculada em lotes de linhas, para limitar a
+memória, e só os K vizinhos mais próximos de cada modelo são guardados em ModelSimilarity.
+
+O feed de um utilizador (recommend) junta os vizinhos dos modelos de que gostou ou que guardou
+com uma única consulta agregada sobre o índice (model, -score).
+"""
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from scipy import sparse
+
+from .models import Model3D, ModelFavorite, ModelLike, ModelSimilarity
+
+
+# --- Cálculo ---
+
+def compute_neighbours(model_ids, user_ids, k=20, batch_size=1000):
+    """
+    Calcula os K vizinhos mais semelhantes de cada modelo.
+
+    Args:
+        model_ids, user_ids: Sequências paralelas, uma entrada por interação (like ou favorito).
+        k: Número de vizinhos guardados por modelo.
+        batch_size: Linhas da matriz de semelhança calculadas de cada vez.
+
+    Returns:
+        list: Tuplos (model_id, similar_id, score).
+    """
+    model_ids = np.asarray(model_ids, dtype=np.int64)
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    if not len(model_ids):
+        return []
+    models, rows = np.unique(model_ids, return_inverse=True)
+    _, columns = np.unique(user_ids, return_inverse=True)
+
+    matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, columns)))
+    matrix.sum_duplicates()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    normalized = sparse.diags(1 / norms) @ matrix
+    transposed = normalized.T.tocsc()
+
+    neighbours = []
+    for start in range(0, len(models), batch_size):
+        block = (normalized[start:start + batch_size] @ transposed).tocsr()
+        for offset in range(block.shape[0]):
+            row = start + offset
+            first, last = block.indptr[offset], block.indptr[offset + 1]
+            similar, scores = block.indices[first:last], block.data[first:last]
+            keep = similar != row
+            similar, scores = similar[keep], scores[keep]
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+                similar, scores = similar[top], scores[top]
+            model_id = int(models[row])
+            neighbours.extend((model_id, similar_id, score)
+                              for similar_id, score in zip(models[similar].tolist(), scores.tolist()))
+    return neighbours
+
+
+def build(k=None, batch_size=1000):
+    """
+    Recalcula todas as semelhanças a partir dos likes e favoritos e substitui as anteriores.
+
+    Returns:
+        int: Número de pares (modelo, vizinho) gravados.
+    """
+    k = k or settings.RECOMMENDATIONS['NEIGHBOURS']
+    interactions = list(ModelLike.objects.values_list('model_id', 'user_id'))
+    interactions += ModelFavorite.objects.values_list('model_id', 'user_id')
+    model_ids, user_ids = zip(*interactions) if interactions else ((), ())
+    neighbours = compute_neighbours(model_ids, user_ids, k=k, batch_size=batch_size)
+
+    with transaction.atomic():
+        ModelSimilarity.objects.all().delete()
+        ModelSimilarity.objects.bulk_create(
+            [ModelSimilarity(model_id=model_id, similar_id=similar_id, score=score)
+             for model_id, similar_id, score in neighbours],
+            batch_size=batch_size)
+    return len(neighbours)
+
+
+# --- Leitura ---
+
+def recommend(user, limit=20):
+    """
+    Devolve os modelos visíveis recomendados a 'user', por ordem de relevância: a soma das
+    semelhanças com os modelos mais recentes de que gostou ou que guardou. Os modelos que já
+    conhece e os seus próprios ficam de fora. Sem histórico, devolve os modelos em tendência.
+    """
+    seeds_limit = settings.RECOMMENDATIONS['SEED_MODELS']
+    seeds = set(ModelLike.objects.filter(user=user).order_by('-created_at')
+                .values_list('model_id', flat=True)[:seeds_limit])
+    seeds |= set(ModelFavorite.objects.filter(user=user).order_by('-created_at')
+                 .values_list('model_id', flat=True)[:seeds_limit])
+
+    visible = Model3D.objects.for_catalog(user).filter(is_visible=True).exclude(user=user)
+    if not seeds:
+        return list(visible.order_by('-trending_score', '-id')[:limit])
+
+    ranked = (ModelSimilarity.objects.filter(model_id__in=seeds, similar__is_visible=True)
+              .exclude(similar_id__in=seeds).exclude(similar__user=user)
+              .values('similar_id').annotate(relevance=Sum('score'))
+              .order_by('-relevance', 'similar_id')[:limit])
+    ids = [row['similar_id'] for row in ranked]
+    models = visible.in_bulk(ids)
+    return [models[pk] for pk in ids if pk in models]
@@ -0,0 +1,318 @@
+# api/seeding.py
+
+"""
+Geração de dados sintéticos para benchmarks e ambientes de teste.
+
+Os registos são criados com bulk_create, em lotes, e os saldos iniciais passam pelo
+livro-razão (lançamentos de abertura), pelo que check_ledger continua a dar tudo certo
+depois de semear. Todos os utilizadores partilham o mesmo hash de palavra-passe, calculado
+uma única vez.
+
+Os utilizadores (com as garrafas e o histórico mensal) e os modelos (com ficheiros, imagens,
+likes e comentários) são gerados em blocos. Cada bloco tem o seu próprio gerador aleatório,
+derivado da semente e do número do bloco, e corre na sua própria transação: com a mesma
+semente os dados são sempre os mesmos, quer os blocos corram em sequência quer em processos
+paralelos (só os ids podem mudar de ordem).
+"""
+
+import multiprocessing
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import achievements, leaderboards, ledger, leveling, recommendations, trending
+from .models import (
+    Achievement, Bottle, CoinOffer, CoinTransaction, Comment, CustomUser, Model3D, ModelFile, ModelImage,
+    ModelLike, RecyclingHistory,
+)
+from .moderation import DECISIONS
+
+PASSWORD = 'reciclo-seed'
+USERNAME_PREFIX = 'seed_user_'
+OPENING_BALANCE = {'recycling': 100_000, 'reputation': 100_000}
+USERS_PER_CHUNK = 1000
+MODELS_PER_CHUNK = 500
+
+BOTTLE_TYPES = ('Água', 'Refrigerante', 'Sumo', 'Cerveja', 'Leite')
+# Gramas de filamento (e experiência) por garrafa, como em views.FILAMENT_GRAMS_BY_VOLUME.
+VOLUMES = {'350ml': 15, '500ml': 20, '1L': 30, '1.5L': 40, '2L': 50}
+WORDS = ('vaso', 'suporte', 'caixa', 'engrenagem', 'chaveiro', 'miniatura', 'organizador',
+         'luminária', 'brinquedo', 'peça', 'tampa', 'gancho')
+COMMENTS = ('Ficou ótimo!', 'Imprimi em PETG reciclado, recomendo.', 'Boa ideia.',
+            'As medidas estão certas?', 'Obrigado pela partilha!')
+
+# Conquistas de exemplo, uma por tipo de critério.
+ACHIEVEMENTS = (
+    ('seed-bottles', 'Reciclador', 'BOTTLES_TOTAL', 100),
+    ('seed-level', 'Veterano', 'USER_LEVEL', 5),
+    ('seed-monthly', 'Mês Verde', 'MONTHLY_BOTTLES', 50),
+    ('seed-streak', 'Constante', 'CONSECUTIVE_MONTHS', 3),
+    ('seed-models', 'Criador', 'MODELS_UPLOADED', 3),
+)
+
+# Campos com auto_now_add a que os dados gerados dão datas espalhadas no tempo.
+DATED_FIELDS = (
+    (Bottle, 'date'), (Model3D, 'date'), (ModelLike, 'created_at'), (Comment, 'date'),
+    (CoinOffer, 'created_at'), (CoinTransaction, 'transaction_date'),
+)
+
+# Um cubo em STL ASCII e um PNG de 1x1: os ficheiros são partilhados por todos os modelos.
+STL_CONTENT = b"solid cube\nfacet normal 0 0 1\nouter loop\nvertex 0 0 1\nvertex 1 0 1\nvertex 0 1 1\nendloop\nendfacet\nendsolid cube\n"
+PNG_CONTENT = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360f8cfc0f01f0005000201a5d6'
+    '7f8a0000000049454e44ae426082')
+
+
+# --- Utilitários ---
+
+def _batches(items, batch_size):
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+@contextmanager
+def _explicit_dates():
+    """Desliga temporariamente o auto_now_add, para que as datas geradas sejam gravadas."""
+    fields = [model._meta.get_field(name) for model, name in DATED_FIELDS]
+    previous = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, previous):
+            field.auto_now_add = value
+
+
+def _random_moment(rng, now, years):
+    """Um instante aleatório nos últimos 'years' anos."""
+    return now - timedelta(seconds=rng.randrange(max(int(years * 365 * 86400), 1)))
+
+
+def _shared_file(name, content):
+    """Grava (uma só vez) um ficheiro partilhado e devolve o nome no storage."""
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(content))
+    return name
+
+
+def _run_chunks(function, tasks, processes):
+    """Corre os blocos em sequência ou num pool de processos; devolve os resultados por ordem."""
+    if processes <= 1 or len(tasks) <= 1:
+        return [function(task) for task in tasks]
+    # Os processos filhos não podem herdar ligações abertas: cada um abre a sua.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('fork')) as pool:
+        return list(pool.map(function, tasks))
+
+
+# --- Blocos ---
+
+def _seed_users(task):
+    """Cria um bloco de utilizadores com saldos de abertura, garrafas e histórico mensal."""
+    index, first, count, options = task
+    rng = random.Random(f"{options['seed']}:users:{index}")
+    now, zone = options['now'], timezone.get_current_timezone()
+
+    users, bottles, months = [], [], Counter()
+    for number in range(first, first + count):
+        username = f'{USERNAME_PREFIX}{number}'
+        experience = 0
+        for _ in range(options['bottles_per_user']):
+            volume = rng.choice(tuple(VOLUMES))
+            bottle = Bottle(quantity=rng.randint(1, 20), type=rng.choice(BOTTLE_TYPES),
+                            volume=volume, date=_random_moment(rng, now, options['years']))
+            experience += VOLUMES[volume] * bottle.quantity
+            months[len(users), bottle.date.astimezone(zone).date().replace(day=1)] += bottle.quantity
+            bottles.append((len(users), bottle))
+        level, remainder = leveling.level_for(experience)
+        users.append(CustomUser(username=username, email=f'{username}@example.com', password=options['password'],
+                                total_experience=experience, level=level, experience=remainder))
+
+    batch_size = options['batch_size']
+    with _explicit_dates(), transaction.atomic():
+        CustomUser.objects.bulk_create(users, batch_size=batch_size)
+        user_ids = [user.pk for user in users]
+
+        # Uma única saída da conta de emissão para todo o bloco.
+        postings = []
+        for coin_type, amount in OPENING_BALANCE.items():
+            postings.append((ledger.MINT, coin_type, -amount * len(user_ids)))
+            postings += [(user_id, coin_type, amount) for user_id in user_ids]
+        ledger.post('opening', postings, reference='seed')
+
+        for position, bottle in bottles:
+            bottle.user_id = user_ids[position]
+        Bottle.objects.bulk_create([bottle for _, bottle in bottles], batch_size=batch_size)
+        RecyclingHistory.objects.bulk_create(
+            [RecyclingHistory(user_id=user_ids[position], month=month, quantity=quantity)
+             for (position, month), quantity in months.items()],
+            batch_size=batch_size)
+    return user_ids
+
+
+def _seed_models(task):
+    """Cria um bloco de modelos com ficheiros, imagens, likes e comentários."""
+    index, first, count, options = task
+    rng = random.Random(f"{options['seed']}:models:{index}")
+    now, user_ids = options['now'], options['user_ids']
+
+    models, likes, comments = [], [], []
+    for number in range(first, first + count):
+        created = _random_moment(rng, now, options['years'])
+        # A maioria já foi aprovada; um em cada dez foi ocultado e outro ainda aguarda moderação.
+        decision = {0: 'hide', 1: None}.get(number % 10, 'approve')
+        review_state, is_visible = DECISIONS[decision] if decision else ('pending', True)
+        reviewed_at = created + (now - created) * rng.random() if decision else None
+        likers = rng.sample(user_ids, min(len(user_ids), rng.randint(0, 2 * options['likes_per_model'])))
+        thread = [(rng.choice(user_ids), rng.choice(COMMENTS), created + (now - created) * rng.random())
+                  for _ in range(rng.randint(0, 2 * options['comments_per_model']))]
+        models.append(Model3D(
+            user_id=rng.choice(user_ids), name=f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {number}",
+            description=' '.join(rng.choice(WORDS) for _ in range(12)), date=created,
+            likes=len(likers), downloads=rng.randint(0, 2000), comments_count=len(thread),
+            is_free=number % 4 != 0, price=0 if number % 4 else rng.randint(5, 50), is_visible=is_visible,
+            review_state=review_state, reviewed_at=reviewed_at))
+        likes.append([(user_id, created + (now - created) * rng.random()) for user_id in likers])
+        comments.append(thread)
+
+    batch_size = options['batch_size']
+    with _explicit_dates(), transaction.atomic():
+        Model3D.objects.bulk_create(models, batch_size=batch_size)
+        files, images = [], []
+        for position, model in enumerate(models):
+            files.append(ModelFile(model=model, file=options['stl'][0], file_name='cube.stl'))
+            if (first + position) % 2:
+                files.append(ModelFile(model=model, file=options['stl'][1], file_name='cube_parte2.stl'))
+            images.append(ModelImage(model3d=model, image=options['png']))
+        ModelFile.objects.bulk_create(files, batch_size=batch_size)
+        ModelImage.objects.bulk_create(images, batch_size=batch_size)
+        ModelLike.objects.bulk_create(
+            [ModelLike(user_id=user_id, model=model, created_at=when)
+             for model, rows in zip(models, likes) for user_id, when in rows],
+            batch_size=batch_size)
+        Comment.objects.bulk_create(
+            [Comment(user_id=user_id, model=model, text=text, date=when)
+             for model, rows in zip(models, comments) for user_id, text, when in rows],
+            batch_size=batch_size)
+    return [model.pk for model in models], len(files), sum(map(len, likes)), sum(map(len, comments))
+
+
+def _seed_marketplace(user_ids, offers, transactions, options):
+    """Cria as ofertas ativas (com as moedas em reserva) e as transações concluídas."""
+    rng = random.Random(f"{options['seed']}:marketplace")
+    now, batch_size = options['now'], options['batch_size']
+
+    offer_rows = [
+        CoinOffer(seller_id=rng.choice(user_ids), coin_type=rng.choice(('recycling', 'reputation')),
+                  amount=rng.randint(1, 100), price_per_coin=rng.choice((0.5, 1, 2)),
+                  created_at=now - timedelta(seconds=rng.randrange(7 * 86400)))
+        for _ in range(offers)]
+    transaction_rows = []
+    for _ in range(transactions if len(user_ids) > 1 else 0):
+        sender, receiver = rng.sample(user_ids, 2)
+        transaction_rows.append(CoinTransaction(
+            sender_id=sender, receiver_id=receiver, coin_type=rng.choice(('recycling', 'reputation')),
+            amount=rng.randint(1, 50), transaction_type='gift',
+            transaction_date=_random_moment(rng, now, options['years'])))
+
+    with _explicit_dates(), transaction.atomic():
+        for chunk in _batches(offer_rows, batch_size):
+            CoinOffer.objects.bulk_create(chunk)
+            postings = []
+            for offer in chunk:
+                postings += ledger.transfer(offer.coin_type, offer.amount, offer.seller_id, ledger.ESCROW)
+            ledger.post('offer_created', postings, reference='seed')
+        for chunk in _batches(transaction_rows, batch_size):
+            CoinTransaction.objects.bulk_create(chunk)
+            postings = []
+            for row in chunk:
+                postings += ledger.transfer(row.coin_type, row.amount, row.sender_id, row.receiver_id)
+            ledger.post('gift', postings, reference='seed')
+    return [offer.pk for offer in offer_rows], len(transaction_rows)
+
+
+# --- Ponto de entrada ---
+
+def seed_dataset(users=100, bottles_per_user=10, models=50, offers=100, transactions=200, years=3,
+                 likes_per_model=5, comments_per_model=2, seed=0, batch_size=1000, processes=1, derived=True):
+    """
+    Cria um conjunto de dados sintético.
+
+    Args:
+        users: Número de utilizadores.
+        bottles_per_user: Registos de reciclagem por utilizador, espalhados pelos últimos 'years' anos.
+        models: Número de modelos 3D (metade com um ficheiro, metade com dois).
+        offers: Ofertas ativas no mercado, com as moedas em reserva.
+        transactions: Transações concluídas no histórico.
+        years: Período coberto pelas datas geradas.
+        likes_per_model: Média de likes por modelo.
+        comments_per_model: Média de comentários por modelo.
+        seed: Semente do gerador aleatório.
+        batch_size: Tamanho dos lotes de bulk_create.
+        processes: Processos em paralelo para os blocos de utilizadores e de modelos.
+        derived: Recalcula no fim as conquistas, os quadros de classificação, as pontuações de
+            tendência e as recomendações. Com muitos anos de garrafas os quadros semanais são a
+            parte mais lenta; sem esta opção podem ser gerados depois com 'rebuild_leaderboards',
+            'recompute_achievements', 'update_trending' e 'build_recommendations'.
+
+    Returns:
+        dict: Ids criados ('users', 'models', 'offers') e as contagens por tabela.
+    """
+    first = CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).count()
+    options = {
+        'seed': seed, 'now': timezone.now(), 'years': years, 'batch_size': batch_size,
+        'bottles_per_user': bottles_per_user, 'likes_per_model': likes_per_model,
+        'comments_per_model': comments_per_model, 'password': make_password(PASSWORD),
+        'stl': (_shared_file('models3d/files/seed_cube.stl', STL_CONTENT),
+                _shared_file('models3d/files/seed_cube_parte2.stl', STL_CONTENT)),
+        'png': _shared_file('models3d/images/seed_preview.png', PNG_CONTENT),
+    }
+
+    tasks = [(index, first + start, min(USERS_PER_CHUNK, users - start), options)
+             for index, start in enumerate(range(0, users, USERS_PER_CHUNK))]
+    user_ids = [pk for chunk in _run_chunks(_seed_users, tasks, processes) for pk in chunk]
+
+    model_ids, files, likes, comments = [], 0, 0, 0
+    if user_ids:
+        options['user_ids'] = user_ids
+        tasks = [(index, start, min(MODELS_PER_CHUNK, models - start), options)
+                 for index, start in enumerate(range(0, models, MODELS_PER_CHUNK))]
+        for chunk_ids, chunk_files, chunk_likes, chunk_comments in _run_chunks(_seed_models, tasks, processes):
+            model_ids += chunk_ids
+            files += chunk_files
+            likes += chunk_likes
+            comments += chunk_comments
+        offer_ids, transaction_count = _seed_marketplace(user_ids, offers, transactions, options)
+    else:
+        offer_ids, transaction_count = [], 0
+
+    Achievement.objects.bulk_create(
+        [Achievement(id=pk, title=title, description=title, criteria_type=criteria_type,
+                     criteria_value=value) for pk, title, criteria_type, value in ACHIEVEMENTS],
+        ignore_conflicts=True)
+    if derived:
+        achievements.recompute_achievements(batch_size=batch_size)
+        leaderboards.rebuild(batch_size=batch_size)
+        trending.update_scores(batch_size=batch_size)
+        recommendations.build(batch_size=batch_size)
+
+    return {
+        'users': user_ids,
+        'models': model_ids,
+        'offers': offer_ids,
+        'counts': {
+            'users': len(user_ids), 'bottles': len(user_ids) * bottles_per_user, 'models': len(model_ids),
+            'files': files, 'likes': likes, 'comments': comments, 'offers': len(offer_ids),
+            'transactions': transaction_count,
+        },
+    }
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from . import ledger
 from .models import (
     CustomUser, Bottle, Model3D, ModelLike, ModelFavorite,
     ModelFile, Comment, ModelImage, CoinOffer, CoinTransaction,
@@ -85,9 +86,9 @@ class PublicUserSerializer(serializers.ModelSerializer):
 
     def get_models(self, obj):
         """Busca e serializa apenas os modelos visíveis publicamente do utilizador."""
-        visible_models = Model3D.objects.filter(
-            user=obj, is_visible=True).order_by('-date')
         request = self.context.get('request')
+        visible_models = Model3D.objects.for_catalog(request.user if request else None).filter(
+            user=obj, is_visible=True).order_by('-date')
         return Model3DSerializer(visible_models, many=True, context={'request': request}).data
 
 
@@ -105,7 +106,8 @@ class BottleSerializer(serializers.ModelSerializer):
 class ModelImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ModelImage
-        fields = ['id', 'image', 'model3d']
+        fields = ['id', 'image', 'thumbnail', 'model3d']
+        read_only_fields = ['thumbnail']
 
 
 class ModelFileSerializer(serializers.ModelSerializer):
@@ -129,15 +131,32 @@ class Model3DSerializer(serializers.ModelSerializer):
         model = Model3D
         fields = [
             'id', 'name', 'description', 'user', 'date', 'likes',
-            'downloads', 'images', 'files', 'is_liked', 'is_saved',
-            'price', 'is_free', 'is_visible'
+            'downloads', 'comments_count', 'images', 'files', 'is_liked', 'is_saved',
+            'price', 'is_free', 'is_visible', 'review_state'
         ]
+        # A visibilidade e a revisão só mudam por moderation.apply (curadores); os contadores só
+        # por UPDATEs com F() nas views.
+        read_only_fields = ['likes', 'downloads', 'comments_count', 'is_visible', 'review_state',
+                            'reviewed_at', 'reviewed_by']
+
+    def update(self, instance, validated_data):
+        """
+        Grava apenas os campos editados. Um save() completo repunha as colunas derivadas
+        (contadores, 'trending_score', moderação, 'bundle') com os valores lidos no início do pedido.
+        """
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
+        return instance
 
     def get_is_liked(self, obj):
         """Verifica se o utilizador logado curtiu este modelo."""
         request = self.context.get("request")
         if not request or not request.user.is_authenticated:
             return False
+        if hasattr(obj, 'liked'):  # Anotado por Model3D.objects.for_catalog().
+            return obj.liked
         return ModelLike.objects.filter(user=request.user, model=obj).exists()
 
     def get_is_saved(self, obj):
@@ -145,16 +164,18 @@ class Model3DSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         if not request or not request.user.is_authenticated:
             return False
+        if hasattr(obj, 'saved'):  # Anotado por Model3D.objects.for_catalog().
+            return obj.saved
         return ModelFavorite.objects.filter(user=request.user, model=obj).exists()
 
 
 class CommentSerializer(serializers.ModelSerializer):
-    """Serializa os comentários de um modelo, exibindo o nome do autor."""
-    user = serializers.StringRelatedField()
+    """Serializa os comentários de um modelo, com os dados essenciais do autor."""
+    user = UserSimpleSerializer(read_only=True)
 
     class Meta:
         model = Comment
-        fields = ["id", "user", "text", "image", "date"]
+        fields = ["id", "model", "user", "text", "date"]
 
 
 # --- Serializers do Marketplace ---
@@ -223,7 +244,10 @@ class CoinTransactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CoinTransaction
-        fields = '__all__'
+        fields = [
+            'id', 'sender', 'receiver', 'offer', 'coin_type', 'amount',
+            'transaction_type', 'price_paid', 'transaction_date', 'notes'
+        ]
 
 
 class ExchangeRequestSerializer(serializers.ModelSerializer):
@@ -266,16 +290,18 @@ class ExchangeRequestSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(
                     "Saldo insuficiente para fazer a oferta.")
 
-            requester_for_update.recycling_coins -= offer_recycling
-            requester_for_update.reputation_coins -= offer_reputation
-            requester_for_update.save()
-
             exchange_request = ExchangeRequest.objects.create(
                 requester=requester_for_update,
                 receiver=receiver,
                 status='pending',
                 **validated_data
             )
+            ledger.post(
+                'exchange_created',
+                ledger.transfer('recycling', offer_recycling, requester_for_update, ledger.ESCROW)
+                + ledger.transfer('reputation', offer_reputation, requester_for_update, ledger.ESCROW),
+                reference=f'exchange:{exchange_request.pk}',
+            )
         return exchange_request
 
 
@@ -1,53 +1,41 @@
 # api/services.py
 
-from datetime import datetime
 from django.db.models import Sum, Max
-from .models import Bottle, RecyclingHistory, Achievement, UserAchievement, Model3D
+from .models import Bottle, RecyclingHistory, Achievement, UserAchievement, Model3D, CustomUser
+from . import leaderboards, ledger, leveling, streaks
 
+# Moedas de reputação atribuídas por cada conquista desbloqueada.
+ACHIEVEMENT_REWARD = 10
 
-def _calculate_consecutive_months(user):
-    """
-    Calcula a maior sequência de meses consecutivos em que um utilizador reciclou.
-    Função auxiliar para o sistema de conquistas.
-    """
-    # Usa .distinct() para garantir que não há meses duplicados na contagem
-    histories = RecyclingHistory.objects.filter(user=user).values_list(
-        'month', flat=True).order_by('month').distinct()
-    if not histories:
-        return 0
-
-    # Converte as strings "AAAA-MM" para objetos de data para uma comparação fiável
-    months_dates = sorted([datetime.strptime(m, "%Y-%m") for m in histories])
-    if not months_dates:
-        return 0
-
-    max_streak = 1
-    current_streak = 1
-    for i in range(1, len(months_dates)):
-        prev_month = months_dates[i-1]
-        current_month = months_dates[i]
-
-        # Verifica se os meses são consecutivos, considerando a viragem do ano
-        if (current_month.year - prev_month.year) * 12 + (current_month.month - prev_month.month) == 1:
-            current_streak += 1
-        else:
-            current_streak = 1  # Reseta a contagem se houver uma falha na sequência
 
-        max_streak = max(max_streak, current_streak)
+def lock_users(*user_ids):
+    """
+    Bloqueia as linhas dos utilizadores indicados (SELECT ... FOR UPDATE) e devolve-as
+    num dicionário indexado pelo id.
 
-    return max_streak
+    Os bloqueios são sempre adquiridos por ordem crescente de id, para que dois fluxos
+    que envolvem os mesmos utilizadores nunca fiquem à espera um do outro. Os fluxos do
+    marketplace bloqueiam primeiro a oferta/solicitação e só depois os utilizadores.
+    Deve ser chamada dentro de um bloco transaction.atomic().
+    """
+    ids = sorted(set(user_ids))
+    users = CustomUser.objects.select_for_update().filter(pk__in=ids).order_by('pk')
+    return {user.pk: user for user in users}
 
 
-def add_experience(user, xp_amount):
+def add_experience(user, xp_amount, save=True):
     """
     Adiciona uma quantidade específica de experiência a um utilizador e trata os level-ups.
 
     Esta função centraliza a lógica de ganho de XP para que possa ser
     reutilizada em diferentes partes da aplicação (reciclagem, upload de modelos, etc.).
+    O nível é derivado da experiência total pela curva de api.leveling, sem percorrer
+    os níveis um a um.
 
     Args:
         user: A instância do objeto de utilizador.
         xp_amount: A quantidade de experiência a ser adicionada.
+        save: Se False, só altera a instância; o chamador fica responsável por guardá-la.
 
     Returns:
         bool: True se o utilizador subiu de nível, False caso contrário.
@@ -55,29 +43,21 @@ def add_experience(user, xp_amount):
     if not isinstance(xp_amount, int) or xp_amount <= 0:
         return False
 
-    user.experience += xp_amount
-    leveled_up = False
-
-    # A regra de negócio para o próximo nível (pode ser ajustada).
-    # Ex: Nível 1 precisa de 100 XP, Nível 2 de 200 XP, etc.
-    experience_needed = user.level * 100
-
-    while user.experience >= experience_needed:
-        user.experience -= experience_needed
-        user.level += 1
-        leveled_up = True
-        # Atualiza a experiência necessária para o novo nível.
-        experience_needed = user.level * 100
+    previous_level = user.level
+    user.total_experience += xp_amount
+    user.level, user.experience = leveling.level_for(user.total_experience)
 
-    user.save(update_fields=['experience', 'level'])
+    if save:
+        user.save(update_fields=['total_experience', 'experience', 'level'])
+    leaderboards.record(user, 'experience', xp_amount)
 
-    return leveled_up
+    return user.level > previous_level
 
 
 def update_user_achievements(user):
     """
-    Verifica todas as conquistas e desbloqueia as que forem necessárias,
-    usando uma abordagem "data-driven" baseada nos critérios do modelo Achievement.
+    Atualiza o progresso do utilizador em todas as conquistas e desbloqueia as que forem
+    necessárias, usando uma abordagem "data-driven" baseada nos critérios do modelo Achievement.
     """
     newly_unlocked = []
 
@@ -86,34 +66,31 @@ def update_user_achievements(user):
         'BOTTLES_TOTAL': Bottle.objects.filter(user=user).aggregate(total=Sum('quantity'))['total'] or 0,
         'USER_LEVEL': user.level,
         'MONTHLY_BOTTLES': RecyclingHistory.objects.filter(user=user).aggregate(max_quantity=Max('quantity'))['max_quantity'] or 0,
-        'CONSECUTIVE_MONTHS': _calculate_consecutive_months(user),
+        'CONSECUTIVE_MONTHS': streaks.user_streaks(user)['longest'],
         'MODELS_UPLOADED': Model3D.objects.filter(user=user).count(),
     }
 
-    # 2. Pega todas as conquistas que o utilizador AINDA NÃO DESBLOQUEOU
-    achievements_to_check = Achievement.objects.exclude(
-        userachievement__user=user,
-        userachievement__unlocked_at__isnull=False
+    # 2. Guarda o progresso em todas as conquistas numa única escrita (insere ou atualiza)
+    achievements = list(Achievement.objects.all())
+    UserAchievement.objects.bulk_create(
+        [UserAchievement(user=user, achievement=achievement,
+                         progress=user_stats.get(achievement.criteria_type, 0))
+         for achievement in achievements],
+        update_conflicts=True, unique_fields=['user', 'achievement'], update_fields=['progress'],
     )
 
-    for achievement in achievements_to_check:
-        # Pega a estatística relevante do utilizador com base no tipo de critério da conquista
-        current_progress = user_stats.get(achievement.criteria_type, 0)
-
-        # Compara o progresso atual com a meta (valor) da conquista
-        if current_progress >= achievement.criteria_value:
-            user_achievement, created = UserAchievement.objects.get_or_create(
-                user=user,
-                achievement=achievement
-            )
-
-            # Desbloqueia a conquista e aplica a recompensa se for a primeira vez
-            if user_achievement.unlock():
-                user.reputation_coins += 10
-                newly_unlocked.append(achievement)
-
-    # Se alguma conquista foi desbloqueada, a recompensa em moedas precisa de ser guardada
-    if newly_unlocked:
-        user.save(update_fields=['reputation_coins'])
+    # 3. Desbloqueia as conquistas cuja meta foi alcançada e que ainda não estavam desbloqueadas
+    reached = [achievement.pk for achievement in achievements
+               if user_stats.get(achievement.criteria_type, 0) >= achievement.criteria_value]
+    to_unlock = UserAchievement.objects.filter(
+        user=user, achievement_id__in=reached, unlocked_at__isnull=True
+    ).select_related('achievement')
+
+    for user_achievement in to_unlock:
+        # Desbloqueia a conquista e aplica a recompensa se for a primeira vez
+        if user_achievement.unlock():
+            ledger.post('achievement', ledger.transfer('reputation', ACHIEVEMENT_REWARD, ledger.MINT, user),
+                        reference=f'achievement:{user_achievement.achievement_id}')
+            newly_unlocked.append(user_achievement.achievement)
 
     return newly_unlocked
@@ -0,0 +1,81 @@
+# api/streaks.py
+
+"""
+Sequências de meses consecutivos de reciclagem.
+
+Os meses são tratados como índices inteiros (ano * 12 + mês - 1), calculados na própria consulta
+a partir da coluna de data, pelo que Dezembro de um ano e Janeiro do seguinte são consecutivos
+sem qualquer caso especial. As sequências de muitos utilizadores são calculadas de uma vez com
+NumPy: as quebras (mudança de utilizador ou salto de mês) dividem os dados em corridas, e a
+maior corrida e a última de cada utilizador dão a sequência mais longa e a atual.
+"""
+
+import numpy as np
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .models import RecyclingHistory
+
+
+def month_index(value):
+    """Converte uma data no índice inteiro do mês."""
+    return value.year * 12 + value.month - 1
+
+
+def _month_indexes(queryset):
+    """Devolve (user_id, índice do mês) das linhas de histórico, calculados na própria consulta."""
+    return queryset.order_by('user_id', 'month').values_list(
+        'user_id', ExtractYear('month') * 12 + ExtractMonth('month') - 1)
+
+
+def batch_streaks(owners, months, today=None):
+    """
+    Calcula as sequências de vários utilizadores.
+
+    Args:
+        owners: Vetor de ids de utilizador, ordenado.
+        months: Vetor de índices de mês, ordenado dentro de cada utilizador (repetidos são ignorados).
+        today: Data de referência para a sequência atual (por omissão, hoje).
+
+    Returns:
+        tuple: (utilizadores distintos, sequência mais longa, sequência atual). A sequência atual
+        só conta se a última corrida terminar no mês de referência ou no anterior, já que o
+        mês corrente ainda não acabou.
+    """
+    owners = np.asarray(owners, dtype=np.int64)
+    months = np.asarray(months, dtype=np.int64)
+    if not len(owners):
+        return owners, owners, owners
+    keep = np.r_[True, (owners[1:] != owners[:-1]) | (months[1:] != months[:-1])]
+    owners, months = owners[keep], months[keep]
+
+    breaks = np.r_[True, (owners[1:] != owners[:-1]) | (months[1:] != months[:-1] + 1)]
+    run_starts = np.flatnonzero(breaks)
+    run_lengths = np.diff(np.r_[run_starts, len(months)])
+    run_ends = months[np.r_[run_starts[1:], len(months)] - 1]
+    run_owners = owners[run_starts]
+
+    user_starts = np.flatnonzero(np.r_[True, run_owners[1:] != run_owners[:-1]])
+    user_last_run = np.r_[user_starts[1:], len(run_owners)] - 1
+    longest = np.maximum.reduceat(run_lengths, user_starts)
+
+    current_month = month_index(today or timezone.localdate())
+    alive = run_ends[user_last_run] >= current_month - 1
+    current = np.where(alive, run_lengths[user_last_run], 0)
+    return run_owners[user_starts], longest, current
+
+
+def all_streaks(today=None):
+    """Devolve {user_id: (mais longa, atual)} para todos os utilizadores com histórico."""
+    rows = np.array(_month_indexes(RecyclingHistory.objects.all()), dtype=np.int64).reshape(-1, 2)
+    users, longest, current = batch_streaks(rows[:, 0], rows[:, 1], today)
+    return dict(zip(users.tolist(), zip(longest.tolist(), current.tolist())))
+
+
+def user_streaks(user, today=None):
+    """Devolve {'longest', 'current'} para um utilizador."""
+    rows = np.array(_month_indexes(RecyclingHistory.objects.filter(user=user)), dtype=np.int64).reshape(-1, 2)
+    _, longest, current = batch_streaks(rows[:, 0], rows[:, 1], today)
+    if not len(longest):
+        return {'longest': 0, 'current': 0}
+    return {'longest': int(longest[0]), 'current': int(current[0])}
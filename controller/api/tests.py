@@ -1,3 +1,1145 @@
-from django.test import TestCase
+import random
+import tempfile
+import threading
+from unittest import mock
+from datetime import date, timedelta
+from pathlib import Path
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.admin import site
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Sum
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import (
+    achievements, benchmark, catalog_cache, events, expiry, index_audit, instrumentation, leaderboards, ledger,
+    jobs, leveling, moderation, recommendations, seeding, streaks, trending, uploads,
+)
+from .models import (
+    Achievement, Bottle, CoinOffer, CoinTransaction, Comment, ExchangeRequest, GamificationEvent, Job,
+    LeaderboardEntry, LedgerEntry, LedgerJournal, Model3D, ModelDownload, ModelFavorite, ModelImage, ModelLike,
+    ModelSimilarity, RecyclingHistory, UserAchievement,
+)
+from .services import add_experience
+from .views import Model3DViewSet
+from controller import database
+
+User = get_user_model()
+
+
+class CoinOfferConcurrencyTests(TransactionTestCase):
+    """Compras e cancelamentos simultâneos não podem criar nem destruir moedas."""
+
+    SELLERS = 3
+    BUYERS = 4
+    OFFERS_PER_SELLER = 8
+    OFFER_AMOUNT = 10
+
+    def setUp(self):
+        self.sellers = [User.objects.create(username=f'seller{i}', email=f'seller{i}@reciclo.test')
+                        for i in range(self.SELLERS)]
+        self.buyers = [User.objects.create(username=f'buyer{i}', email=f'buyer{i}@reciclo.test',
+                                           reputation_coins=60)
+                       for i in range(self.BUYERS)]
+        # As moedas das ofertas já saíram do saldo dos vendedores (reserva).
+        self.offers = [
+            CoinOffer.objects.create(seller=seller, coin_type='recycling', amount=self.OFFER_AMOUNT,
+                                     price_per_coin=1.0, offer_type='sale')
+            for seller in self.sellers for _ in range(self.OFFERS_PER_SELLER)
+        ]
+
+    def _totals(self):
+        users = User.objects.aggregate(recycling=Sum('recycling_coins'), reputation=Sum('reputation_coins'))
+        escrow = CoinOffer.objects.filter(status='active').aggregate(total=Sum('amount'))['total'] or 0
+        return users['recycling'] + escrow, users['reputation']
+
+    def _run(self, user, action, offer_ids, errors):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        try:
+            for offer_id in offer_ids:
+                response = client.post(f'/api/coin-offers/{offer_id}/{action}/')
+                if response.status_code not in (200, 201, 400, 404):
+                    errors.append((action, offer_id, response.status_code))
+        except Exception as exc:
+            errors.append((action, exc))
+        finally:
+            connection.close()
+
+    def test_concurrent_purchase_and_cancel_conserve_coins(self):
+        recycling_before, reputation_before = self._totals()
+        offer_ids = [offer.pk for offer in self.offers]
+        errors = []
+        threads = []
+        for buyer in self.buyers:
+            ids = offer_ids[:]
+            random.shuffle(ids)
+            threads.append(threading.Thread(target=self._run, args=(buyer, 'purchase', ids, errors)))
+        for seller in self.sellers:
+            ids = [offer.pk for offer in self.offers if offer.seller_id == seller.pk]
+            random.shuffle(ids)
+            threads.append(threading.Thread(target=self._run, args=(seller, 'cancel', ids, errors)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self._totals(), (recycling_before, reputation_before))
+        self.assertFalse(User.objects.filter(reputation_coins__lt=0).exists())
+        self.assertFalse(CoinOffer.objects.filter(status='active').exists())
+
+        # Cada oferta concluída gera exatamente uma transação, e nenhuma cancelada gera.
+        completed = set(CoinOffer.objects.filter(status='completed').values_list('pk', flat=True))
+        transactions = list(CoinTransaction.objects.values_list('offer_id', flat=True))
+        self.assertEqual(len(transactions), len(completed))
+        self.assertEqual(set(transactions), completed)
+        for buyer in self.buyers:
+            buyer.refresh_from_db()
+            bought = CoinTransaction.objects.filter(receiver=buyer).count()
+            self.assertEqual(buyer.recycling_coins, bought * self.OFFER_AMOUNT)
+
+
+class ExchangeRequestConcurrencyTests(TransactionTestCase):
+    """Respostas simultâneas à mesma solicitação só liquidam a troca uma vez."""
+
+    def test_concurrent_accepts_settle_once(self):
+        requester = User.objects.create(username='requester', email='requester@reciclo.test', reputation_coins=50)
+        receiver = User.objects.create(username='receiver', email='receiver@reciclo.test', recycling_coins=100)
+        client = APIClient()
+        client.force_authenticate(user=requester)
+        response = client.post('/api/exchange-requests/', {
+            'receiver_id': receiver.pk, 'offer_reputation_coins': 30, 'request_recycling_coins': 40})
+        self.assertEqual(response.status_code, 201)
+        exchange_id = response.data['id']
+
+        statuses = []
+
+        def accept():
+            receiver_client = APIClient()
+            receiver_client.force_authenticate(user=User.objects.get(pk=receiver.pk))
+            try:
+                statuses.append(receiver_client.post(f'/api/exchange-requests/{exchange_id}/respond/',
+                                                     {'accept': True}, format='json').status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=accept) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [200] + [404] * 5)
+        self.assertEqual(ExchangeRequest.objects.get(pk=exchange_id).status, 'accepted')
+        self.assertEqual(CoinTransaction.objects.filter(notes__contains=f'ID: {exchange_id}').count(), 2)
+        requester.refresh_from_db()
+        receiver.refresh_from_db()
+        self.assertEqual((requester.recycling_coins, requester.reputation_coins), (40, 20))
+        self.assertEqual((receiver.recycling_coins, receiver.reputation_coins), (60, 30))
+
+    def test_cancel_after_concurrent_accept_does_not_refund(self):
+        requester = User.objects.create(username='requester', email='requester@reciclo.test', reputation_coins=50)
+        receiver = User.objects.create(username='receiver', email='receiver@reciclo.test', recycling_coins=100)
+        client = APIClient()
+        client.force_authenticate(user=requester)
+        exchange_id = client.post('/api/exchange-requests/', {
+            'receiver_id': receiver.pk, 'offer_reputation_coins': 30, 'request_recycling_coins': 40}).data['id']
+        # O cancelamento leu a solicitação ainda pendente; a aceitação termina antes do UPDATE.
+        stale = ExchangeRequest.objects.get(pk=exchange_id)
+        receiver_client = APIClient()
+        receiver_client.force_authenticate(user=receiver)
+        self.assertEqual(receiver_client.post(f'/api/exchange-requests/{exchange_id}/respond/',
+                                              {'accept': True}, format='json').status_code, 200)
+
+        with mock.patch('api.views.get_object_or_404', return_value=stale):
+            response = client.post(f'/api/exchange-requests/{exchange_id}/cancel/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(ExchangeRequest.objects.get(pk=exchange_id).status, 'accepted')
+        requester.refresh_from_db()
+        self.assertEqual((requester.recycling_coins, requester.reputation_coins), (40, 20))
+        self.assertFalse(LedgerEntry.objects.filter(journal__reason='exchange_returned').exists())
+
+
+class LedgerTests(TestCase):
+    """Todas as alterações de saldo passam pelo livro-razão e batem certo com ele."""
+
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', email='alice@reciclo.test')
+        self.bob = User.objects.create(username='bob', email='bob@reciclo.test')
+        self.client_alice = APIClient()
+        self.client_alice.force_authenticate(user=self.alice)
+        self.client_bob = APIClient()
+        self.client_bob.force_authenticate(user=self.bob)
+
+    def _recycle(self, client, quantity):
+        response = client.post('/api/recycle/bottles/', {'quantity': quantity, 'volume': '500ml', 'type': 'PET'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_marketplace_flows_keep_ledger_consistent(self):
+        self._recycle(self.client_alice, 5)  # 100 de reciclagem, 50 de reputação
+        self._recycle(self.client_bob, 2)    # 40 de reciclagem, 20 de reputação
+
+        response = self.client_alice.post('/api/coin-offers/', {
+            'amount': 30, 'coin_type': 'recycling', 'price_per_coin': 0.5, 'offer_type': 'sale'})
+        self.assertEqual(response.status_code, 201)
+        offer_id = response.data['id']
+        self.assertEqual(ledger.check_invariants(full=True), {})
+
+        response = self.client_bob.post(f'/api/coin-offers/{offer_id}/purchase/')
+        self.assertEqual(response.status_code, 201)
+        response = self.client_bob.post('/api/exchange-requests/', {
+            'receiver_id': self.alice.pk, 'offer_reputation_coins': 5, 'request_recycling_coins': 10})
+        self.assertEqual(response.status_code, 201)
+        response = self.client_alice.post(f'/api/exchange-requests/{response.data["id"]}/respond/',
+                                          {'accept': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.alice.recycling_coins, self.alice.reputation_coins), (60, 70))
+        self.assertEqual((self.bob.recycling_coins, self.bob.reputation_coins), (80, 0))
+        self.assertEqual(ledger.check_invariants(full=True), {})
+
+        # Uma alteração feita por fora do livro-razão é detetada.
+        User.objects.filter(pk=self.bob.pk).update(recycling_coins=1000)
+        self.assertIn('balance_mismatches', ledger.check_invariants())
+
+    def test_deleting_user_closes_account(self):
+        self._recycle(self.client_alice, 5)
+        self._recycle(self.client_bob, 2)
+        self.assertEqual(self.client_alice.post('/api/coin-offers/', {
+            'amount': 30, 'coin_type': 'recycling', 'price_per_coin': 0.5, 'offer_type': 'sale'}).status_code, 201)
+        self.assertEqual(self.client_bob.post('/api/exchange-requests/', {
+            'receiver_id': self.alice.pk, 'offer_reputation_coins': 5, 'request_recycling_coins': 10}).status_code, 201)
+
+        admin = User.objects.create_superuser(username='admin', email='admin@reciclo.test', password='x')
+        self.client.force_login(admin)
+        response = self.client.post(f'/admin/api/customuser/{self.alice.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(User.objects.filter(pk=self.alice.pk).exists())
+
+        entries = LedgerEntry.objects.filter(former_user_id=self.alice.pk)
+        self.assertTrue(entries.exists())
+        self.assertEqual(set(entries.values_list('user', 'former_username')), {(None, 'alice')})
+        self.assertEqual(entries.aggregate(total=Sum('amount'))['total'], 0)
+        self.bob.refresh_from_db()
+        self.assertEqual((self.bob.recycling_coins, self.bob.reputation_coins), (40, 20))
+        self.assertEqual(ledger.check_invariants(full=True), {})
+
+    def test_failed_credit_does_not_record_the_bottle(self):
+        with mock.patch.object(ledger, 'post', side_effect=RuntimeError('falha')):
+            with self.assertRaises(RuntimeError):
+                self.client_alice.post('/api/recycle/bottles/', {'quantity': 1, 'volume': '500ml', 'type': 'PET'})
+        self.assertFalse(Bottle.objects.exists())
+        self.assertFalse(GamificationEvent.objects.exists())
+
+    def test_admin_edit_posts_only_the_difference(self):
+        self._recycle(self.client_alice, 1)  # 20 de reciclagem, 10 de reputação
+        admin_user = User.objects.create_superuser(username='admin', email='admin@reciclo.test', password='x')
+        request = RequestFactory().post('/')
+        request.user = admin_user
+        user_admin = site._registry[User]
+
+        # O formulário mostrou 20 moedas; entretanto a Alice recebeu mais 5.
+        form = SimpleNamespace(initial={'recycling_coins': 20, 'reputation_coins': 10},
+                               changed_data=['first_name', 'recycling_coins'])
+        stale = User.objects.get(pk=self.alice.pk)
+        ledger.post('recycle', ledger.transfer('recycling', 5, ledger.MINT, self.alice))
+        stale.first_name, stale.recycling_coins = 'Alice', 50
+        user_admin.save_model(request, stale, form, change=True)
+
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.first_name, self.alice.recycling_coins, self.alice.reputation_coins),
+                         ('Alice', 55, 10))
+        self.assertEqual(ledger.check_invariants(full=True), {})
+
+    def test_large_journal_with_distinct_debits(self):
+        users = User.objects.bulk_create(
+            [User(username=f'user{i}', email=f'user{i}@reciclo.test') for i in range(1200)])
+        ledger.post('adjustment', [posting for i, user in enumerate(users)
+                                   for posting in ledger.transfer('recycling', 10 + i, ledger.ADJUSTMENT, user)])
+        ledger.post('adjustment', [posting for i, user in enumerate(users)
+                                   for posting in ledger.transfer('recycling', 5 + i, user, ledger.BURN)])
+        self.assertEqual(User.objects.filter(username__startswith='user', recycling_coins=5).count(), 1200)
+
+        # Um único débito sem saldo, no último bloco, reverte o lançamento inteiro.
+        postings = [posting for i, user in enumerate(users[:-1])
+                    for posting in ledger.transfer('recycling', 1 + i, ledger.ADJUSTMENT, user)]
+        postings += ledger.transfer('recycling', 6, users[-1], ledger.ADJUSTMENT)
+        with self.assertRaises(ledger.InsufficientBalance):
+            ledger.post('adjustment', postings)
+        self.assertEqual(User.objects.filter(username__startswith='user', recycling_coins=5).count(), 1200)
+        self.assertEqual(ledger.check_invariants(full=True), {})
+
+    def test_balance_at_uses_snapshot_plus_delta(self):
+        self._recycle(self.client_alice, 1)
+        before_snapshot = timezone.now()
+        watermark, created = ledger.snapshot_balances(settle_seconds=0)
+        self.assertEqual((watermark, created), (LedgerEntry.objects.latest('id').pk, 1))
+
+        self._recycle(self.client_alice, 2)
+        self.assertEqual(ledger.balance_at(self.alice, before_snapshot), {'recycling': 20, 'reputation': 10})
+        self.assertEqual(ledger.balance_at(self.alice, timezone.now()), {'recycling': 60, 'reputation': 30})
+        self.assertEqual(ledger.check_invariants(), {})
+
+
+class TransactionHistoryTests(TestCase):
+    """O histórico lê o índice por utilizador, com cursor e filtros."""
+
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', email='alice@reciclo.test')
+        self.bob = User.objects.create(username='bob', email='bob@reciclo.test')
+        self.carol = User.objects.create(username='carol', email='carol@reciclo.test')
+        CoinTransaction.objects.create(sender=self.bob, receiver=self.alice, coin_type='recycling',
+                                       amount=5, transaction_type='gift')
+        CoinTransaction.objects.bulk_create([
+            CoinTransaction(sender=self.alice, receiver=self.bob, coin_type='reputation',
+                            amount=amount, transaction_type='purchase')
+            for amount in range(1, 6)
+        ] + [CoinTransaction(sender=self.bob, receiver=self.carol, coin_type='recycling',
+                             amount=1, transaction_type='gift')])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+    def test_pages_through_sent_and_received(self):
+        seen = []
+        url = '/api/transactions/?page_size=4'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_filters_by_coin_type_and_date(self):
+        response = self.client.get('/api/transactions/?coin_type=recycling')
+        self.assertEqual([row['amount'] for row in response.data['results']], [5])
+        self.assertEqual(response.data['results'][0]['sender']['username'], 'bob')
+
+        today = timezone.localdate().isoformat()
+        response = self.client.get(f'/api/transactions/?date_from={today}&date_to={today}')
+        self.assertEqual(len(response.data['results']), 6)
+        response = self.client.get('/api/transactions/?date_to=2000-01-01')
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get('/api/transactions/?date_from=ontem')
+        self.assertEqual(response.status_code, 400)
+
+
+class ExpiryTests(TestCase):
+    """O varrimento expira apenas o que passou do prazo e devolve a reserva."""
+
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', email='alice@reciclo.test')
+        self.bob = User.objects.create(username='bob', email='bob@reciclo.test')
+        ledger.post('adjustment', ledger.transfer('recycling', 100, ledger.ADJUSTMENT, self.alice)
+                    + ledger.transfer('reputation', 100, ledger.ADJUSTMENT, self.alice))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+    def _age(self, model, pk, days):
+        model.objects.filter(pk=pk).update(created_at=timezone.now() - timedelta(days=days))
+
+    def test_expires_stale_offers_and_requests_in_batches(self):
+        offer_ids = []
+        for amount in (10, 20, 30):
+            response = self.client.post('/api/coin-offers/', {
+                'amount': amount, 'coin_type': 'recycling', 'price_per_coin': 1, 'offer_type': 'sale'})
+            offer_ids.append(response.data['id'])
+        response = self.client.post('/api/exchange-requests/', {
+            'receiver_id': self.bob.pk, 'offer_reputation_coins': 15, 'request_recycling_coins': 5})
+        exchange_id = response.data['id']
+        for pk in offer_ids[:2]:
+            self._age(CoinOffer, pk, 31)
+        self._age(ExchangeRequest, exchange_id, 8)
+
+        self.assertEqual(expiry.expire_offers(batch_size=1), 2)
+        self.assertEqual(expiry.expire_exchange_requests(), 1)
+        self.assertEqual(expiry.expire_offers(), 0)
+
+        statuses = dict(CoinOffer.objects.values_list('pk', 'status'))
+        self.assertEqual([statuses[pk] for pk in offer_ids], ['expired', 'expired', 'active'])
+        self.assertEqual(ExchangeRequest.objects.get(pk=exchange_id).status, 'expired')
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.recycling_coins, self.alice.reputation_coins), (70, 100))
+        self.assertEqual(CoinTransaction.objects.filter(transaction_type='refund', receiver=self.alice).count(), 3)
+        self.assertEqual(ledger.check_invariants(full=True), {})
+
+        # Uma oferta expirada já não pode ser comprada.
+        bob_client = APIClient()
+        bob_client.force_authenticate(user=self.bob)
+        self.assertEqual(bob_client.post(f'/api/coin-offers/{offer_ids[0]}/purchase/').status_code, 404)
+
+
+@override_settings(GAMIFICATION_EVENTS_EAGER=False)
+class LeaderboardTests(TestCase):
+    """Os quadros são atualizados a cada reciclagem e coincidem com uma reconstrução completa."""
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'user{i}', email=f'user{i}@reciclo.test') for i in range(3)]
+
+    def _recycle(self, user, quantity):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.post('/api/recycle/bottles/', {'quantity': quantity, 'volume': '500ml', 'type': 'Marca'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_incremental_boards_and_rank(self):
+        for user, quantity in zip(self.users, (3, 7, 3)):
+            self._recycle(user, quantity)
+        self._recycle(self.users[0], 1)
+        self.assertEqual(events.process_pending(), 4)
+
+        response = self.client.get('/api/leaderboards/bottles/', {'period': 'weekly', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['rank'], row['score']) for row in response.data['results']], [(1, 7), (2, 4)])
+        self.assertIsNone(response.data['me'])
+        self.assertEqual(leaderboards.rank_of(self.users[2], 'bottles', 'monthly'), {'rank': 3, 'score': 3})
+        self.assertEqual(self.client.get('/api/leaderboards/bottles/', {'period': 'daily'}).status_code, 400)
+
+        def snapshot():
+            return sorted(LeaderboardEntry.objects.values_list('metric', 'period', 'period_start', 'user_id', 'score'))
+
+        incremental = snapshot()
+        leaderboards.rebuild()
+        self.assertEqual(snapshot(), incremental)
+
+
+@override_settings(GAMIFICATION_EVENTS_EAGER=False)
+class GamificationEventTests(TestCase):
+    """A fila de eventos é idempotente e mantém a ordem dos eventos de cada utilizador."""
+
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', email='alice@reciclo.test')
+        self.bob = User.objects.create(username='bob', email='bob@reciclo.test')
+
+    def _emit(self, user, key, quantity=1):
+        events.emit(user, 'bottles_recycled', {'quantity': quantity, 'xp': 60}, key=key)
+
+    def test_duplicate_keys_are_ignored(self):
+        self._emit(self.alice, 'bottle:1')
+        self._emit(self.alice, 'bottle:1')
+        self.assertEqual(events.process_pending(), 1)
+        self.assertEqual(events.process_pending(), 0)
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.experience, 60)
+
+    def test_recycle_reports_queued_or_applied_result(self):
+        client = APIClient()
+        client.force_authenticate(user=self.alice)
+        payload = {'quantity': 10, 'volume': '500ml', 'type': 'PET'}
+        response = client.post('/api/recycle/bottles/', payload)
+        self.assertEqual((response.data['level'], response.data['queued']), (1, True))
+
+        with override_settings(GAMIFICATION_EVENTS_EAGER=True):
+            response = client.post('/api/recycle/bottles/', payload)
+        self.assertEqual((response.data['level'], response.data['leveled_up'], response.data['queued']),
+                         (3, True, False))
+        self.assertFalse(GamificationEvent.objects.filter(status='pending').exists())
+
+    def test_failure_blocks_later_events_of_the_same_user(self):
+        self._emit(self.alice, 'bottle:1')
+        self._emit(self.alice, 'bottle:2', quantity=2)
+        self._emit(self.bob, 'bottle:3')
+
+        original = events.HANDLERS['bottles_recycled']
+        calls = []
+
+        def flaky(event, user):
+            calls.append(event.idempotency_key)
+            if len(calls) == 1:
+                raise RuntimeError("falha temporária")
+            return original(event, user)
+
+        events.HANDLERS['bottles_recycled'] = flaky
+        try:
+            with self.assertLogs('api.events', level='ERROR'):
+                self.assertEqual(events.process_pending(), 1)
+            self.assertEqual(events.process_pending(worker=0, workers=2) + events.process_pending(worker=1, workers=2), 2)
+        finally:
+            events.HANDLERS['bottles_recycled'] = original
+
+        self.assertEqual(calls, ['bottle:1', 'bottle:3', 'bottle:1', 'bottle:2'])
+        self.assertEqual(set(GamificationEvent.objects.values_list('status', flat=True)), {'done'})
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.level, self.alice.experience), (2, 20))
+
+
+class LevelingTests(TestCase):
+    """A curva de níveis por tabela coincide com a regra antiga e pode ser alterada por configuração."""
+
+    @staticmethod
+    def _old_rule(total):
+        level, experience = 1, total
+        while experience >= level * 100:
+            experience -= level * 100
+            level += 1
+        return level, experience
+
+    def test_matches_previous_linear_rule(self):
+        for total in [0, 99, 100, 299, 300, 5049, 5050, 123456, 10 ** 7]:
+            self.assertEqual(leveling.level_for(total), self._old_rule(total))
+        self.assertEqual(leveling.threshold(3), 300)
+
+    def test_large_grant_and_recompute_with_new_curve(self):
+        user = User.objects.create(username='alice', email='alice@reciclo.test')
+        self.assertTrue(add_experience(user, 10 ** 6))
+        self.assertEqual((user.level, user.experience), self._old_rule(10 ** 6))
+
+        with override_settings(LEVELING={'BASE': 50, 'EXPONENT': 1.5}):
+            self.assertEqual(leveling.recompute_levels(User.objects.all()), 1)
+            user.refresh_from_db()
+            level, experience = user.level, user.experience
+            self.assertEqual(leveling.threshold(level) + experience, 10 ** 6)
+            self.assertLess(experience, leveling.experience_for_level(level))
+
+
+class AchievementRecomputeTests(TestCase):
+    """O recálculo em massa desbloqueia as conquistas já alcançadas, uma única vez."""
+
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', email='alice@reciclo.test')
+        self.bob = User.objects.create(username='bob', email='bob@reciclo.test')
+        Bottle.objects.create(user=self.alice, quantity=12, type='PET')
+        Bottle.objects.create(user=self.bob, quantity=3, type='PET')
+        for month, quantity in ((date(2023, 11, 1), 2), (date(2023, 12, 1), 9), (date(2024, 1, 1), 1),
+                                (date(2024, 3, 1), 1)):
+            RecyclingHistory.objects.create(user=self.alice, month=month, quantity=quantity)
+        RecyclingHistory.objects.create(user=self.bob, month=date(2024, 1, 1), quantity=3)
+        Model3D.objects.create(user=self.bob, name='Vaso', description='Vaso impresso')
+        for pk, criteria_type, value in (('bottles-10', 'BOTTLES_TOTAL', 10), ('streak-3', 'CONSECUTIVE_MONTHS', 3),
+                                         ('month-5', 'MONTHLY_BOTTLES', 5), ('first-model', 'MODELS_UPLOADED', 1)):
+            Achievement.objects.create(id=pk, title=pk, description=pk, criteria_type=criteria_type,
+                                       criteria_value=value)
+
+    def test_unlocks_every_qualifying_user_once(self):
+        # O Bob já tinha a conquista do modelo: não volta a ser recompensado.
+        UserAchievement.objects.create(user=self.bob, achievement_id='first-model', unlocked_at=timezone.now())
+
+        unlocked = achievements.recompute_achievements(batch_size=1)
+        self.assertEqual(unlocked, {'bottles-10': 1, 'streak-3': 1, 'month-5': 1, 'first-model': 0})
+        self.assertEqual(achievements.recompute_achievements(), dict.fromkeys(unlocked, 0))
+
+        self.assertEqual(set(UserAchievement.objects.filter(user=self.alice).values_list('achievement_id', flat=True)),
+                         {'bottles-10', 'streak-3', 'month-5'})
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.reputation_coins, 3 * 10)
+        self.assertEqual(ledger.check_invariants(full=True), {})
+
+    def test_concurrent_unlock_is_not_rewarded_twice(self):
+        real_now = timezone.now
+        raced = []
+
+        def unlock_first(*args):
+            # Um unlock() de outro pedido desbloqueia a conquista entre a leitura e o UPDATE do lote.
+            row = UserAchievement.objects.filter(user=self.alice, achievement_id='bottles-10').first()
+            if row and not raced:
+                raced.append(row.pk)
+                row.unlock()
+            return real_now()
+        with mock.patch('api.achievements.timezone.now', side_effect=unlock_first):
+            unlocked = achievements.recompute_achievements([Achievement.objects.get(pk='bottles-10')])
+        self.assertEqual(unlocked, {'bottles-10': 0})
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.reputation_coins, 0)
+
+
+class StreakTests(TestCase):
+    """Sequências de meses consecutivos, incluindo viragens de ano e meses em falta."""
+
+    def test_year_boundary_and_gaps(self):
+        owners = [1, 1, 1, 1, 1, 2, 2, 2, 3]
+        months = [(2022, 11), (2022, 12), (2023, 1), (2023, 3), (2023, 4), (2023, 12), (2023, 12), (2024, 1), (2020, 5)]
+        users, longest, current = streaks.batch_streaks(
+            owners, [streaks.month_index(date(year, month, 1)) for year, month in months], today=date(2024, 2, 10))
+        self.assertEqual(users.tolist(), [1, 2, 3])
+        self.assertEqual(longest.tolist(), [3, 2, 1])
+        # O utilizador 2 reciclou no mês anterior, pelo que a sequência ainda está viva.
+        self.assertEqual(current.tolist(), [0, 2, 0])
+
+    def test_user_streaks(self):
+        user = User.objects.create(username='alice', email='alice@reciclo.test')
+        self.assertEqual(streaks.user_streaks(user), {'longest': 0, 'current': 0})
+        for year, month in ((2023, 12), (2024, 1), (2024, 2), (2024, 6)):
+            RecyclingHistory.objects.create(user=user, month=date(year, month, 1), quantity=1)
+        self.assertEqual(streaks.user_streaks(user, today=date(2024, 6, 1)),
+                         {'longest': 3, 'current': 1})
+        self.assertEqual(streaks.all_streaks(today=date(2024, 8, 1)), {user.pk: (3, 0)})
+
+
+class AchievementProgressTests(TestCase):
+    """O dashboard mostra o progresso materializado de todos os tipos de critério."""
+
+    def test_dashboard_reads_progress_for_every_criteria_type(self):
+        user = User.objects.create(username='alice', email='alice@reciclo.test')
+        for pk, criteria_type, value in (('bottles', 'BOTTLES_TOTAL', 100), ('month', 'MONTHLY_BOTTLES', 50),
+                                         ('streak', 'CONSECUTIVE_MONTHS', 6), ('models', 'MODELS_UPLOADED', 1),
+                                         ('level', 'USER_LEVEL', 99)):
+            Achievement.objects.create(id=pk, title=pk, description=pk, criteria_type=criteria_type,
+                                       criteria_value=value)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        client.post('/api/recycle/bottles/', {'quantity': 4, 'volume': '500ml', 'type': 'PET'})
+        client.post('/api/recycle/bottles/', {'quantity': 3, 'volume': '500ml', 'type': 'PET'})
+        Model3D.objects.create(user=user, name='Vaso', description='Vaso impresso')
+        events.emit(user, 'model_uploaded', {'xp': 50}, key='model:test')
+        events.process_pending()
+
+        response = client.get('/api/user/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        progress = {item['id']: (item['progress']['current'], item['unlocked']) for item in response.data['achievements']}
+        self.assertEqual(progress, {'bottles': (7, False), 'month': (7, False), 'streak': (1, False),
+                                    'models': (1, True), 'level': (2, False)})
+
+
+@override_settings(API_INSTRUMENTATION=True, API_INSTRUMENTATION_DUMP=None)
+class InstrumentationTests(TestCase):
+    """Com a instrumentação ativa, cada endpoint acumula amostras visíveis só para administradores."""
+
+    def setUp(self):
+        instrumentation.reset()
+        self.admin = User.objects.create(username='admin', email='admin@reciclo.test', is_staff=True)
+        Model3D.objects.create(user=self.admin, name='Vaso', description='Vaso impresso')
+
+    def test_records_queries_and_serialization_per_action(self):
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        for _ in range(3):
+            self.assertEqual(client.get('/api/models3d/').status_code, 200)
+        client.get('/api/user/dashboard/')
+
+        endpoints = client.get('/api/instrumentation/').data['endpoints']
+        self.assertEqual(endpoints['Model3DViewSet.list']['count'], 3)
+        self.assertGreater(endpoints['Model3DViewSet.list']['queries']['p50'], 0)
+        self.assertGreater(endpoints['Model3DViewSet.list']['serialization_ms']['p99'], 0)
+        self.assertGreater(endpoints['UserDashboardView.get']['response_bytes']['p50'], 0)
+
+        other = APIClient()
+        other.force_authenticate(user=User.objects.create(username='bob', email='bob@reciclo.test'))
+        self.assertEqual(other.get('/api/instrumentation/').status_code, 403)
+
+
+class BenchmarkTests(TestCase):
+    """O benchmark corre todos os cenários sobre dados semeados sem erros e deteta regressões."""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        cache.clear()
+
+    def test_seeded_scenarios_and_baseline_comparison(self):
+        dataset = seeding.seed_dataset(users=10, bottles_per_user=3, models=8, offers=10, transactions=20)
+        self.assertEqual(ledger.check_invariants(full=True), {})
+
+        results = benchmark.run_benchmark(dataset, iterations=3, warmup=1)
+        self.assertEqual(set(results), set(benchmark.SCENARIOS))
+        for name, row in results.items():
+            self.assertEqual(row['requests'], 3, name)
+            self.assertEqual(row['errors'], 0, name)
+            # Depois do aquecimento, a lista anónima do catálogo vem da cache, sem consultas.
+            if name == 'catalog_list':
+                self.assertEqual(row['queries_max'], 0)
+            else:
+                self.assertGreater(row['queries_max'], 0, name)
+
+        slower = {name: {**row, 'p50_ms': row['p50_ms'] * 2 + 1} for name, row in results.items()}
+        self.assertEqual(benchmark.compare(results, {'results': results}), [])
+        regressions = benchmark.compare(slower, {'results': results})
+        self.assertEqual({item['metric'] for item in regressions}, {'p50_ms'})
+
+
+class SeedingTests(TestCase):
+    """O gerador de dados é determinístico e deixa os dados derivados coerentes."""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+
+    def test_deterministic_and_consistent(self):
+        def bottles(user_ids):
+            return list(Bottle.objects.filter(user_id__in=user_ids).order_by('user_id', 'id').values_list(
+                'quantity', 'type', 'volume'))
+
+        first = seeding.seed_dataset(users=5, bottles_per_user=20, models=6, offers=3, transactions=5,
+                                     seed=7, derived=False)
+        second = seeding.seed_dataset(users=5, bottles_per_user=20, models=6, offers=3, transactions=5,
+                                      seed=7, derived=False)
+        self.assertEqual(bottles(first['users']), bottles(second['users']))
+        self.assertEqual(User.objects.filter(username__startswith=seeding.USERNAME_PREFIX).count(), 10)
+
+        self.assertEqual(Bottle.objects.aggregate(total=Sum('quantity'))['total'],
+                         RecyclingHistory.objects.aggregate(total=Sum('quantity'))['total'])
+        oldest = Bottle.objects.order_by('date').first().date
+        self.assertLess(oldest, timezone.now() - timedelta(days=365))
+        self.assertEqual(Model3D.objects.aggregate(total=Sum('likes'))['total'], ModelLike.objects.count())
+        states = dict(Model3D.objects.values_list('review_state').annotate(total=Count('id')))
+        self.assertEqual(states, {'approved': 8, 'pending': 2, 'hidden': 2})
+        self.assertFalse(Model3D.objects.filter(review_state='hidden', is_visible=True).exists())
+        self.assertFalse(Model3D.objects.filter(review_state='approved', reviewed_at__isnull=True).exists())
+        self.assertEqual(LedgerJournal.objects.filter(reason='gift').count(), 2)
+        self.assertFalse(LedgerJournal.objects.filter(reason='offer_purchased').exists())
+        user = User.objects.get(pk=first['users'][0])
+        self.assertEqual(leveling.level_for(user.total_experience), (user.level, user.experience))
+        self.assertEqual(ledger.check_invariants(full=True), {})
+
+
+class DatabaseProfileTests(TestCase):
+    """Perfis de base de dados escolhidos pelo ambiente e endpoint de estado."""
+
+    def test_profiles_from_environment(self):
+        sqlite = database.from_environment(Path('/srv'), env={'RECICLO_SQLITE_BUSY_TIMEOUT': '5000'})
+        self.assertEqual(sqlite['OPTIONS']['timeout'], 5)
+        self.assertIn('PRAGMA journal_mode=WAL;', sqlite['OPTIONS']['init_command'])
+        self.assertIn('PRAGMA busy_timeout=5000;', sqlite['OPTIONS']['init_command'])
+
+        postgres = database.from_environment(Path('/srv'), env={
+            'RECICLO_DB_ENGINE': 'postgres', 'RECICLO_DB_HOST': 'db', 'RECICLO_DB_POOL_MAX': '20'})
+        self.assertEqual(postgres['HOST'], 'db')
+        self.assertEqual(postgres['CONN_MAX_AGE'], 0)
+        self.assertEqual(postgres['OPTIONS']['pool']['max_size'], 20)
+        with self.assertRaises(ValueError):
+            database.from_environment(Path('/srv'), env={'RECICLO_DB_ENGINE': 'mysql'})
+
+    def test_health_details_only_for_staff(self):
+        client = APIClient()
+        response = client.get('/api/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'ok')
+        self.assertNotIn('journal_mode', response.data['database'])
+
+        client.force_authenticate(user=User.objects.create(username='ops', email='ops@reciclo.test', is_staff=True))
+        details = client.get('/api/health/').data['database']
+        self.assertEqual(details['journal_mode'], 'wal')
+        self.assertEqual(details['busy_timeout'], 20000)
+        self.assertIn('wal_bytes', details)
+
+
+class DatabaseContentionTests(TransactionTestCase):
+    """Indicadores de contenção do SQLite no endpoint de estado (fora de uma transação)."""
+
+    def tearDown(self):
+        instrumentation.reset()
+
+    def test_health_reports_checkpoint_and_lock_errors(self):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create(username='ops', email='ops@reciclo.test', is_staff=True))
+        details = client.get('/api/health/').data['database']
+        self.assertEqual(set(details['wal_checkpoint']), {'busy', 'log', 'checkpointed'})
+        self.assertEqual(details['busy_timeout'], 20000)
+        self.assertIsNone(details['lock_errors'])
+
+        instrumentation.reset()
+        instrumentation.record_lock_error()
+        with override_settings(API_INSTRUMENTATION=True):
+            self.assertEqual(client.get('/api/health/').data['database']['lock_errors'], 1)
+
+
+class IndexAuditTests(TestCase):
+    """Os planos das consultas principais usam os índices compostos."""
+
+    def test_audit_flags_only_full_scans(self):
+        user = User.objects.create(username='ana', email='ana@reciclo.test')
+        Model3D.objects.create(user=user, name='Vaso', description='Vaso impresso')
+        results = {result['name']: result for result in index_audit.audit(user)}
+        self.assertEqual(set(results), set(index_audit.QUERIES))
+        self.assertEqual({name: result['full_scans'] for name, result in results.items() if result['full_scans']}, {})
+        self.assertEqual(results['catalog_authenticated']['sorts'], 0)
+        self.assertIn('model_date_idx', results['catalog_authenticated']['plan'])
+        self.assertIn('model_visible_date_idx', results['catalog_anonymous']['plan'])
+        self.assertIn('model_visible_trending_idx', results['catalog_trending']['plan'])
+
+        self.assertEqual(index_audit.analyse('2 0 0 SCAN api_bottle\n9 0 0 USE TEMP B-TREE FOR ORDER BY'),
+                         (['api_bottle'], 1))
+        self.assertEqual(index_audit.analyse('3 0 0 SCAN api_model3d USING INDEX model_visible_date_idx'), ([], 0))
+        self.assertEqual(index_audit.analyse('Seq Scan on api_comment  (cost=0.00..1.01 rows=1)'),
+                         (['api_comment'], 0))
+
+
+class CommentFeedTests(TestCase):
+    """Comentários por modelo, paginados por cursor, com a contagem desnormalizada."""
+
+    def setUp(self):
+        self.author = User.objects.create(username='ana', email='ana@reciclo.test')
+        self.model = Model3D.objects.create(user=self.author, name='Vaso', description='Vaso impresso')
+        self.other = Model3D.objects.create(user=self.author, name='Caixa', description='Caixa')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.author)
+
+    def test_scoped_feed_and_count(self):
+        for i in range(25):
+            self.assertEqual(self.client.post('/api/comments/', {'model': self.model.pk, 'text': f'c{i}'}).status_code, 201)
+        self.client.post('/api/comments/', {'model': self.other.pk, 'text': 'outro'})
+        self.model.refresh_from_db()
+        self.assertEqual(self.model.comments_count, 25)
+
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get('/api/comments/').status_code, 400)
+        with self.assertNumQueries(1):
+            first = anonymous.get('/api/comments/', {'model': self.model.pk}).data
+        self.assertEqual([c['text'] for c in first['results'][:2]], ['c24', 'c23'])
+        self.assertEqual(first['results'][0]['user']['username'], 'ana')
+        second = anonymous.get(first['next']).data
+        self.assertEqual(len(first['results']) + len(second['results']), 25)
+        self.assertIsNone(second['next'])
+
+        comment = Comment.objects.filter(model=self.model).first()
+        self.assertEqual(self.client.delete(f'/api/comments/{comment.pk}/').status_code, 204)
+        self.assertEqual(anonymous.get(f'/api/models3d/{self.model.pk}/').json()['comments_count'], 24)
+
+    def test_like_only_touches_the_counter(self):
+        stale = Model3D.objects.get(pk=self.model.pk)
+        Model3D.objects.filter(pk=self.model.pk).update(
+            comments_count=3, trending_score=9.5, is_visible=False, review_state='hidden')
+        with mock.patch('api.views.get_object_or_404', return_value=stale):
+            response = self.client.post(f'/api/models3d/{self.model.pk}/like/')
+            self.assertEqual(response.data['likes'], 1)
+            self.assertEqual(self.client.post(f'/api/models3d/{self.model.pk}/like/').data['likes'], 0)
+        self.model.refresh_from_db()
+        self.assertEqual((self.model.comments_count, self.model.trending_score, self.model.is_visible,
+                          self.model.review_state), (3, 9.5, False, 'hidden'))
+
+    def test_edit_keeps_derived_columns(self):
+        stale = Model3D.objects.get(pk=self.model.pk)
+        Model3D.objects.filter(pk=self.model.pk).update(comments_count=3, trending_score=9.5, likes=4)
+        with mock.patch.object(Model3DViewSet, 'get_object', return_value=stale):
+            response = self.client.patch(f'/api/models3d/{self.model.pk}/', {'name': 'Jarra', 'likes': 100},
+                                         format='json')
+        self.assertEqual(response.status_code, 200)
+        self.model.refresh_from_db()
+        self.assertEqual((self.model.name, self.model.comments_count, self.model.trending_score, self.model.likes),
+                         ('Jarra', 3, 9.5, 4))
+
+
+class CatalogCacheTests(TestCase):
+    """Cache das respostas anónimas do catálogo, invalidada por etiquetas de modelo."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='ana', email='ana@reciclo.test')
+        self.vase = Model3D.objects.create(user=self.author, name='Vaso', description='Vaso')
+        self.box = Model3D.objects.create(user=self.author, name='Caixa', description='Caixa')
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.author)
+
+    def test_hits_are_served_without_queries(self):
+        first = self.anonymous.get('/api/models3d/')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('public', first['Cache-Control'])
+        self.assertIn(catalog_cache.model_tag(self.vase.pk), first['Surrogate-Key'])
+        with self.assertNumQueries(0):
+            second = self.anonymous.get('/api/models3d/')
+        self.assertEqual(second.content, first.content)
+        with self.assertNumQueries(0):
+            revalidated = self.anonymous.get('/api/models3d/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_like_invalidates_only_affected_entries(self):
+        self.anonymous.get(f'/api/models3d/{self.vase.pk}/')
+        self.anonymous.get(f'/api/models3d/{self.box.pk}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/models3d/{self.vase.pk}/like/')
+        with self.assertNumQueries(0):
+            self.anonymous.get(f'/api/models3d/{self.box.pk}/')
+        self.assertEqual(self.anonymous.get(f'/api/models3d/{self.vase.pk}/').json()['likes'], 1)
+
+    def test_visibility_and_uploads_invalidate_lists(self):
+        self.assertEqual(len(self.anonymous.get('/api/models3d/').json()), 2)
+        curator = APIClient()
+        curator.force_authenticate(user=User.objects.create(username='cu', email='cu@reciclo.test', is_curator=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            curator.post(f'/api/models3d/{self.box.pk}/set_visibility/', {'is_visible': False}, format='json')
+        self.assertEqual(len(self.anonymous.get('/api/models3d/').json()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/models3d/', {'name': 'Copo', 'description': 'Copo', 'is_visible': True}, format='json')
+        self.assertEqual(len(self.anonymous.get('/api/models3d/').json()), 2)
+
+    def test_authenticated_requests_bypass_the_cache(self):
+        self.anonymous.get('/api/models3d/')
+        self.client.post(f'/api/models3d/{self.vase.pk}/like/')  # sem commit: a cache não é invalidada
+        liked = {m['id']: m['is_liked'] for m in self.client.get('/api/models3d/').data}
+        self.assertTrue(liked[self.vase.pk])
+
+
+class TrendingTests(TestCase):
+    """Pontuação de tendência com decaimento no tempo e a ordenação '?ordering=trending'."""
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'u{i}', email=f'u{i}@reciclo.test') for i in range(3)]
+        self.old, self.new, self.quiet = [
+            Model3D.objects.create(user=self.users[0], name=name, description=name)
+            for name in ('Antigo', 'Novo', 'Parado')]
+
+    def test_recent_activity_outranks_old_popularity(self):
+        now = timezone.now()
+        for user in self.users:
+            like = ModelLike.objects.create(user=user, model=self.old)
+            ModelLike.objects.filter(pk=like.pk).update(created_at=now - timedelta(days=6))
+        ModelLike.objects.create(user=self.users[0], model=self.new)
+        ModelDownload.objects.create(model=self.new)
+
+        scores = trending.compute_scores(now)
+        self.assertAlmostEqual(scores[self.old.pk], 3 * 3.0 * 2 ** -3, places=3)
+        self.assertAlmostEqual(scores[self.new.pk], 3.0 + 1.0, places=3)
+        self.assertNotIn(self.quiet.pk, scores)
+
+        self.assertEqual(trending.update_scores(now), 2)
+        self.assertEqual(trending.update_scores(now), 0)
+        client = APIClient()
+        client.force_authenticate(user=self.users[1])
+        ranking = [m['id'] for m in client.get('/api/models3d/', {'ordering': 'trending'}).data]
+        self.assertEqual(ranking[:2], [self.new.pk, self.old.pk])
+
+        # Fora da janela, a pontuação volta a zero.
+        self.assertEqual(trending.update_scores(now + timedelta(days=30)), 2)
+        self.assertFalse(Model3D.objects.filter(trending_score__gt=0).exists())
+
+
+class RecommendationTests(TestCase):
+    """Vizinhos por co-ocorrência de likes e favoritos e o feed 'models3d/recommended/'."""
+
+    def test_neighbours_are_cosine_top_k(self):
+        # Modelos 1 e 2 partilham dois utilizadores; o 3 partilha apenas um com o 1.
+        neighbours = recommendations.compute_neighbours([1, 1, 1, 2, 2, 3], [10, 11, 12, 10, 11, 12], k=1)
+        by_model = {model: (similar, round(score, 3)) for model, similar, score in neighbours}
+        self.assertEqual(by_model[1], (2, round(2 / (3 ** 0.5 * 2 ** 0.5), 3)))
+        self.assertEqual(by_model[3], (1, round(1 / 3 ** 0.5, 3)))
+        self.assertEqual(recommendations.compute_neighbours([], []), [])
+
+    def test_feed_merges_neighbours_of_liked_and_saved_models(self):
+        users = [User.objects.create(username=f'u{i}', email=f'u{i}@reciclo.test') for i in range(4)]
+        author = User.objects.create(username='autor', email='autor@reciclo.test')
+        vase, pot, box, lamp = [Model3D.objects.create(user=author, name=name, description=name)
+                                for name in ('Vaso', 'Floreira', 'Caixa', 'Candeeiro')]
+        for user in users[1:]:
+            ModelLike.objects.create(user=user, model=vase)
+            ModelLike.objects.create(user=user, model=pot)
+        ModelFavorite.objects.create(user=users[1], model=box)
+        ModelLike.objects.create(user=users[1], model=lamp)
+        ModelLike.objects.create(user=users[2], model=lamp)
+        self.assertEqual(recommendations.build(), ModelSimilarity.objects.count())
+
+        ModelLike.objects.create(user=users[0], model=vase)
+        ModelFavorite.objects.create(user=users[0], model=box)
+        client = APIClient()
+        client.force_authenticate(user=users[0])
+        # Sementes (2), vizinhos, modelos e o prefetch de imagens e ficheiros: nunca uma por modelo.
+        with self.assertNumQueries(6):
+            ids = [m.pk for m in recommendations.recommend(users[0])]
+        self.assertEqual(ids, [pot.pk, lamp.pk])
+        with self.assertNumQueries(6):
+            response = client.get('/api/models3d/recommended/')
+        self.assertEqual([m['id'] for m in response.data], [pot.pk, lamp.pk])
+        self.assertEqual(client.get('/api/models3d/recommended/', {'limit': 'x'}).status_code, 400)
+        self.assertEqual(APIClient().get('/api/models3d/recommended/').status_code, 401)
+
+
+class ModerationTests(TestCase):
+    """Fila de moderação dos curadores e aprovação/ocultação em lote com um único UPDATE."""
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create(username='ana', email='ana@reciclo.test')
+        self.models = [Model3D.objects.create(user=author, name=f'M{i}', description='d') for i in range(5)]
+        self.curator_user = User.objects.create(username='cu', email='cu@reciclo.test', is_curator=True)
+        self.curator = APIClient()
+        self.curator.force_authenticate(user=self.curator_user)
+
+    def test_queue_pages_pending_models_oldest_first(self):
+        Model3D.objects.filter(pk=self.models[0].pk).update(review_state='approved')
+        first = self.curator.get('/api/models3d/moderation/', {'page_size': 2}).data
+        self.assertEqual([m['id'] for m in first['results']], [m.pk for m in self.models[1:3]])
+        second = self.curator.get(first['next']).data
+        self.assertEqual([m['id'] for m in second['results']], [m.pk for m in self.models[3:]])
+        self.assertEqual(self.curator.get('/api/models3d/moderation/', {'state': 'x'}).status_code, 400)
+
+        author = APIClient()
+        author.force_authenticate(user=self.models[0].user)
+        self.assertEqual(author.get('/api/models3d/moderation/').status_code, 403)
+
+    def test_bulk_decision_is_one_update_and_invalidates_the_catalog(self):
+        anonymous = APIClient()
+        self.assertEqual(len(anonymous.get('/api/models3d/').json()), 5)
+        ids = [m.pk for m in self.models[:3]]
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(1):
+                updated = moderation.apply(ids, 'hide', self.curator_user)
+        self.assertEqual(updated, 3)
+        self.assertEqual(len(anonymous.get('/api/models3d/').json()), 2)
+
+        response = self.curator.post('/api/models3d/moderate/', {'ids': ids, 'decision': 'approve'}, format='json')
+        self.assertEqual(response.data, {'updated': 3})
+        self.assertEqual(Model3D.objects.filter(review_state='approved', is_visible=True).count(), 3)
+        self.assertEqual(self.curator.post('/api/models3d/moderate/', {'ids': 'x', 'decision': 'hide'},
+                                           format='json').status_code, 400)
+
+    def test_owner_cannot_change_visibility(self):
+        model = self.models[0]
+        moderation.apply([model.pk], 'hide', self.curator_user)
+        owner = APIClient()
+        owner.force_authenticate(user=model.user)
+        response = owner.patch(f'/api/models3d/{model.pk}/', {'is_visible': True, 'review_state': 'approved',
+                                                               'name': 'Novo'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        model.refresh_from_db()
+        self.assertEqual((model.name, model.is_visible, model.review_state), ('Novo', False, 'hidden'))
+
+
+class ModelUploadTests(TestCase):
+    """Upload de um modelo: ficheiros gravados em paralelo e linhas criadas numa só transação."""
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root.name))
+        self.user = User.objects.create(username='ana', email='ana@reciclo.test')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _post(self):
+        return self.client.post('/api/models3d/upload/', {
+            'name': 'Vaso', 'description': 'Vaso impresso',
+            'file': [SimpleUploadedFile(f'vaso_{part}.stl', seeding.STL_CONTENT) for part in range(3)],
+            'image': SimpleUploadedFile('vaso.png', seeding.PNG_CONTENT, content_type='image/png'),
+        }, format='multipart')
+
+    def _stored_files(self):
+        return sorted(path.name for path in Path(self.media_root.name).rglob('*') if path.is_file())
+
+    def test_upload_creates_model_files_and_images(self):
+        response = self._post()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(f['file_name'] for f in response.data['files']),
+                         ['vaso_0.stl', 'vaso_1.stl', 'vaso_2.stl'])
+        self.assertEqual(len(response.data['images']), 1)
+        self.assertEqual(self._stored_files(), ['vaso.png', 'vaso_0.stl', 'vaso_1.stl', 'vaso_2.stl'])
+
+    def test_upload_and_delete_update_models_uploaded_progress(self):
+        Achievement.objects.create(id='first-model', title='Primeiro', description='Primeiro modelo',
+                                   criteria_type='MODELS_UPLOADED', criteria_value=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._post()
+        self.assertEqual(response.status_code, 201)
+        events.process_pending()
+        progress = UserAchievement.objects.get(user=self.user, achievement_id='first-model')
+        self.assertEqual(progress.progress, 1)
+        self.assertIsNotNone(progress.unlocked_at)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.total_experience, 50)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f"/api/models3d/{response.data['id']}/").status_code, 204)
+        events.process_pending()
+        progress.refresh_from_db()
+        self.assertEqual(progress.progress, 0)
+
+    def test_failure_leaves_no_model_and_no_files(self):
+        with mock.patch.object(ModelImage.objects, 'bulk_create', side_effect=RuntimeError('falha')), \
+                self.assertLogs('api.views', level='ERROR') as logs:
+            response = self._post()
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("Erro ao guardar o upload do modelo 'Vaso': falha", logs.output[0])
+        self.assertFalse(Model3D.objects.exists())
+        self.assertEqual(self._stored_files(), [])
+
+        store = uploads._store
+
+        def flaky_store(field, upload):
+            if upload.name == 'vaso_1.stl':
+                raise OSError('disco cheio')
+            return store(field, upload)
+        with mock.patch.object(uploads, '_store', side_effect=flaky_store), \
+                self.assertLogs('api.views', level='ERROR') as logs:
+            self.assertEqual(self._post().status_code, 500)
+        self.assertIn('disco cheio', logs.output[0])
+        self.assertFalse(Model3D.objects.exists())
+        self.assertEqual(self._stored_files(), [])
+
+
+class JobTests(TestCase):
+    """Tarefas em segundo plano: execução, novas tentativas com backoff, deduplicação e ZIPs de download."""
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root.name))
+        self.user = User.objects.create(username='ana', email='ana@reciclo.test')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _upload(self):
+        response = self.client.post('/api/models3d/upload/', {
+            'name': 'Vaso', 'description': 'Vaso impresso', 'is_visible': True,
+            'file': [SimpleUploadedFile(f'vaso_{part}.stl', seeding.STL_CONTENT) for part in range(2)],
+            'image': SimpleUploadedFile('vaso.png', seeding.PNG_CONTENT, content_type='image/png'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return Model3D.objects.get(pk=response.data['id'])
+
+    def test_upload_enqueues_thumbnails_and_bundle(self):
+        model = self._upload()
+        self.assertEqual(sorted(Job.objects.values_list('kind', flat=True)), ['bundle_model', 'thumbnails'])
+        self.assertEqual(jobs.process_pending(), 2)
+        self.assertEqual(Job.objects.filter(status='done').count(), 2)
+        self.assertTrue(ModelImage.objects.get(model3d=model).thumbnail.name.endswith('.jpg'))
+
+        model.refresh_from_db()
+        self.assertTrue(model.bundle.name)
+        response = self.client.get(f'/api/models3d/{model.pk}/download/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), model.bundle.open('rb').read())
+
+    def test_active_key_is_not_duplicated(self):
+        model = self._upload()
+        key = f'bundle:{model.pk}'
+        existing = Job.objects.get(key=key)
+        self.assertEqual(jobs.enqueue('bundle_model', {'model': model.pk}, key=key), existing)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.create(kind='bundle_model', payload={'model': model.pk}, key=key)
+
+        # Um pedido feito enquanto a tarefa corre fá-la voltar à fila quando terminar.
+        original = jobs.HANDLERS['bundle_model']
+
+        def bundle_during_change(payload):
+            self.assertEqual(jobs.enqueue('bundle_model', payload, key=key), existing)
+            return original(payload)
+        with mock.patch.dict(jobs.HANDLERS, {'bundle_model': bundle_during_change}):
+            self.assertEqual(jobs.run(existing), 'done')
+        existing.refresh_from_db()
+        self.assertEqual((existing.status, existing.rerun), ('pending', False))
+        self.assertEqual(Job.objects.filter(key=key).count(), 1)
+        self.assertEqual(jobs.run(existing), 'done')
+        self.assertEqual(Job.objects.get(key=key).status, 'done')
+        self.assertNotEqual(jobs.enqueue('bundle_model', {'model': model.pk}, key=key), existing)
+
+    @override_settings(JOBS={**settings.JOBS, 'MAX_ATTEMPTS': 2})
+    def test_failing_job_is_retried_with_backoff_then_failed(self):
+        job = jobs.enqueue('delete_files', {})
+        self.assertEqual(jobs.run(job), 'retry')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(jobs.process_pending(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertEqual(jobs.process_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIn('names', job.last_error)
+
+    def test_stale_running_job_is_requeued(self):
+        job = jobs.enqueue('delete_files', {'names': []})
+        Job.objects.filter(pk=job.pk).update(status='running', locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.run(job), 'done')
+        self.assertEqual(jobs.run(job), 'skipped')
@@ -0,0 +1,82 @@
+# api/trending.py
+
+"""
+Pontuação de tendência dos modelos 3D (ordenação '?ordering=trending' do catálogo).
+
+Cada like, comentário e download conta com um peso (TRENDING['WEIGHTS']) que cai para metade a
+cada TRENDING['HALF_LIFE_HOURS']:
+
+    pontuação = Σ peso · 2 ^ (-(agora - data do evento) / meia-vida)
+
+Só contam os eventos dos últimos TRENDING['WINDOW_DAYS'] dias (os mais antigos já pesam quase
+nada). O comando 'update_trending' recalcula as pontuações periodicamente e grava apenas as que
+mudaram na coluna Model3D.trending_score. O catálogo lê o topo diretamente do índice
+(-trending_score, -id), sem ordenar a tabela.
+"""
+
+import datetime
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import catalog_cache
+from .models import Comment, Model3D, ModelDownload, ModelLike
+
+# Diferença abaixo da qual uma pontuação não é regravada.
+TOLERANCE = 1e-6
+
+
+def _events(since):
+    return (
+        ('like', ModelLike.objects.filter(created_at__gte=since).values_list('model_id', 'created_at')),
+        ('comment', Comment.objects.filter(date__gte=since).values_list('model_id', 'date')),
+        ('download', ModelDownload.objects.filter(created_at__gte=since).values_list('model_id', 'created_at')),
+    )
+
+
+def compute_scores(now=None):
+    """Devolve {model_id: pontuação} calculada a partir dos eventos da janela."""
+    now = now or timezone.now()
+    config = settings.TRENDING
+    half_life = config['HALF_LIFE_HOURS'] * 3600
+    since = now - datetime.timedelta(days=config['WINDOW_DAYS'])
+
+    model_ids, weights = [], []
+    for kind, rows in _events(since):
+        rows = list(rows)
+        if not rows:
+            continue
+        ages = np.fromiter(((now - when).total_seconds() for _, when in rows), dtype=float, count=len(rows))
+        model_ids.append(np.fromiter((pk for pk, _ in rows), dtype=np.int64, count=len(rows)))
+        weights.append(config['WEIGHTS'][kind] * np.exp2(-np.maximum(ages, 0) / half_life))
+    if not model_ids:
+        return {}
+
+    ids, inverse = np.unique(np.concatenate(model_ids), return_inverse=True)
+    totals = np.bincount(inverse, weights=np.concatenate(weights))
+    return dict(zip(ids.tolist(), totals.tolist()))
+
+
+def update_scores(now=None, batch_size=1000):
+    """
+    Recalcula as pontuações e grava as que mudaram (incluindo a volta a zero dos modelos sem
+    eventos recentes). Invalida as páginas do catálogo ordenadas por tendência.
+
+    Returns:
+        int: Número de modelos atualizados.
+    """
+    scores = compute_scores(now)
+    current = dict(Model3D.objects.filter(trending_score__gt=0).values_list('pk', 'trending_score'))
+    changed = [
+        Model3D(pk=pk, trending_score=score) for pk, score in scores.items()
+        if abs(current.get(pk, 0) - score) > TOLERANCE
+    ]
+    changed += [Model3D(pk=pk, trending_score=0) for pk in current.keys() - scores.keys()]
+
+    with transaction.atomic():
+        Model3D.objects.bulk_update(changed, ['trending_score'], batch_size=batch_size)
+        if changed:
+            catalog_cache.invalidate(catalog_cache.ordering_tag('trending'))
+    return len(changed)
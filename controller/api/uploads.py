@@ -0,0 +1,102 @@
+# api/uploads.py
+
+"""
+Criação de um modelo 3D a partir de um upload com vários ficheiros e imagens.
+
+Os ficheiros são gravados no storage em paralelo, num pool de threads partilhado (a escrita é
+I/O, por isso o tempo total acompanha o maior ficheiro e não a soma de todos). Só depois o
+modelo e as suas linhas de ficheiros e imagens são criados numa única transação, com
+bulk_create. Se alguma escrita ou a transação falhar, os ficheiros já gravados são apagados e
+não fica nenhum modelo a meio.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+from . import catalog_cache, events, jobs
+from .models import Model3D, ModelFile, ModelImage
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.UPLOAD_STORAGE_WORKERS,
+                                           thread_name_prefix='upload-storage')
+    return _executor
+
+
+def _store(field, upload):
+    name = field.generate_filename(None, upload.name)
+    return field.storage.save(name, upload, max_length=field.max_length)
+
+
+def _discard(stored):
+    for field, name in stored:
+        try:
+            field.storage.delete(name)
+        except Exception:
+            logger.exception("Não foi possível apagar o ficheiro órfão %s.", name)
+
+
+def store_all(writes):
+    """
+    Grava em paralelo os uploads de 'writes' (pares (campo, ficheiro)). Se algum falhar, apaga os
+    restantes e relança o erro.
+
+    Returns:
+        list: Os nomes gravados no storage, pela ordem de 'writes'.
+    """
+    futures = [(field, _pool().submit(_store, field, upload)) for field, upload in writes]
+    stored, error = [], None
+    for field, future in futures:
+        try:
+            stored.append((field, future.result()))
+        except Exception as exc:
+            error = error or exc
+    if error is not None:
+        _discard(stored)
+        raise error
+    return [name for _, name in stored]
+
+
+def create_model(user, files, images, **fields):
+    """
+    Cria o modelo com os seus ficheiros e imagens, tudo ou nada.
+
+    Returns:
+        Model3D: O modelo criado.
+    """
+    file_field = ModelFile._meta.get_field('file')
+    image_field = ModelImage._meta.get_field('image')
+    writes = [(file_field, upload) for upload in files] + [(image_field, upload) for upload in images]
+    names = store_all(writes)
+    file_names, image_names = names[:len(files)], names[len(files):]
+
+    try:
+        with transaction.atomic():
+            model = Model3D.objects.create(user=user, **fields)
+            ModelFile.objects.bulk_create([
+                ModelFile(model=model, file=name, file_name=upload.name)
+                for name, upload in zip(file_names, files)])
+            ModelImage.objects.bulk_create([ModelImage(model3d=model, image=name) for name in image_names])
+            catalog_cache.invalidate(catalog_cache.LIST_TAG)
+            # Experiência e progresso da conquista MODELS_UPLOADED (ver api/events.py).
+            events.emit(user, 'model_uploaded', {'xp': 50}, key=f'model:{model.pk}')
+            # Miniaturas e ZIP de download ficam para o worker (ver api/jobs.py).
+            jobs.enqueue('thumbnails', {'model': model.pk}, key=f'thumbnails:{model.pk}')
+            if len(files) > 1:
+                jobs.enqueue('bundle_model', {'model': model.pk}, key=f'bundle:{model.pk}')
+    except Exception:
+        _discard([(field, name) for (field, _), name in zip(writes, names)])
+        raise
+    return model
@@ -22,6 +22,7 @@ from .views import (
     UserDashboardView,
     UserProfileView,
     RecycleView,
+    LeaderboardView,
     TransactionHistoryView,
     ExchangeRequestListCreateView,
     ExchangeRequestDetailView,
@@ -31,6 +32,8 @@ from .views import (
     CoinOfferListCreateView,
     CancelOfferView,
     PurchaseCoinOfferView,
+    InstrumentationReportView,
+    HealthCheckView,
     register_user,
 )
 
@@ -53,6 +56,7 @@ urlpatterns = [
     # --- Conteúdo e Perfil do Utilizador ---
     path("user/dashboard/", UserDashboardView.as_view(), name="user-dashboard"),
     path("recycle/bottles/", RecycleView.as_view(), name="recycle_bottles"),
+    path("leaderboards/<str:metric>/", LeaderboardView.as_view(), name="leaderboard"),
     path("models3d/upload/", ModelUploadView.as_view(), name="model-upload"),
 
     # --- Marketplace: Ofertas e Transações ---
@@ -75,6 +79,10 @@ urlpatterns = [
     path('exchange-requests/<int:pk>/cancel/',
          CancelExchangeRequestView.as_view(), name='cancel-exchange-request'),
 
+    # --- Operação ---
+    path('instrumentation/', InstrumentationReportView.as_view(), name='instrumentation'),
+    path('health/', HealthCheckView.as_view(), name='health'),
+
     # --- Rotas do Router ---
     # Inclui todas as rotas geradas pelo DefaultRouter (ex: /users/, /models3d/, etc.)
     path('', include(router.urls)),
@@ -2,28 +2,32 @@ import zipfile
 import tempfile
 import os
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from collections import defaultdict
 
+from django.conf import settings
 from django.http import FileResponse
 from django.db import models, transaction
-from django.db.models import Sum, Max, Q, OuterRef, Subquery, BooleanField
+from django.db.models import Sum, Max, Q, F, OuterRef, Subquery, BooleanField, FilteredRelation
 from django.db.models.functions import TruncMonth
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 from rest_framework import viewsets, permissions, generics, filters, status, mixins, serializers
 from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny, IsAdminUser
 
 from .models import (
-    Bottle, Model3D, ModelLike, ModelFavorite, Comment, ModelFile,
+    Bottle, Model3D, ModelLike, ModelFavorite, ModelDownload, Comment, ModelFile,
     ModelImage, RecyclingHistory, CoinOffer, CoinTransaction, ExchangeRequest,
-    UserAchievement, Achievement
+    UserAchievement, Achievement, UserTransactionIndex
 )
 from .serializers import (
     BottleSerializer, Model3DSerializer, CommentSerializer, UserSerializer,
@@ -32,7 +36,11 @@ from .serializers import (
     ModelFileSerializer, ModelImageSerializer, PublicUserSerializer
 )
 from .permissions import IsCurator, IsOwnerOrReadOnly
-from .services import add_experience, update_user_achievements
+from . import (
+    catalog_cache, events, health, instrumentation, jobs, leaderboards, ledger, leveling, moderation,
+    recommendations, streaks, uploads,
+)
+from .services import lock_users
 
 
 class BottleViewSet(viewsets.ModelViewSet):
@@ -128,22 +136,21 @@ class UserDashboardView(APIView):
             "labels": MONTH_LABELS, "datasets": final_datasets}
 
         # Lógica de Conquistas e Progresso
-        user_stats = {
-            'BOTTLES_TOTAL': Bottle.objects.filter(user=user).aggregate(total=Sum('quantity'))['total'] or 0,
-            'USER_LEVEL': user.level,
-        }
-        unlocked_ids = set(UserAchievement.objects.filter(
-            user=user, unlocked_at__isnull=False).values_list('achievement_id', flat=True))
-        all_achievements_definitions = Achievement.objects.all()
+        # O progresso de todos os critérios vem da tabela materializada (UserAchievement.progress),
+        # numa única leitura; conquistas ainda sem linha para o utilizador contam como 0.
+        unit_map = {'BOTTLES_TOTAL': 'garrafas', 'USER_LEVEL': 'níveis', 'MONTHLY_BOTTLES': 'garrafas',
+                    'CONSECUTIVE_MONTHS': 'meses', 'MODELS_UPLOADED': 'modelos'}
+        achievements = Achievement.objects.annotate(
+            mine=FilteredRelation('userachievement', condition=Q(userachievement__user=user)),
+        ).values('id', 'title', 'description', 'icon_name', 'criteria_type', 'criteria_value',
+                 'mine__progress', 'mine__unlocked_at')
         achievements_data = []
-        for ach in all_achievements_definitions:
-            current_progress = user_stats.get(ach.criteria_type, 0)
-            unit_map = {'BOTTLES_TOTAL': 'garrafas', 'USER_LEVEL': 'níveis'}
-            unit = unit_map.get(ach.criteria_type, '')
+        for ach in achievements:
             achievements_data.append({
-                'id': ach.id, 'title': ach.title, 'description': ach.description,
-                'icon_name': ach.icon_name, 'unlocked': ach.id in unlocked_ids,
-                'progress': {'current': current_progress, 'total': ach.criteria_value, 'unit': unit}
+                'id': ach['id'], 'title': ach['title'], 'description': ach['description'],
+                'icon_name': ach['icon_name'], 'unlocked': ach['mine__unlocked_at'] is not None,
+                'progress': {'current': ach['mine__progress'] or 0, 'total': ach['criteria_value'],
+                             'unit': unit_map.get(ach['criteria_type'], '')}
             })
 
         # Resposta Final da API
@@ -152,15 +159,19 @@ class UserDashboardView(APIView):
             "reputationCoins": user.reputation_coins,
             "level": user.level,
             "experience": user.experience,
-            "experience_for_next_level": user.level * 100,
+            "experience_for_next_level": leveling.experience_for_level(user.level),
             "recyclingData": recycling_chart_data,
             "achievements": achievements_data,
+            "streak": streaks.user_streaks(user),
             "user": UserSimpleSerializer(user, context={'request': request}).data
         })
 
 
 class RecycleView(APIView):
-    """Processa o registo de uma nova reciclagem de garrafas."""
+    """
+    Processa o registo de uma nova reciclagem de garrafas. Com os eventos de gamificação em fila
+    (GAMIFICATION_EVENTS_EAGER = False), a resposta traz "queued": true e o nível ainda por atualizar.
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -169,32 +180,69 @@ class RecycleView(APIView):
         volume = request.data.get("volume")
         bottle_type = request.data.get("type")
 
-        Bottle.objects.create(user=user, type=bottle_type,
-                              volume=volume, quantity=quantity)
-
         base_reward = FILAMENT_GRAMS_BY_VOLUME.get(volume, 10)
         recycling_coins_earned = base_reward * quantity
 
-        user.recycling_coins += recycling_coins_earned
-        user.reputation_coins += recycling_coins_earned // 2
-        user.save(update_fields=['recycling_coins', 'reputation_coins'])
+        # A garrafa, o crédito e o evento ficam registados juntos ou não fica nenhum.
+        with transaction.atomic():
+            bottle = Bottle.objects.create(user=user, type=bottle_type,
+                                           volume=volume, quantity=quantity)
+            ledger.post(
+                'recycle',
+                ledger.transfer('recycling', recycling_coins_earned, ledger.MINT, user)
+                + ledger.transfer('reputation', recycling_coins_earned // 2, ledger.MINT, user),
+                reference=f'bottle:{bottle.pk}',
+            )
+            # Experiência, histórico, classificações e conquistas são tratados pela fila de eventos.
+            result = events.emit(user, 'bottles_recycled', {'quantity': quantity, 'xp': recycling_coins_earned},
+                                 key=f'bottle:{bottle.pk}')
+
+        return Response({
+            "message": "Reciclagem registrada com sucesso!",
+            "level": result['level'] if result else user.level,
+            "leveled_up": result['leveled_up'] if result else False,
+            "new_achievements": AchievementSerializer(result['new_achievements'] if result else [], many=True).data,
+            "queued": result is None,
+        }, status=status.HTTP_200_OK)
 
-        leveled_up = add_experience(user, xp_amount=recycling_coins_earned)
 
-        today = datetime.today().strftime("%Y-%m")
-        history, _ = RecyclingHistory.objects.get_or_create(
-            user=user, month=today)
-        history.quantity += quantity
-        history.save()
+class LeaderboardView(APIView):
+    """
+    Devolve uma página de um quadro de classificação e, para utilizadores autenticados,
+    a sua posição. Parâmetros: ?period=weekly|monthly|all_time&limit=&offset=
+    """
+    permission_classes = [AllowAny]
+    default_limit = 20
+    max_limit = 100
 
-        newly_unlocked_achievements = update_user_achievements(user)
+    def get(self, request, metric):
+        period = request.query_params.get('period', 'all_time')
+        if metric not in leaderboards.BOARDS or period not in leaderboards.BOARDS[metric]:
+            return Response({"error": "Quadro de classificação inválido."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response({"error": "Parâmetros de paginação inválidos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = leaderboards.board(metric, period).select_related('user')[offset:offset + max(limit, 1)]
+        results = [
+            {
+                'rank': offset + position,
+                'score': entry.score,
+                'user': UserSimpleSerializer(entry.user, context={'request': request}).data,
+            }
+            for position, entry in enumerate(entries, start=1)
+        ]
+        me = leaderboards.rank_of(request.user, metric, period) if request.user.is_authenticated else None
 
         return Response({
-            "message": "Reciclagem registrada com sucesso!",
-            "level": user.level,
-            "leveled_up": leveled_up,
-            "new_achievements": AchievementSerializer(newly_unlocked_achievements, many=True).data,
-        }, status=status.HTTP_200_OK)
+            "metric": metric,
+            "period": period,
+            "offset": offset,
+            "results": results,
+            "me": me,
+        })
 
 
 # --- Views de Conteúdo (Modelos 3D, Comentários, etc.) ---
@@ -222,24 +270,66 @@ class ModelUploadView(APIView):
         if not files or not images:
             return Response({"error": "É necessário enviar pelo menos um ficheiro de modelo e uma imagem."}, status=status.HTTP_400_BAD_REQUEST)
 
-        model_3d = Model3D.objects.create(
-            user=user, name=name, description=description, is_free=is_free, price=price)
-
-        for file in files:
-            ModelFile.objects.create(
-                model=model_3d, file=file, file_name=file.name)
-        for image in images:
-            ModelImage.objects.create(model3d=model_3d, image=image)
+        # Ficheiros gravados em paralelo e linhas criadas numa só transação (ver api/uploads.py).
+        try:
+            model_3d = uploads.create_model(
+                user, files, images, name=name, description=description, is_free=is_free, price=price)
+        except Exception as e:
+            logger.error(f"Erro ao guardar o upload do modelo '{name}': {e}", exc_info=True)
+            return Response({"error": "Erro ao guardar os ficheiros do modelo."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         serializer = Model3DSerializer(model_3d, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class CatalogOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter com a opção 'trending': modelos com maior pontuação de tendência primeiro
+    (ver api/trending.py), lidos do índice (-trending_score, -id).
+    """
+    aliases = {
+        'trending': ['-trending_score', '-id'],
+        '-trending': ['trending_score', 'id'],
+    }
+
+    def get_ordering(self, request, queryset, view):
+        param = request.query_params.get(self.ordering_param, '').strip()
+        if param in self.aliases:
+            return self.aliases[param]
+        return super().get_ordering(request, queryset, view)
+
+
+class ModerationPagination(CursorPagination):
+    """Fila de moderação: os modelos mais antigos primeiro, pelo índice (review_state, date, id)."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('date', 'id')
+
+
+class CatalogPagination(CursorPagination):
+    """
+    Paginação por cursor da listagem do catálogo, pelo índice (-date, -id). É opcional: só se
+    aplica quando o pedido indica 'page_size' ou 'cursor', e sem eles a lista continua completa.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-date', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        requested = self.page_size_query_param in request.query_params or self.cursor_query_param in request.query_params
+        if not requested or getattr(view, 'action', 'list') != 'list':
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
 class Model3DViewSet(viewsets.ModelViewSet):
     """ViewSet principal para todas as operações de CRUD e ações em Modelos 3D."""
     serializer_class = Model3DSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = CatalogPagination
+    filter_backends = [filters.SearchFilter, CatalogOrderingFilter]
     search_fields = ['name', 'description', 'user__username']
     ordering_fields = ['date', 'likes', 'downloads', 'name']
 
@@ -251,26 +341,65 @@ class Model3DViewSet(viewsets.ModelViewSet):
         - Visitantes anónimos veem apenas os modelos visíveis.
         """
         user = self.request.user
+        models = Model3D.objects.for_catalog(user)
         if user.is_authenticated:
             if hasattr(user, 'is_curator') and user.is_curator:
-                return Model3D.objects.all().order_by('-date')
-            return Model3D.objects.filter(Q(is_visible=True) | Q(user=user)).distinct().order_by('-date')
-        return Model3D.objects.filter(is_visible=True).order_by('-date')
+                return models.order_by('-date', '-id')
+            # O OR é sobre uma só tabela, sem joins, por isso não há linhas repetidas nem precisa de
+            # DISTINCT. A consulta percorre o índice (-date, -id) por ordem e para ao fim da página.
+            return models.filter(Q(is_visible=True) | Q(user=user)).order_by('-date', '-id')
+        return models.filter(is_visible=True).order_by('-date', '-id')
 
     def get_permissions(self):
         """Define permissões específicas por ação."""
         if self.action in ['update', 'partial_update', 'destroy', 'add_image', 'add_file']:
             return [permissions.IsAuthenticated(), IsOwnerOrReadOnly()]
-        if self.action == 'set_visibility':
+        if self.action in ['set_visibility', 'moderation', 'moderate']:
             return [permissions.IsAuthenticated(), IsCurator()]
         return super().get_permissions()
 
+    def list(self, request, *args, **kwargs):
+        return self._cached(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(request, super().retrieve, *args, **kwargs)
+
+    def _cached(self, request, handler, *args, **kwargs):
+        """Serve os pedidos anónimos a partir da cache do catálogo (ver api/catalog_cache.py)."""
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        def render():
+            response = handler(request, *args, **kwargs)
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            return response.render()
+        return catalog_cache.cached_response(request, self.action, render)
+
     def perform_create(self, serializer):
         """Garante que o utilizador autenticado seja registado no modelo e ganhe recompensas."""
         user = self.request.user
-        serializer.save(user=user)
+        model = serializer.save(user=user)
+        catalog_cache.invalidate(catalog_cache.LIST_TAG)
         # Recompensa o utilizador com experiência por contribuir com um novo modelo.
-        add_experience(user, xp_amount=50)
+        events.emit(user, 'model_uploaded', {'xp': 50}, key=f'model:{model.pk}')
+
+    def perform_update(self, serializer):
+        # O nome e a descrição contam para a pesquisa, por isso as listagens também são invalidadas.
+        model = serializer.save()
+        catalog_cache.invalidate(catalog_cache.LIST_TAG, models=[model.pk])
+
+    def perform_destroy(self, instance):
+        names = [instance.bundle.name]
+        names += [name for image in instance.images.all() for name in (image.image.name, image.thumbnail.name)]
+        names += [model_file.file.name for model_file in instance.files.all()]
+        with transaction.atomic():
+            catalog_cache.invalidate(catalog_cache.LIST_TAG, models=[instance.pk])
+            model_id = instance.pk
+            instance.delete()
+            jobs.delete_files_later(names)
+            events.emit(instance.user, 'model_deleted', {}, key=f'model-deleted:{model_id}')
 
     @action(detail=True, methods=['post'])
     def add_image(self, request, pk=None):
@@ -280,6 +409,8 @@ class Model3DViewSet(viewsets.ModelViewSet):
             data={'model3d': model.pk, 'image': request.data.get('image')})
         if image_serializer.is_valid():
             image_serializer.save()
+            catalog_cache.invalidate(models=[model.pk])
+            jobs.enqueue('thumbnails', {'model': model.pk}, key=f'thumbnails:{model.pk}')
             return Response(image_serializer.data, status=status.HTTP_201_CREATED)
         return Response(image_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -292,6 +423,8 @@ class Model3DViewSet(viewsets.ModelViewSet):
             data={'model': model.pk, 'file': file, 'file_name': file.name})
         if file_serializer.is_valid():
             file_serializer.save()
+            catalog_cache.invalidate(models=[model.pk])
+            jobs.refresh_bundle(model.pk)
             return Response(file_serializer.data, status=status.HTTP_201_CREATED)
         return Response(file_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -302,11 +435,36 @@ class Model3DViewSet(viewsets.ModelViewSet):
         is_visible = request.data.get('is_visible')
         if is_visible is None or not isinstance(is_visible, bool):
             return Response({'error': 'O campo "is_visible" (booleano) é obrigatório.'}, status=status.HTTP_400_BAD_REQUEST)
-        model.is_visible = is_visible
-        model.save()
+        moderation.apply([model.pk], 'approve' if is_visible else 'hide', request.user)
         message = "visível" if is_visible else "oculto"
         return Response({'status': f'Modelo "{model.name}" foi marcado como {message}.'}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'])
+    def moderation(self, request):
+        """Fila de moderação para curadores: modelos de um estado ('?state=', por omissão 'pending')."""
+        state = request.query_params.get('state', 'pending')
+        if state not in dict(Model3D.REVIEW_STATES):
+            return Response({'error': f'Estado de revisão inválido: "{state}".'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = Model3D.objects.filter(review_state=state).select_related('user').prefetch_related('images', 'files')
+        paginator = ModerationPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def moderate(self, request):
+        """Aprova ou oculta vários modelos de uma vez: {"ids": [...], "decision": "approve" | "hide"}."""
+        ids = request.data.get('ids')
+        decision = request.data.get('decision')
+        if decision not in moderation.DECISIONS:
+            return Response({'error': 'O campo "decision" deve ser "approve" ou "hide".'}, status=status.HTTP_400_BAD_REQUEST)
+        if (not isinstance(ids, list) or not ids or len(ids) > moderation.MAX_BATCH
+                or not all(isinstance(pk, int) for pk in ids)):
+            return Response({'error': f'O campo "ids" deve ser uma lista de 1 a {moderation.MAX_BATCH} ids.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        updated = moderation.apply(ids, decision, request.user)
+        return Response({'updated': updated}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'])
     def my_models(self, request):
         """Retorna uma lista de todos os modelos criados pelo utilizador autenticado."""
@@ -322,17 +480,21 @@ class Model3DViewSet(viewsets.ModelViewSet):
     def like(self, request, pk=None):
         """Permite a um utilizador curtir ou descurtir um modelo."""
         model = get_object_or_404(Model3D, pk=pk)
-        like, created = ModelLike.objects.get_or_create(
-            user=request.user, model=model)
-        if not created:
-            like.delete()
-            model.likes = max(0, model.likes - 1)
-            message = 'Like removido'
-        else:
-            model.likes += 1
-            message = 'Like adicionado'
-        model.save()
-        return Response({'likes': model.likes, 'message': message}, status=status.HTTP_200_OK)
+        # Só o contador muda, com um UPDATE atómico: gravar a linha inteira repunha os outros
+        # campos (comentários, tendência, moderação) com os valores lidos aqui.
+        with transaction.atomic():
+            like, created = ModelLike.objects.get_or_create(
+                user=request.user, model=model)
+            if not created:
+                like.delete()
+                Model3D.objects.filter(pk=model.pk, likes__gt=0).update(likes=F('likes') - 1)
+                message = 'Like removido'
+            else:
+                Model3D.objects.filter(pk=model.pk).update(likes=F('likes') + 1)
+                message = 'Like adicionado'
+            catalog_cache.invalidate(catalog_cache.ordering_tag('likes'), models=[model.pk])
+        likes = Model3D.objects.filter(pk=model.pk).values_list('likes', flat=True).first()
+        return Response({'likes': likes, 'message': message}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['get'])
     def liked(self, request):
@@ -346,6 +508,17 @@ class Model3DViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(liked_models, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def recommended(self, request):
+        """Retorna os modelos recomendados ao utilizador, a partir dos seus likes e favoritos."""
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({"error": "O parâmetro 'limit' deve ser um número inteiro."}, status=status.HTTP_400_BAD_REQUEST)
+        models = recommendations.recommend(request.user, limit=limit)
+        serializer = self.get_serializer(models, many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['post'])
     def save(self, request, pk=None):
         """Permite a um utilizador salvar ou remover um modelo dos seus favoritos."""
@@ -378,11 +551,7 @@ class Model3DViewSet(viewsets.ModelViewSet):
         try:
             if not model.is_free:
                 if user.recycling_coins < model.price:
-                    return Response(
-                        {"error": f"Você não possui moedas de reciclagem suficientes. Necessário: {model.price}"},
-                        status=status.HTTP_402_PAYMENT_REQUIRED
-                    )
-                user.recycling_coins -= model.price
+                    return self._payment_required(model)
                 paid_for_model = True
 
             model_files = model.files.all()
@@ -401,13 +570,9 @@ class Model3DViewSet(viewsets.ModelViewSet):
                     f"Retornando arquivo único: {model_file.file_name} para modelo ID {model.pk}")
                 try:
                     file_handle = model_file.file.open('rb')
-                    if paid_for_model:
-                        user.save()  # Salva débito de moedas
-                        model.downloads += 1
-                        model.save()  # Salva incremento de downloads
-                    elif model.is_free:  # Se for gratuito e não pago
-                        model.downloads += 1
-                        model.save()
+                    if not self._register_download(user, model, paid_for_model):
+                        file_handle.close()
+                        return self._payment_required(model)
 
                     response = FileResponse(
                         file_handle,
@@ -421,6 +586,20 @@ class Model3DViewSet(viewsets.ModelViewSet):
                         f"Erro ao abrir arquivo único {model_file.file.name} para modelo ID {model.pk}: {e}", exc_info=True)
                     return Response({"error": "Erro ao acessar o arquivo do modelo."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+            # ZIP gerado em segundo plano (tarefa 'bundle_model'); enquanto não existe, é criado aqui.
+            zip_response_filename = f"{model.name.replace(' ', '_')}_arquivos.zip"
+            if model.bundle:
+                try:
+                    bundle_handle = model.bundle.open('rb')
+                except FileNotFoundError:
+                    logger.warning(f"ZIP pré-gerado em falta para o modelo ID {model.pk}: {model.bundle.name}")
+                else:
+                    if not self._register_download(user, model, paid_for_model):
+                        bundle_handle.close()
+                        return self._payment_required(model)
+                    return FileResponse(bundle_handle, as_attachment=True, filename=zip_response_filename)
+            jobs.enqueue('bundle_model', {'model': model.pk}, key=f'bundle:{model.pk}')
+
             # Lógica para múltiplos arquivos (ZIP)
             logger.info(
                 f"Criando ZIP para modelo ID {model.pk} com {model_files.count()} arquivos.")
@@ -468,15 +647,10 @@ class Model3DViewSet(viewsets.ModelViewSet):
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR
                     )
 
-                if paid_for_model:
-                    user.save()  # Salva débito de moedas
-                    model.downloads += 1
-                    model.save()  # Salva incremento de downloads
-                elif model.is_free:
-                    model.downloads += 1
-                    model.save()
+                if not self._register_download(user, model, paid_for_model):
+                    os.unlink(temp_zip_path)
+                    return self._payment_required(model)
 
-                zip_response_filename = f"{model.name.replace(' ', '_')}_arquivos.zip"
                 response = FileResponse(
                     open(temp_zip_path, 'rb'),
                     as_attachment=True,
@@ -518,15 +692,68 @@ class Model3DViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def _register_download(self, user, model, paid_for_model):
+        """
+        Debita o preço do modelo (se for pago) e incrementa o contador de downloads.
+        Devolve False se o saldo do utilizador já não cobrir o preço.
+        """
+        if paid_for_model:
+            try:
+                ledger.post('download', ledger.transfer('recycling', model.price, user, ledger.BURN),
+                            reference=f'model:{model.pk}')
+            except ledger.InsufficientBalance:
+                return False
+        Model3D.objects.filter(pk=model.pk).update(downloads=F('downloads') + 1)
+        ModelDownload.objects.create(model=model, user=user if user.is_authenticated else None)
+        catalog_cache.invalidate(catalog_cache.ordering_tag('downloads'), models=[model.pk])
+        return True
+
+    def _payment_required(self, model):
+        return Response(
+            {"error": f"Você não possui moedas de reciclagem suficientes. Necessário: {model.price}"},
+            status=status.HTTP_402_PAYMENT_REQUIRED
+        )
+
+
+class CommentPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-date', '-id')
+
 
 class CommentViewSet(viewsets.ModelViewSet):
-    """ViewSet para gerir os comentários de um modelo."""
-    queryset = Comment.objects.all().order_by("-date")
+    """
+    ViewSet para gerir os comentários de um modelo.
+
+    A listagem é sempre de um só modelo ('?model=<id>'), paginada por cursor sobre o índice
+    (model, -date, -id), com os autores lidos na mesma consulta. Criar ou apagar um comentário
+    atualiza Model3D.comments_count na mesma transação.
+    """
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CommentPagination
+
+    def get_queryset(self):
+        queryset = Comment.objects.select_related('user')
+        if self.action == 'list':
+            model_id = self.request.query_params.get('model')
+            if not model_id or not model_id.isdigit():
+                raise serializers.ValidationError({'model': "Indique o id do modelo ('?model=<id>')."})
+            queryset = queryset.filter(model_id=model_id)
+        return queryset
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            comment = serializer.save(user=self.request.user)
+            Model3D.objects.filter(pk=comment.model_id).update(comments_count=F('comments_count') + 1)
+            catalog_cache.invalidate(models=[comment.model_id])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            Model3D.objects.filter(pk=instance.model_id).update(comments_count=F('comments_count') - 1)
+            catalog_cache.invalidate(models=[instance.model_id])
 
 
 class ModelImageViewSet(viewsets.GenericViewSet, mixins.DestroyModelMixin):
@@ -535,6 +762,12 @@ class ModelImageViewSet(viewsets.GenericViewSet, mixins.DestroyModelMixin):
     serializer_class = ModelImageSerializer
     permission_classes = [IsOwnerOrReadOnly]
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            catalog_cache.invalidate(models=[instance.model3d_id])
+            instance.delete()
+            jobs.delete_files_later([instance.image.name, instance.thumbnail.name])
+
 
 class ModelFileViewSet(viewsets.GenericViewSet, mixins.DestroyModelMixin):
     """ViewSet para apagar ficheiros de modelos."""
@@ -542,6 +775,13 @@ class ModelFileViewSet(viewsets.GenericViewSet, mixins.DestroyModelMixin):
     serializer_class = ModelFileSerializer
     permission_classes = [IsOwnerOrReadOnly]
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            catalog_cache.invalidate(models=[instance.model_id])
+            instance.delete()
+            jobs.delete_files_later([instance.file.name])
+            jobs.refresh_bundle(instance.model_id)
+
 
 # def get_monthly_history(user):
 #     """
@@ -587,13 +827,13 @@ class CoinOfferListCreateView(generics.ListCreateAPIView):
         amount = serializer.validated_data.get('amount')
         seller = self.request.user
         with transaction.atomic():
-            seller_for_update = get_user_model().objects.select_for_update().get(pk=seller.pk)
+            seller_for_update = lock_users(seller.pk)[seller.pk]
             if seller_for_update.recycling_coins < amount:
                 raise serializers.ValidationError(
                     "Você não tem moedas de reciclagem suficientes.")
-            seller_for_update.recycling_coins -= amount
-            seller_for_update.save()
-            serializer.save(seller=seller_for_update, coin_type='recycling')
+            offer = serializer.save(seller=seller_for_update, coin_type='recycling')
+            ledger.post('offer_created', ledger.transfer('recycling', amount, seller_for_update, ledger.ESCROW),
+                        reference=f'offer:{offer.pk}')
 
 
 class MyOffersListView(generics.ListAPIView):
@@ -610,16 +850,17 @@ class CancelOfferView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        offer = get_object_or_404(
-            CoinOffer, id=pk, seller=request.user, status='active')
         with transaction.atomic():
+            # Ordem de bloqueio: primeiro a oferta, depois os utilizadores (ver lock_users).
+            offer = get_object_or_404(
+                CoinOffer.objects.select_for_update(), id=pk, seller=request.user, status='active')
+            lock_users(offer.seller_id)
+
             offer.status = 'cancelled'
-            offer.save()
-            if offer.coin_type == 'recycling':
-                offer.seller.recycling_coins += offer.amount
-            else:
-                offer.seller.reputation_coins += offer.amount
-            offer.seller.save()
+            offer.save(update_fields=['status', 'updated_at'])
+            ledger.post('offer_cancelled',
+                        ledger.transfer(offer.coin_type, offer.amount, ledger.ESCROW, offer.seller_id),
+                        reference=f'offer:{offer.pk}')
         return Response({"message": "Oferta cancelada com sucesso!"}, status=status.HTTP_200_OK)
 
 
@@ -629,28 +870,36 @@ class PurchaseCoinOfferView(APIView):
 
     def post(self, request, pk):
         buyer = request.user
-        offer = get_object_or_404(CoinOffer, id=pk, status='active')
 
-        if offer.specific_user and offer.specific_user != buyer:
-            return Response({"error": "Esta oferta não está disponível para você."}, status=status.HTTP_403_FORBIDDEN)
-        if offer.seller == buyer:
-            return Response({"error": "Você não pode comprar sua própria oferta."}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            # Ordem de bloqueio: primeiro a oferta, depois os utilizadores (ver lock_users).
+            # O estado e os saldos só são verificados depois de as linhas estarem bloqueadas.
+            offer = get_object_or_404(
+                CoinOffer.objects.select_for_update(), id=pk, status='active')
 
-        total_price = offer.calculate_total_price()
-        if buyer.reputation_coins < total_price:
-            return Response({"error": "Você não tem moedas de reputação suficientes."}, status=status.HTTP_400_BAD_REQUEST)
+            if offer.specific_user_id and offer.specific_user_id != buyer.pk:
+                return Response({"error": "Esta oferta não está disponível para você."}, status=status.HTTP_403_FORBIDDEN)
+            if offer.seller_id == buyer.pk:
+                return Response({"error": "Você não pode comprar sua própria oferta."}, status=status.HTTP_400_BAD_REQUEST)
+
+            locked = lock_users(offer.seller_id, buyer.pk)
+            total_price = offer.calculate_total_price()
+            if locked[buyer.pk].reputation_coins < total_price:
+                return Response({"error": "Você não tem moedas de reputação suficientes."}, status=status.HTTP_400_BAD_REQUEST)
 
-        with transaction.atomic():
             offer.status = 'completed'
-            offer.save()
-            if offer.offer_type == 'sale':
-                buyer.reputation_coins -= total_price
-                offer.seller.reputation_coins += total_price
-            buyer.recycling_coins += offer.amount
-            buyer.save()
-            offer.seller.save()
+            offer.save(update_fields=['status', 'updated_at'])
+
+            # As moedas da oferta já estão na reserva; o comprador paga ao vendedor em reputação.
+            ledger.post(
+                'offer_purchased',
+                ledger.transfer(offer.coin_type, offer.amount, ledger.ESCROW, buyer)
+                + ledger.transfer('reputation', total_price, buyer, offer.seller_id),
+                reference=f'offer:{offer.pk}',
+            )
+
             coin_transaction = CoinTransaction.objects.create(
-                sender=offer.seller, receiver=buyer, offer=offer,
+                sender_id=offer.seller_id, receiver=buyer, offer=offer,
                 coin_type=offer.coin_type, amount=offer.amount,
                 transaction_type='gift' if offer.offer_type == 'gift' else 'purchase',
                 price_paid=total_price
@@ -658,14 +907,49 @@ class PurchaseCoinOfferView(APIView):
         return Response(CoinTransactionSerializer(coin_transaction).data, status=status.HTTP_201_CREATED)
 
 
+class TransactionHistoryPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-transaction_date', '-id')
+
+
 class TransactionHistoryView(generics.ListAPIView):
-    """Lista o histórico de transações do utilizador."""
+    """
+    Lista o histórico de transações do utilizador, paginado por cursor.
+
+    Lê o índice por utilizador (UserTransactionIndex), pelo que cada página é um intervalo
+    de um único índice. Filtros opcionais: 'coin_type', 'date_from' e 'date_to' (AAAA-MM-DD).
+    """
     serializer_class = CoinTransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TransactionHistoryPagination
 
     def get_queryset(self):
-        user = self.request.user
-        return CoinTransaction.objects.filter(Q(sender=user) | Q(receiver=user)).order_by('-transaction_date')
+        params = self.request.query_params
+        entries = UserTransactionIndex.objects.filter(user=self.request.user)
+
+        coin_type = params.get('coin_type')
+        if coin_type:
+            entries = entries.filter(coin_type=coin_type)
+        for param, lookup in (('date_from', 'gte'), ('date_to', 'lt')):
+            value = params.get(param)
+            if not value:
+                continue
+            day = parse_date(value)
+            if day is None:
+                raise serializers.ValidationError({param: "Data inválida. Use o formato AAAA-MM-DD."})
+            if lookup == 'lt':
+                day += timedelta(days=1)  # 'date_to' inclui o próprio dia
+            boundary = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+            entries = entries.filter(**{f'transaction_date__{lookup}': boundary})
+
+        return entries.select_related('transaction__sender', 'transaction__receiver')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer([entry.transaction for entry in page], many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class ExchangeRequestListCreateView(generics.ListCreateAPIView):
@@ -697,159 +981,107 @@ class ExchangeRequestDetailView(generics.RetrieveAPIView):
         return obj
 
 
+def return_exchange_escrow(exchange_request):
+    """Devolve ao solicitante as moedas reservadas numa solicitação de troca."""
+    ledger.post(
+        'exchange_returned',
+        ledger.transfer('recycling', exchange_request.offer_recycling_coins,
+                        ledger.ESCROW, exchange_request.requester_id)
+        + ledger.transfer('reputation', exchange_request.offer_reputation_coins,
+                          ledger.ESCROW, exchange_request.requester_id),
+        reference=f'exchange:{exchange_request.pk}',
+    )
+
+
 class RespondToExchangeRequestView(APIView):
     """
     Responde a uma solicitação de troca (aceitar ou rejeitar).
+
+    A liquidação é feita numa única passagem: bloqueia a solicitação e os dois utilizadores,
+    muda o estado com um compare-and-swap ('pending' -> 'accepted'/'rejected'), aplica os
+    saldos através do livro-razão e regista as transações com um único bulk_create.
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        try:
+        accept = request.data.get('accept', False)
+
+        with transaction.atomic():
+            # Ordem de bloqueio: primeiro a solicitação, depois os utilizadores (ver lock_users).
             exchange_request = get_object_or_404(
-                ExchangeRequest,
+                ExchangeRequest.objects.select_for_update(),
                 id=pk,
                 receiver=request.user,
                 status='pending'
             )
+            locked = lock_users(exchange_request.requester_id, exchange_request.receiver_id)
+            requester = locked[exchange_request.requester_id]
+            receiver = locked[exchange_request.receiver_id]
+
+            # O saldo do receptor é verificado na linha bloqueada, e não no request.user em cache.
+            error = None
+            if accept:
+                if exchange_request.request_recycling_coins > receiver.recycling_coins:
+                    error = "Você não tem moedas de reciclagem suficientes para completar esta troca."
+                elif exchange_request.request_reputation_coins > receiver.reputation_coins:
+                    error = "Você não tem moedas de reputação suficientes para completar esta troca."
+            new_status = 'accepted' if accept and not error else 'rejected'
+
+            # Compare-and-swap: só uma resposta consegue tirar a solicitação de 'pending'.
+            claimed = ExchangeRequest.objects.filter(pk=exchange_request.pk, status='pending').update(
+                status=new_status, updated_at=timezone.now())
+            if not claimed:
+                return Response(
+                    {"error": "Solicitação de troca não encontrada ou já foi processada."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            exchange_request.status = new_status
+
+            if new_status == 'rejected':
+                # Devolver moedas ao solicitante
+                return_exchange_escrow(exchange_request)
+                if error:
+                    return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+                return Response({
+                    "exchange_request": ExchangeRequestSerializer(exchange_request).data,
+                    "message": "Solicitação de troca rejeitada."
+                }, status=status.HTTP_200_OK)
+
+            # O que foi solicitado passa do receptor para o solicitante; o que foi
+            # oferecido (já reservado do solicitante) sai da reserva para o receptor.
+            ledger.post(
+                'exchange_accepted',
+                ledger.transfer('recycling', exchange_request.request_recycling_coins, receiver, requester)
+                + ledger.transfer('reputation', exchange_request.request_reputation_coins, receiver, requester)
+                + ledger.transfer('recycling', exchange_request.offer_recycling_coins, ledger.ESCROW, receiver)
+                + ledger.transfer('reputation', exchange_request.offer_reputation_coins, ledger.ESCROW, receiver),
+                reference=f'exchange:{exchange_request.pk}',
+            )
 
-            # Obter decisão do corpo da requisição
-            accept = request.data.get('accept', False)
-
-            with transaction.atomic():
-                if accept:
-                    # Verificar se o receptor ainda tem moedas suficientes
-                    if exchange_request.request_recycling_coins > request.user.recycling_coins:
-                        # Devolver moedas ao solicitante e rejeitar
-                        requester = exchange_request.requester
-                        requester.recycling_coins += exchange_request.offer_recycling_coins
-                        requester.reputation_coins += exchange_request.offer_reputation_coins
-                        requester.save()
-
-                        exchange_request.status = 'rejected'
-                        exchange_request.save()
-
-                        return Response(
-                            {"error": "Você não tem moedas de reciclagem suficientes para completar esta troca."},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-
-                    if exchange_request.request_reputation_coins > request.user.reputation_coins:
-                        # Devolver moedas ao solicitante e rejeitar
-                        requester = exchange_request.requester
-                        requester.recycling_coins += exchange_request.offer_recycling_coins
-                        requester.reputation_coins += exchange_request.offer_reputation_coins
-                        requester.save()
-
-                        exchange_request.status = 'rejected'
-                        exchange_request.save()
-
-                        return Response(
-                            {"error": "Você não tem moedas de reputação suficientes para completar esta troca."},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-
-                    # Processar a troca - Transferir moedas do receptor para o solicitante
-                    requester = exchange_request.requester
-                    receiver = request.user
-
-                    # Transferir o que foi solicitado (do receptor para o solicitante)
-                    receiver.recycling_coins -= exchange_request.request_recycling_coins
-                    receiver.reputation_coins -= exchange_request.request_reputation_coins
-                    requester.recycling_coins += exchange_request.request_recycling_coins
-                    requester.reputation_coins += exchange_request.request_reputation_coins
-
-                    # Transferir o que foi oferecido (moedas já foram reservadas do solicitante)
-                    receiver.recycling_coins += exchange_request.offer_recycling_coins
-                    receiver.reputation_coins += exchange_request.offer_reputation_coins
-
-                    # Salvar alterações
-                    requester.save()
-                    receiver.save()
-
-                    # Registrar as transações
-                    transactions = []
-
-                    if exchange_request.offer_recycling_coins > 0:
-                        transactions.append(CoinTransaction.objects.create(
-                            sender=requester,
-                            receiver=receiver,
-                            coin_type='recycling',
-                            amount=exchange_request.offer_recycling_coins,
-                            transaction_type='purchase',
-                            price_paid=0,
-                            notes=f"Parte de troca direta (ID: {exchange_request.id})"
-                        ))
-
-                    if exchange_request.offer_reputation_coins > 0:
-                        transactions.append(CoinTransaction.objects.create(
-                            sender=requester,
-                            receiver=receiver,
-                            coin_type='reputation',
-                            amount=exchange_request.offer_reputation_coins,
-                            transaction_type='purchase',
-                            price_paid=0,
-                            notes=f"Parte de troca direta (ID: {exchange_request.id})"
-                        ))
-
-                    if exchange_request.request_recycling_coins > 0:
-                        transactions.append(CoinTransaction.objects.create(
-                            sender=receiver,
-                            receiver=requester,
-                            coin_type='recycling',
-                            amount=exchange_request.request_recycling_coins,
-                            transaction_type='purchase',
-                            price_paid=0,
-                            notes=f"Parte de troca direta (ID: {exchange_request.id})"
-                        ))
-
-                    if exchange_request.request_reputation_coins > 0:
-                        transactions.append(CoinTransaction.objects.create(
-                            sender=receiver,
-                            receiver=requester,
-                            coin_type='reputation',
-                            amount=exchange_request.request_reputation_coins,
-                            transaction_type='purchase',
-                            price_paid=0,
-                            notes=f"Parte de troca direta (ID: {exchange_request.id})"
-                        ))
-
-                    exchange_request.status = 'accepted'
-
-                    # Serializar todas as transações
-                    transaction_serializer = CoinTransactionSerializer(
-                        transactions, many=True)
-
-                else:
-                    # Rejeitar e devolver moedas ao solicitante
-                    requester = exchange_request.requester
-                    requester.recycling_coins += exchange_request.offer_recycling_coins
-                    requester.reputation_coins += exchange_request.offer_reputation_coins
-                    requester.save()
-
-                    exchange_request.status = 'rejected'
-                    transaction_serializer = None
-
-                exchange_request.save()
-
-                # Serializar a solicitação de troca
-                exchange_serializer = ExchangeRequestSerializer(
-                    exchange_request)
-
-                response_data = {
-                    "exchange_request": exchange_serializer.data,
-                    "message": "Solicitação de troca aceita com sucesso!" if accept else "Solicitação de troca rejeitada."
-                }
-
-                if transaction_serializer:
-                    response_data["transactions"] = transaction_serializer.data
-
-                return Response(response_data, status=status.HTTP_200_OK)
-
-        except ExchangeRequest.DoesNotExist:
-            return Response(
-                {"error": "Solicitação de troca não encontrada ou já foi processada."},
-                status=status.HTTP_404_NOT_FOUND
+            legs = (
+                (requester, receiver, 'recycling', exchange_request.offer_recycling_coins),
+                (requester, receiver, 'reputation', exchange_request.offer_reputation_coins),
+                (receiver, requester, 'recycling', exchange_request.request_recycling_coins),
+                (receiver, requester, 'reputation', exchange_request.request_reputation_coins),
             )
+            transactions = CoinTransaction.objects.bulk_create([
+                CoinTransaction(
+                    sender=sender,
+                    receiver=recipient,
+                    coin_type=coin_type,
+                    amount=amount,
+                    transaction_type='purchase',
+                    price_paid=0,
+                    notes=f"Parte de troca direta (ID: {exchange_request.id})"
+                )
+                for sender, recipient, coin_type, amount in legs if amount > 0
+            ])
+
+        return Response({
+            "exchange_request": ExchangeRequestSerializer(exchange_request).data,
+            "message": "Solicitação de troca aceita com sucesso!",
+            "transactions": CoinTransactionSerializer(transactions, many=True).data,
+        }, status=status.HTTP_200_OK)
 
 
 class CancelExchangeRequestView(APIView):
@@ -860,21 +1092,26 @@ class CancelExchangeRequestView(APIView):
 
     def post(self, request, pk):
         try:
-            exchange_request = get_object_or_404(
-                ExchangeRequest,
-                id=pk,
-                requester=request.user,
-                status='pending'
-            )
-
             with transaction.atomic():
-                # Devolver moedas reservadas ao solicitante
-                request.user.recycling_coins += exchange_request.offer_recycling_coins
-                request.user.reputation_coins += exchange_request.offer_reputation_coins
-                request.user.save()
+                exchange_request = get_object_or_404(
+                    ExchangeRequest.objects.select_for_update(),
+                    id=pk,
+                    requester=request.user,
+                    status='pending'
+                )
 
-                exchange_request.status = 'cancelled'
-                exchange_request.save()
+                # Compare-and-swap, como em RespondToExchangeRequestView: se uma resposta já a
+                # tirou de 'pending', as moedas reservadas já não são do solicitante.
+                claimed = ExchangeRequest.objects.filter(pk=exchange_request.pk, status='pending').update(
+                    status='cancelled', updated_at=timezone.now())
+                if not claimed:
+                    return Response(
+                        {"error": "Solicitação de troca não encontrada ou já foi processada."},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+
+                # Devolver moedas reservadas ao solicitante
+                return_exchange_escrow(exchange_request)
 
                 return Response(
                     {"message": "Solicitação de troca cancelada com sucesso!"},
@@ -900,3 +1137,37 @@ class UserBalanceView(APIView):
             "recycling_coins": user.recycling_coins,
             "reputation_coins": user.reputation_coins
         })
+
+
+# --- Views de Operação ---
+
+class InstrumentationReportView(APIView):
+    """
+    Devolve os percentis por endpoint recolhidos pela instrumentação (API_INSTRUMENTATION).
+    DELETE descarta as amostras, para começar uma nova medição.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "enabled": settings.API_INSTRUMENTATION,
+            "window": settings.API_INSTRUMENTATION_WINDOW,
+            "endpoints": instrumentation.report(),
+        })
+
+    def delete(self, request):
+        instrumentation.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class HealthCheckView(APIView):
+    """
+    Estado da aplicação e da base de dados (503 se a base não responder). Os administradores
+    recebem também as estatísticas do pool de ligações e dos bloqueios.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        database = health.database_health(details=request.user.is_staff)
+        return Response({"status": "ok" if database['ok'] else "error", "database": database},
+                        status=status.HTTP_200_OK if database['ok'] else status.HTTP_503_SERVICE_UNAVAILABLE)
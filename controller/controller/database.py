@@ -0,0 +1,77 @@
+# controller/database.py
+
+"""
+Configuração da base de dados a partir de variáveis de ambiente.
+
+RECICLO_DB_ENGINE escolhe o perfil:
+
+- 'sqlite' (padrão): ficheiro local com WAL (leituras não bloqueiam a escrita), synchronous=NORMAL,
+  busy_timeout, mmap e ligações persistentes. Variáveis: RECICLO_DB_NAME, RECICLO_DB_CONN_MAX_AGE,
+  RECICLO_SQLITE_BUSY_TIMEOUT (ms), RECICLO_SQLITE_MMAP_SIZE (bytes).
+- 'postgres': PostgreSQL com um pool de ligações por processo (psycopg 3 + psycopg_pool).
+  Variáveis: RECICLO_DB_NAME, RECICLO_DB_USER, RECICLO_DB_PASSWORD, RECICLO_DB_HOST,
+  RECICLO_DB_PORT, RECICLO_DB_POOL_MIN, RECICLO_DB_POOL_MAX, RECICLO_DB_POOL_TIMEOUT (s).
+"""
+
+import os
+
+
+def sqlite_profile(base_dir, env=os.environ):
+    """Perfil SQLite afinado para vários leitores e um escritor de cada vez."""
+    busy_timeout = int(env.get('RECICLO_SQLITE_BUSY_TIMEOUT', 20000))
+    mmap_size = int(env.get('RECICLO_SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': env.get('RECICLO_DB_NAME', base_dir / 'db.sqlite3'),
+        'CONN_MAX_AGE': int(env.get('RECICLO_DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # O SQLite ignora o select_for_update. Com o modo IMMEDIATE, cada transaction.atomic()
+            # adquire logo o bloqueio de escrita, o que serializa as operações com moedas.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': busy_timeout / 1000,
+            # Executados em cada nova ligação. Com WAL, synchronous=NORMAL continua a ser seguro
+            # perante falhas da aplicação (só uma falha do sistema pode perder a última transação).
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f'PRAGMA busy_timeout={busy_timeout};'
+                f'PRAGMA mmap_size={mmap_size};'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+        'TEST': {
+            # Base de testes em ficheiro para que os testes com várias threads partilhem os dados.
+            'NAME': base_dir / 'test_db.sqlite3',
+        },
+    }
+
+
+def postgres_profile(env=os.environ):
+    """Perfil PostgreSQL com pool de ligações (o Django exige CONN_MAX_AGE = 0 com pool)."""
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('RECICLO_DB_NAME', 'reciclo'),
+        'USER': env.get('RECICLO_DB_USER', 'reciclo'),
+        'PASSWORD': env.get('RECICLO_DB_PASSWORD', ''),
+        'HOST': env.get('RECICLO_DB_HOST', 'localhost'),
+        'PORT': env.get('RECICLO_DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(env.get('RECICLO_DB_POOL_MIN', 2)),
+                'max_size': int(env.get('RECICLO_DB_POOL_MAX', 10)),
+                'timeout': float(env.get('RECICLO_DB_POOL_TIMEOUT', 10)),
+            },
+        },
+    }
+
+
+def from_environment(base_dir, env=os.environ):
+    """Devolve a configuração da base 'default' conforme RECICLO_DB_ENGINE."""
+    engine = env.get('RECICLO_DB_ENGINE', 'sqlite')
+    if engine == 'sqlite':
+        return sqlite_profile(base_dir, env)
+    if engine == 'postgres':
+        return postgres_profile(env)
+    raise ValueError(f"RECICLO_DB_ENGINE desconhecido: {engine!r} (use 'sqlite' ou 'postgres').")
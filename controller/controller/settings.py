@@ -12,6 +12,8 @@ from pathlib import Path
 from datetime import timedelta
 import os
 
+from . import database
+
 # --- Configurações Principais do Projeto ---
 
 # Define o diretório base do projeto.
@@ -68,6 +70,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',  # Middleware do allauth
+    'api.instrumentation.InstrumentationMiddleware',  # Só ativo com API_INSTRUMENTATION
 ]
 
 # --- Configuração de URLs ---
@@ -96,13 +99,38 @@ WSGI_APPLICATION = 'controller.wsgi.application'
 
 # --- Banco de Dados ---
 
+# Perfil escolhido com RECICLO_DB_ENGINE ('sqlite' ou 'postgres'); ver controller/database.py.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database.from_environment(BASE_DIR),
 }
 
+# --- Cache ---
+
+# Com RECICLO_REDIS_URL, a cache é partilhada por todos os processos (necessário em produção com
+# vários workers, para que as invalidações do catálogo cheguem a todos). Sem ela, cada processo
+# usa a sua própria cache em memória.
+if os.environ.get('RECICLO_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['RECICLO_REDIS_URL'],
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+
+# Respostas do catálogo para visitantes anónimos (ver api/catalog_cache.py): tempo de vida das
+# entradas em cache, s-maxage enviado às CDNs e número máximo de etiquetas 'model:<id>' por
+# entrada (acima disso, a entrada é invalidada por qualquer alteração a um modelo).
+CATALOG_CACHE_TTL = int(os.environ.get('RECICLO_CATALOG_CACHE_TTL', 300))
+CATALOG_CACHE_CDN_MAX_AGE = int(os.environ.get('RECICLO_CATALOG_CDN_MAX_AGE', 30))
+CATALOG_CACHE_MAX_TAGS = 100
+
 # --- Autenticação e Autorização ---
 
 # Define o modelo de utilizador personalizado como o padrão para o projeto.
@@ -154,6 +182,9 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media/'
 
+# Threads usadas para gravar em paralelo os ficheiros de um upload de modelo (ver api/uploads.py).
+UPLOAD_STORAGE_WORKERS = int(os.environ.get('RECICLO_UPLOAD_STORAGE_WORKERS', 8))
+
 # --- Internacionalização ---
 
 LANGUAGE_CODE = 'pt-br'
@@ -170,6 +201,77 @@ CORS_ALLOW_ALL_ORIGINS = True
 # Expõe o header 'Content-Disposition' para que o frontend possa ler o nome dos ficheiros em downloads.
 CORS_EXPOSE_HEADERS = ['Content-Disposition']
 
+# --- Marketplace ---
+
+# Tempo de vida das ofertas ativas e das solicitações de troca pendentes. Depois disso, o
+# comando 'expire_marketplace' marca-as como expiradas e devolve as moedas reservadas.
+# Use None para desativar a expiração.
+COIN_OFFER_TTL = timedelta(days=30)
+EXCHANGE_REQUEST_TTL = timedelta(days=7)
+
+# --- Gamificação ---
+
+# Os pedidos só registam eventos de gamificação (experiência, histórico, classificações e
+# conquistas); é OBRIGATÓRIO ter o comando 'process_gamification_events --loop' a correr, tal como
+# o 'run_jobs' para as tarefas. As respostas indicam "queued": true e o frontend volta a pedir o
+# utilizador pouco depois. RECICLO_GAMIFICATION_EVENTS_EAGER=1 aplica-os no próprio pedido, apenas
+# para testes ou desenvolvimento sem worker.
+GAMIFICATION_EVENTS_EAGER = os.environ.get('RECICLO_GAMIFICATION_EVENTS_EAGER') == '1'
+# Tentativas antes de um evento ficar marcado como falhado.
+GAMIFICATION_EVENT_MAX_ATTEMPTS = 5
+
+# Curva de níveis: passar do nível N ao N+1 custa round(BASE * N ** EXPONENT) de XP.
+# Depois de a alterar, corra 'manage.py recompute_levels' para atualizar os utilizadores.
+LEVELING = {
+    'BASE': int(os.environ.get('RECICLO_LEVEL_BASE', 100)),
+    'EXPONENT': float(os.environ.get('RECICLO_LEVEL_EXPONENT', 1)),
+}
+
+# --- Tarefas em segundo plano ---
+
+# Miniaturas, ZIPs de download e limpeza de ficheiros são executados pelo comando 'run_jobs'
+# (ver api/jobs.py). Com EAGER = True, as tarefas correm no próprio pedido, depois do commit.
+JOBS_EAGER = False
+JOBS = {
+    'MAX_ATTEMPTS': 5,
+    # Espera antes de repetir uma tarefa falhada: BACKOFF_SECONDS · 2^(tentativas - 1), até ao máximo.
+    'BACKOFF_SECONDS': 30,
+    'BACKOFF_MAX_SECONDS': 3600,
+    # Tarefas 'running' há mais tempo do que isto são consideradas abandonadas e voltam à fila.
+    'LOCK_TIMEOUT_SECONDS': 600,
+    'THUMBNAIL_SIZE': (400, 400),
+}
+
+# --- Tendências ---
+
+# Pontuação de tendência dos modelos (ver api/trending.py), recalculada pelo comando
+# 'update_trending': cada evento vale WEIGHTS[tipo] e perde metade do peso a cada
+# HALF_LIFE_HOURS; os eventos com mais de WINDOW_DAYS dias são ignorados.
+TRENDING = {
+    'HALF_LIFE_HOURS': float(os.environ.get('RECICLO_TRENDING_HALF_LIFE_HOURS', 48)),
+    'WINDOW_DAYS': 14,
+    'WEIGHTS': {'like': 3.0, 'comment': 2.0, 'download': 1.0},
+}
+
+# --- Recomendações ---
+
+# Vizinhos guardados por modelo pelo comando 'build_recommendations' e número de likes/favoritos
+# recentes de um utilizador usados para montar o seu feed (ver api/recommendations.py).
+RECOMMENDATIONS = {
+    'NEIGHBOURS': 20,
+    'SEED_MODELS': 50,
+}
+
+# --- Instrumentação ---
+
+# Mede consultas SQL, tempo de base de dados, serialização e tamanho das respostas por endpoint.
+# Ative com RECICLO_INSTRUMENTATION=1; os percentis ficam em /api/instrumentation/ (administradores).
+API_INSTRUMENTATION = os.environ.get('RECICLO_INSTRUMENTATION') == '1'
+# Número de amostras guardadas por endpoint para o cálculo dos percentis.
+API_INSTRUMENTATION_WINDOW = 1000
+# Ficheiro onde o relatório é gravado quando o processo termina (None para não gravar).
+API_INSTRUMENTATION_DUMP = os.environ.get('RECICLO_INSTRUMENTATION_DUMP', BASE_DIR / 'instrumentation.json')
+
 # --- Outras Configurações ---
 
 # Define o tipo de campo de chave primária padrão para os modelos.
@@ -1,5 +1,11 @@
 import React from "react";
-import { Heart, Download, BookmarkPlus, BookmarkCheck } from "lucide-react";
+import {
+  Heart,
+  Download,
+  MessageCircle,
+  BookmarkPlus,
+  BookmarkCheck,
+} from "lucide-react";
 import { Link } from "react-router-dom";
 import Avatar from "./ui/Avatar";
 
@@ -25,6 +31,7 @@ const ModelCard = ({ model, onLike, onSave }) => {
     userImage,
     likes,
     downloads,
+    commentsCount,
     isLiked,
     isSaved,
     price,
@@ -91,6 +98,11 @@ const ModelCard = ({ model, onLike, onSave }) => {
               <Download size={18} />
               <span className="ml-1 text-xs font-medium">{downloads}</span>
             </div>
+
+            <div className="flex items-center text-gray-500" title="Comentários">
+              <MessageCircle size={18} />
+              <span className="ml-1 text-xs font-medium">{commentsCount}</span>
+            </div>
           </div>
 
           <button
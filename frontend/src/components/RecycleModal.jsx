@@ -44,6 +44,17 @@ const RecycleModal = ({ isOpen, onClose, onActionComplete }) => {
     if (result) {
       setSubmissionResult(result);
 
+      // Com a gamificação em fila, o nível e as conquistas só mudam quando o worker processar
+      // o evento: volta a pedir os dados do utilizador pouco depois.
+      if (result.queued) {
+        toast.success("Reciclagem registada! A experiência será atualizada em instantes.");
+        if (typeof onActionComplete === "function") {
+          setTimeout(() => onActionComplete(result), 3000);
+        }
+        onClose();
+        return;
+      }
+
       // Notifica o App para atualizar os dados do utilizador.
       // Isto irá ativar a verificação de level up no AuthContext.
       if (typeof onActionComplete === "function") {
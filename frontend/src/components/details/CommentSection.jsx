@@ -7,14 +7,16 @@ import Avatar from "../ui/Avatar";
 
 /**
  * Componente CommentSection
- * Exibe uma lista de comentários para um modelo 3D específico e permite
- * que utilizadores autenticados adicionem novos comentários.
+ * Exibe os comentários de um modelo 3D específico, 20 de cada vez (a API pagina por cursor),
+ * e permite que utilizadores autenticados adicionem novos comentários.
  * @param {{ modelId: number | string }} props - As propriedades do componente.
  * @param {number | string} props.modelId - O ID do modelo 3D para buscar e associar comentários.
  */
 export const CommentSection = ({ modelId }) => {
   const { user } = useAuth(); // Pega o utilizador logado do contexto
   const [comments, setComments] = useState([]);
+  const [nextPage, setNextPage] = useState(null); // URL da página seguinte (cursor) ou null
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [newComment, setNewComment] = useState("");
   const [isLoading, setIsLoading] = useState(true);
   const [isSubmitting, setIsSubmitting] = useState(false);
@@ -28,7 +30,8 @@ export const CommentSection = ({ modelId }) => {
       const response = await axios.get(
         `http://127.0.0.1:8000/api/comments/?model=${modelId}`
       );
-      setComments(response.data);
+      setComments(response.data.results);
+      setNextPage(response.data.next);
     } catch (err) {
       console.error("Erro ao buscar comentários:", err);
       setError("Não foi possível carregar os comentários.");
@@ -41,6 +44,22 @@ export const CommentSection = ({ modelId }) => {
     fetchComments();
   }, [fetchComments]);
 
+  // Acrescenta a página seguinte de comentários à lista
+  const loadMoreComments = async () => {
+    if (!nextPage) return;
+    try {
+      setIsLoadingMore(true);
+      const response = await axios.get(nextPage);
+      setComments((previous) => [...previous, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (err) {
+      console.error("Erro ao buscar mais comentários:", err);
+      toast.error("Não foi possível carregar mais comentários.");
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   // Formata a data para uma leitura mais amigável
   const formatDate = (dateString) => {
     return new Date(dateString).toLocaleString("pt-BR", {
@@ -68,7 +87,7 @@ export const CommentSection = ({ modelId }) => {
     try {
       const response = await axios.post(
         `http://127.0.0.1:8000/api/comments/`,
-        { model: modelId, content: newComment },
+        { model: modelId, text: newComment },
         { headers: { Authorization: `Token ${token}` } }
       );
       // Adiciona o novo comentário no topo da lista para uma atualização instantânea
@@ -148,11 +167,23 @@ export const CommentSection = ({ modelId }) => {
                     {formatDate(comment.date)}
                   </p>
                 </div>
-                <p className="text-slate-700">{comment.content}</p>
+                <p className="text-slate-700">{comment.text}</p>
               </div>
             </div>
           ))
         )}
+        {nextPage && !isLoading && (
+          <div className="text-center">
+            <button
+              type="button"
+              onClick={loadMoreComments}
+              disabled={isLoadingMore}
+              className="text-blue-600 hover:text-blue-800 font-medium disabled:text-blue-300"
+            >
+              {isLoadingMore ? "A carregar..." : "Ver mais comentários"}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -44,7 +44,7 @@ const CoinBreakdown = ({
 
 /**
  * Sub-componente para exibir o status da troca com cores e texto traduzido.
- * @param {{status: 'pending' | 'accepted' | 'rejected' | 'cancelled'}} props
+ * @param {{status: 'pending' | 'accepted' | 'rejected' | 'cancelled' | 'expired'}} props
  */
 const StatusBadge = ({ status }) => {
   const statusConfig = {
@@ -52,6 +52,7 @@ const StatusBadge = ({ status }) => {
     accepted: { text: "Aceite", styles: "bg-green-100 text-green-800" },
     rejected: { text: "Rejeitada", styles: "bg-red-100 text-red-800" },
     cancelled: { text: "Cancelada", styles: "bg-gray-100 text-gray-800" },
+    expired: { text: "Expirada", styles: "bg-orange-100 text-orange-800" },
   };
   const currentStatus = statusConfig[status] || {
     text: status,
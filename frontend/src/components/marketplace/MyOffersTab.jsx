@@ -11,7 +11,7 @@ import {
 
 /**
  * Badge para exibir o status da oferta com cores e texto traduzido.
- * @param {{status: 'active' | 'completed' | 'cancelled'}} props
+ * @param {{status: 'active' | 'completed' | 'cancelled' | 'expired'}} props
  */
 const StatusBadge = ({ status }) => {
   const statusConfig = {
@@ -27,6 +27,10 @@ const StatusBadge = ({ status }) => {
       text: "Cancelada",
       styles: "bg-gray-100 text-gray-800 border-gray-200",
     },
+    expired: {
+      text: "Expirada",
+      styles: "bg-orange-100 text-orange-800 border-orange-200",
+    },
   };
   const currentStatus = statusConfig[status] || {
     text: status,
@@ -22,6 +22,7 @@ export const transformModelsData = (modelsData) => {
     description: model.description,
     likes: model.likes || 0,
     downloads: model.downloads || 0,
+    commentsCount: model.comments_count || 0,
     isLiked: model.is_liked,
     isSaved: model.is_saved,
     price: model.price,